@@ -0,0 +1,49 @@
+"""Сравнение двух прогонов бенчмарков.
+
+    python benchmarks/compare.py results/old.json results/new.json
+
+Для каждого сценария печатает p50/p95/p99 и число запросов
+нового прогона и изменение относительно старого в процентах.
+"""
+import json
+import sys
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries_mean')
+
+
+def _delta(old: float, new: float) -> str:
+    if not old:
+        return '    n/a'
+    return f'{(new - old) / old * 100:+6.1f}%'
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    lines = [
+        f'{old["meta"]["commit"]} -> {new["meta"]["commit"]} '
+        f'({new["meta"]["database"]}, {new["meta"]["rounds"]} замеров)',
+        f'{"сценарий":28}' + ''.join(f'{metric:>20}' for metric in METRICS),
+    ]
+    for name, result in sorted(new['results'].items()):
+        before = old['results'].get(name)
+        cells = []
+        for metric in METRICS:
+            cell = f'{result[metric]:.2f}'
+            if before is not None:
+                cell += f' {_delta(before[metric], result[metric])}'
+            cells.append(f'{cell:>20}')
+        lines.append(f'{name:28}' + ''.join(cells))
+    return lines
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) != 2:
+        print(__doc__)
+        return 2
+    old, new = (json.loads(open(path, encoding='utf-8').read())
+                for path in argv)
+    print('\n'.join(compare(old, new)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
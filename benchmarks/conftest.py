@@ -0,0 +1,171 @@
+"""Бенчмарки игрового цикла на уровне HTTP.
+
+Запуск (SQLite в памяти или локальный PostgreSQL через DB_ENGINE):
+
+    pytest benchmarks --bench-rounds 100 --bench-players 200
+
+Перед прогоном в тестовую базу один раз засевается синтетический мир
+(см. команду seed_world). Для каждого сценария считаются p50/p95/p99
+задержки и число запросов; результаты пишутся в JSON
+(benchmarks/results/<время>-<коммит>.json) для сравнения между
+коммитами: python benchmarks/compare.py old.json new.json
+"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+import django
+import pytest
+from django.db import connection
+from django.test import Client
+
+from corelight.queries import record_queries
+from game.management.commands.seed_world import PREFIX, seed_world
+from users.models import CustomUser
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+bench_key = pytest.StashKey['Bench']()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmarks')
+    group.addoption('--bench-rounds', type=int, default=50,
+                    help='Замеров на сценарий')
+    group.addoption('--bench-warmup', type=int, default=5,
+                    help='Прогревочных запросов (не учитываются)')
+    group.addoption('--bench-locations', type=int, default=5)
+    group.addoption('--bench-monsters', type=int, default=20)
+    group.addoption('--bench-players', type=int, default=50)
+    group.addoption('--bench-items', type=int, default=40)
+    group.addoption('--bench-json', default=None,
+                    help='Куда записать результаты (JSON)')
+
+
+def _percentile(cuts: list[float], p: int) -> float:
+    return round(cuts[p - 1] * 1000, 3)
+
+
+class Bench:
+    """Замеры сценариев одного прогона."""
+
+    def __init__(self, config):
+        self.rounds = config.getoption('--bench-rounds')
+        self.warmup = config.getoption('--bench-warmup')
+        self.world = {
+            'locations': config.getoption('--bench-locations'),
+            'monsters': config.getoption('--bench-monsters'),
+            'players': config.getoption('--bench-players'),
+            'items': config.getoption('--bench-items'),
+        }
+        self.results: dict[str, dict] = {}
+
+    def run(self, name, request, setup=None):
+        """Замеряет сценарий.
+
+        Args:
+            name: Имя сценария в отчёте.
+            request: request(i) -> response, i — номер итерации.
+            setup: setup(i), выполняется перед запросом вне замера.
+        """
+        latencies, queries = [], []
+        for i in range(self.warmup + self.rounds):
+            if setup is not None:
+                setup(i)
+            with record_queries() as stats:
+                start = time.perf_counter()
+                response = request(i)
+                elapsed = time.perf_counter() - start
+            assert response.status_code < 400, (
+                f'{name}: HTTP {response.status_code}')
+            if i >= self.warmup:
+                latencies.append(elapsed)
+                queries.append(stats.count)
+
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        self.results[name] = {
+            'rounds': len(latencies),
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+            'p50_ms': _percentile(cuts, 50),
+            'p95_ms': _percentile(cuts, 95),
+            'p99_ms': _percentile(cuts, 99),
+            'queries_mean': round(statistics.fmean(queries), 2),
+            'queries_max': max(queries),
+        }
+
+    def meta(self) -> dict:
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = 'unknown'
+        return {
+            'commit': commit,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'rounds': self.rounds,
+            'warmup': self.warmup,
+            'world': self.world,
+        }
+
+
+def pytest_configure(config):
+    config.stash[bench_key] = Bench(config)
+
+
+@pytest.fixture(scope='session')
+def bench(request):
+    return request.config.stash[bench_key]
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker, bench):
+    """Тестовая база с синтетическим миром — один раз на прогон."""
+    with django_db_blocker.unblock():
+        seed_world(**bench.world)
+
+
+@pytest.fixture
+def players(db, bench):
+    """Синтетические игроки с залогиненными клиентами: [(user, client)]."""
+    users = CustomUser.objects.filter(
+        username__startswith=f'{PREFIX}-player-').order_by('pk')
+    result = []
+    for user in users[:bench.rounds + bench.warmup]:
+        client = Client()
+        client.force_login(user)
+        result.append((user, client))
+    return result
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    bench = config.stash.get(bench_key, None)
+    if bench is None or not bench.results:
+        return
+    terminalreporter.section('benchmarks')
+    terminalreporter.write_line(
+        f'{"сценарий":28} {"p50":>9} {"p95":>9} {"p99":>9} {"запросов":>9}')
+    for name, result in sorted(bench.results.items()):
+        terminalreporter.write_line(
+            f'{name:28} {result["p50_ms"]:9.2f} {result["p95_ms"]:9.2f} '
+            f'{result["p99_ms"]:9.2f} {result["queries_mean"]:9.1f}')
+
+    meta = bench.meta()
+    path = config.getoption('--bench-json')
+    if path is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = RESULTS_DIR / f'{stamp}-{meta["commit"]}.json'
+    Path(path).write_text(
+        json.dumps({'meta': meta, 'results': bench.results},
+                   ensure_ascii=False, indent=2),
+        encoding='utf-8')
+    terminalreporter.write_line(f'Результаты: {path}')
@@ -0,0 +1,122 @@
+"""Сценарии основного игрового цикла: охота, торговля, перемещение."""
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+
+from game.models import Item, ItemStack
+from game.services import world
+from game.services.actions import TELEPORT_SCROLL_SLUG
+from users import volatile
+from users.backends import bump_user_version
+from users.models import PlayerState, PlayerTravel
+
+
+def _player(players, i):
+    return players[i % len(players)]
+
+
+def test_attack_monster(bench, players):
+    snapshot = world.get_world()
+
+    def request(i):
+        user, client = _player(players, i)
+        sublocation = snapshot.sublocations[user.current_sublocation_id]
+        monster = snapshot.sublocation_monsters[sublocation.pk][0]
+        return client.get(reverse('game:attack_monster', args=[
+            sublocation.global_location.slug, sublocation.slug,
+            monster.slug]))
+
+    def setup(i):
+        user, _ = _player(players, i)
+        PlayerState.objects.filter(user_id=user.pk).update(last_fight_at=None)
+        volatile.forget(user.pk)
+        bump_user_version(user.pk)
+
+    bench.run('attack_monster', request, setup)
+
+
+def test_trade_view(bench, players):
+    scroll = Item.objects.get(slug=TELEPORT_SCROLL_SLUG)
+    sell = {}
+
+    def setup(i):
+        user, _ = _player(players, i)
+        stack = ItemStack.objects.filter(owner=user).exclude(
+            item=scroll).order_by('-quantity').first()
+        sell[i] = {'source': 'player', 'item_id': stack.item_id,
+                   'quantity': 1}
+
+    def request(i):
+        _, client = _player(players, i)
+        if i % 2:
+            data = sell[i]
+        else:
+            data = {'source': 'shop', 'item_id': scroll.pk, 'quantity': 1}
+        return client.post(reverse('game:trade'), data)
+
+    bench.run('trade_view', request, setup)
+
+
+def test_trader_test(bench, players):
+    url = reverse('game:trader_test')
+    bench.run('trader_test',
+              lambda i: _player(players, i)[1].get(url))
+
+
+def test_travel_status(bench, players):
+    url = reverse('game:travel_status')
+    destination_id = next(iter(world.get_world().sublocations))
+
+    def setup(i):
+        user, _ = _player(players, i)
+        PlayerTravel.objects.filter(user_id=user.pk).update(
+            travel_destination_id=destination_id,
+            travel_started_at=timezone.now(), travel_time=600)
+        bump_user_version(user.pk)
+
+    bench.run('travel_status', lambda i: _player(players, i)[1].get(url),
+              setup)
+
+
+def test_travel_status_arrival(bench, players):
+    url = reverse('game:travel_status')
+    sublocations = list(world.get_world().sublocations)
+
+    def setup(i):
+        user, _ = _player(players, i)
+        PlayerTravel.objects.filter(user_id=user.pk).update(
+            travel_destination_id=sublocations[i % len(sublocations)],
+            travel_started_at=timezone.now() - timedelta(seconds=60),
+            travel_time=30)
+        bump_user_version(user.pk)
+
+    bench.run('travel_status_arrival',
+              lambda i: _player(players, i)[1].get(url), setup)
+
+
+def test_player_character(bench, players):
+    url = reverse('player_character')
+    bench.run('player_character',
+              lambda i: _player(players, i)[1].get(url))
+
+
+def test_location_pages(bench, players):
+    snapshot = world.get_world()
+    location = next(location for location in snapshot.global_locations_by_level
+                    if not location.is_city)
+
+    def sublocation_url(user):
+        sublocation = snapshot.sublocations[user.current_sublocation_id]
+        return reverse('game:sublocation', args=[
+            sublocation.global_location.slug, sublocation.slug])
+
+    pages = {
+        'city': lambda i: reverse('game:city'),
+        'hunting_zones': lambda i: reverse('game:hunting_zones'),
+        'sublocations_list': lambda i: reverse(
+            'game:sublocations_list', args=[location.slug]),
+        'sublocation': lambda i: sublocation_url(_player(players, i)[0]),
+    }
+    for name, url in pages.items():
+        bench.run(name, lambda i: _player(players, i)[1].get(url(i)))
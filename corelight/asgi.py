@@ -5,6 +5,15 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Запуск в продакшене (асинхронные представления game/async_views.py):
+
+    uvicorn corelight.asgi:application --workers 4 --loop uvloop \
+        --http httptools --no-access-log
+
+ASGI_THREADS ограничивает пул потоков, в котором выполняются
+синхронные части (ORM, шаблоны) — по сути это число одновременных
+соединений с БД на воркер.
 """
 
 import os
@@ -12,5 +21,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'corelight.settings')
+os.environ.setdefault('ASGI_THREADS', '8')
 
 application = get_asgi_application()
@@ -0,0 +1,71 @@
+"""Свойства настроенного бэкенда кэша.
+
+Версия контента мира, места спавна, ключи идемпотентности и буфер
+опыта игроков живут в кэше и рассчитаны на то, что его видят все
+воркеры. LocMemCache у каждого процесса свой и вытесняет записи после
+MAX_ENTRIES: правка в админке не доходит до остальных воркеров, а
+буфер опыта теряется.
+
+is_shared() — кэш общий для процессов (Redis, Memcached, таблица БД).
+is_durable() — общий и не вытесняет записи до их срока (Redis с
+maxmemory-policy noeviction): в таком кэше можно держать данные,
+которых ещё нет в БД.
+is_in_database() — кэш в таблице БД (DatabaseCache): общий, но каждое
+чтение кэша — SQL-запрос к основной базе. Годится для разработки,
+не для продакшена (проверка game.E001).
+"""
+from django.conf import settings
+
+# Бэкенды, общие для всех процессов
+SHARED_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django.core.cache.backends.db.DatabaseCache',
+    'django_redis.cache.RedisCache',
+)
+
+# Бэкенды, хранящие записи в таблице БД
+DATABASE_BACKENDS = (
+    'django.core.cache.backends.db.DatabaseCache',
+)
+
+# Бэкенды, не теряющие записи до истечения срока
+DURABLE_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django_redis.cache.RedisCache',
+)
+
+
+def get_backend(alias: str = 'default') -> str:
+    """Путь к классу бэкенда кэша.
+
+    Обёртка corelight.metrics.InstrumentedCache пропускается:
+    возвращается бэкенд из её OPTIONS['BACKEND'].
+    """
+    params = settings.CACHES[alias]
+    return params.get('OPTIONS', {}).get('BACKEND') or params['BACKEND']
+
+
+def is_shared(alias: str = 'default') -> bool:
+    """Кэш общий для всех процессов (SHARED_CACHE_BACKENDS)."""
+    return get_backend(alias) in getattr(
+        settings, 'SHARED_CACHE_BACKENDS', SHARED_BACKENDS)
+
+
+def is_durable(alias: str = 'default') -> bool:
+    """Кэш общий и не вытесняет записи (DURABLE_CACHE_BACKENDS)."""
+    return is_shared(alias) and get_backend(alias) in getattr(
+        settings, 'DURABLE_CACHE_BACKENDS', DURABLE_BACKENDS)
+
+
+def is_in_database(alias: str = 'default') -> bool:
+    """Кэш хранится в таблице БД (DATABASE_CACHE_BACKENDS)."""
+    return get_backend(alias) in getattr(
+        settings, 'DATABASE_CACHE_BACKENDS', DATABASE_BACKENDS)
+
+
+def database_tables() -> set[str]:
+    """Таблицы всех кэшей из settings.CACHES, хранящихся в БД."""
+    return {params['LOCATION'] for alias, params in settings.CACHES.items()
+            if is_in_database(alias)}
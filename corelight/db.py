@@ -0,0 +1,55 @@
+"""Настройки пула соединений PostgreSQL и его статистика.
+
+Пул (psycopg_pool) создаётся Django для каждого процесса-воркера,
+поэтому размер задаётся на воркер: суммарно воркеры × DB_POOL_MAX_SIZE
+не должно превышать max_connections сервера PostgreSQL.
+
+Статистика пула воркера отдаётся сотрудникам на /health/db-pool/
+и переносится в метрики /metrics (corelight.metrics.record_pool_stats).
+"""
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+def pool_options() -> dict:
+    """Параметры ConnectionPool для DATABASES[...]['OPTIONS']['pool']."""
+    return {
+        'min_size': _env_int('DB_POOL_MIN_SIZE', 2),
+        'max_size': _env_int('DB_POOL_MAX_SIZE', 10),
+        # Сколько секунд запрос ждёт свободное соединение
+        'timeout': _env_float('DB_POOL_TIMEOUT', 10),
+        'max_idle': _env_float('DB_POOL_MAX_IDLE', 10 * 60),
+        'max_lifetime': _env_float('DB_POOL_MAX_LIFETIME', 60 * 60),
+    }
+
+
+def get_pool_stats(alias: str = 'default') -> dict | None:
+    """Статистика пула соединений текущего процесса.
+
+    Returns:
+        None, если для базы пул не настроен. Иначе словарь
+        psycopg_pool.ConnectionPool.get_stats() и производные значения:
+        in_use — выданные соединения, wait_ms_avg — среднее ожидание
+        соединения, timeouts — запросы, не дождавшиеся соединения.
+    """
+    from django.db import connections
+
+    pool = getattr(connections[alias], 'pool', None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    requests_num = stats.get('requests_num', 0)
+    stats['in_use'] = stats.get('pool_size', 0) - stats.get(
+        'pool_available', 0)
+    stats['wait_ms_avg'] = (
+        stats.get('requests_wait_ms', 0) / requests_num
+        if requests_num else 0.0)
+    stats['timeouts'] = stats.get('requests_errors', 0)
+    return stats
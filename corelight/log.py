@@ -0,0 +1,177 @@
+"""Неблокирующая запись логов.
+
+LOGGING_CONFIG = 'corelight.log.configure_logging': после обычного
+dictConfig обработчики всех логгеров переносятся за очередь.
+Поток запроса только кладёт запись в очередь (QueueHandler),
+а форматирование и запись на диск и в консоль выполняет фоновый
+поток QueueListener.
+
+Ключ 'sampling' в LOGGING задаёт долю записей ниже WARNING, которые
+попадают в очередь, по префиксу имени логгера:
+{'game': 0.1} — 10% отладочных и информационных записей game.*.
+Предупреждения и ошибки пишутся всегда.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.config
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+
+# Атрибуты LogRecord; всё остальное в записи — поля из extra=
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {
+    'message', 'asctime', 'taskName'}
+
+_listeners: list[tuple['QueueHandler', logging.handlers.QueueListener]] = []
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON (поля extra= попадают в запись)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(
+                record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'func': record.funcName,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc_info'] = record.exc_text
+        if record.stack_info:
+            data['stack_info'] = record.stack_info
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю записей ниже WARNING по префиксу имени логгера."""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        # Длинные префиксы проверяются первыми: 'game.services' точнее 'game'
+        self.rates = sorted(rates.items(), key=lambda item: -len(item[0]))
+        self._cache: dict[str, float] = {}
+
+    def rate_for(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            for prefix, value in self.rates:
+                if name == prefix or name.startswith(prefix + '.'):
+                    rate = value
+                    break
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, сохраняющий трейсбек отдельно от сообщения.
+
+    Стандартный prepare() склеивает сообщение с трейсбеком, и
+    JsonFormatter не смог бы положить его в отдельное поле.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(
+                    record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _queue_handlers(loggers, sampling: SamplingFilter):
+    """Заменяет обработчики логгеров одним QueueHandler на набор."""
+    queued: dict[tuple, QueueHandler] = {}
+    for logger in loggers:
+        handlers = tuple(
+            handler for handler in logger.handlers
+            if not isinstance(handler, (logging.NullHandler,
+                                        logging.handlers.QueueHandler)))
+        if not handlers:
+            continue
+        if handlers not in queued:
+            handler = QueueHandler(queue.SimpleQueue())
+            handler.addFilter(sampling)
+            listener = logging.handlers.QueueListener(
+                handler.queue, *handlers, respect_handler_level=True)
+            listener.start()
+            _listeners.append((handler, listener))
+            queued[handlers] = handler
+        for handler in handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(queued[handlers])
+
+
+def stop_listeners():
+    """Дописывает записи из очередей и останавливает фоновые потоки."""
+    while _listeners:
+        _, listener = _listeners.pop()
+        listener.stop()
+
+
+def _fork_handlers():
+    return [handler for _, listener in _listeners
+            for handler in listener.handlers]
+
+
+def _before_fork():
+    # Фоновый поток не должен писать в файл в момент fork: иначе
+    # блокировка буфера потока скопируется захваченной и дочерний
+    # процесс зависнет на первой же записи
+    for handler in _fork_handlers():
+        handler.acquire()
+
+
+def _after_fork_in_parent():
+    for handler in reversed(_fork_handlers()):
+        handler.release()
+
+
+def _after_fork_in_child():
+    # Блокировки обработчиков пересоздаёт сам logging. Потоки
+    # не переживают fork: дочернему процессу нужны свои потоки
+    # и пустые очереди (записи родителя он уже не должен писать)
+    for handler, listener in _listeners:
+        handler.queue = listener.queue = queue.SimpleQueue()
+        listener.start()
+
+
+def configure_logging(config: dict):
+    """LOGGING_CONFIG: dictConfig и перенос записи логов в фоновые потоки."""
+    config = dict(config)
+    sampling = SamplingFilter(config.pop('sampling', {}))
+    stop_listeners()
+    logging.config.dictConfig(config)
+    loggers = [logging.getLogger()] + [
+        logger for logger in logging.Logger.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger)]
+    _queue_handlers(loggers, sampling)
+
+
+atexit.register(stop_listeners)
+os.register_at_fork(before=_before_fork,
+                    after_in_parent=_after_fork_in_parent,
+                    after_in_child=_after_fork_in_child)
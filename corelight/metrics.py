@@ -0,0 +1,513 @@
+"""Реестр метрик и выдача в текстовом формате Prometheus.
+
+Счётчики и гистограммы хранятся в памяти процесса. При нескольких
+воркерах (gunicorn/uvicorn) задайте METRICS_MULTIPROC_DIR: каждый
+процесс пишет значения в свой файл <pid>.db, отображённый в память
+(mmap), а /metrics суммирует файлы всех воркеров — не важно, какой
+воркер ответил на запрос. Каталог нужно очищать при перезапуске
+сервиса, иначе счётчики продолжат расти от прошлых значений.
+
+Показатели (Gauge) тоже суммируются по воркерам: размер пула
+соединений в /metrics — сумма пулов всех процессов.
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.base import BaseCache
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from corelight.db import get_pool_stats
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Границы гистограмм задержек по умолчанию, секунды
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0)
+
+_HEADER = struct.Struct('i4x')
+
+
+class MmapedDict:
+    """Словарь str -> float в файле, отображённом в память.
+
+    Формат: заголовок (занятый размер), затем записи
+    [длина ключа: int32][ключ, выровненный до 8 байт][значение: double].
+    Пишет только процесс-владелец файла, читать могут все.
+    """
+    INITIAL_SIZE = 1 << 16
+
+    def __init__(self, path: str):
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(self.INITIAL_SIZE)
+        self._capacity = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+        self._positions: dict[str, int] = {}
+        self._used = _HEADER.unpack_from(self._mmap, 0)[0]
+        if self._used == 0:
+            self._used = _HEADER.size
+            _HEADER.pack_into(self._mmap, 0, self._used)
+        for key, _, position in self._entries(self._mmap, self._used):
+            self._positions[key] = position
+
+    @staticmethod
+    def _entries(data, used: int):
+        position = _HEADER.size
+        while position < used:
+            length = struct.unpack_from('i', data, position)[0]
+            key_size = length + (-(length + 4) % 8)
+            key = bytes(data[position + 4:position + 4 + length]).decode()
+            value_position = position + 4 + key_size
+            value = struct.unpack_from('d', data, value_position)[0]
+            yield key, value, value_position
+            position = value_position + 8
+
+    @classmethod
+    def read_all(cls, path: str):
+        """Пары (ключ, значение) из файла чужого процесса."""
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < _HEADER.size:
+            return
+        used = _HEADER.unpack_from(data, 0)[0]
+        for key, value, _ in cls._entries(data, used):
+            yield key, value
+
+    def _add_key(self, key: str) -> int:
+        encoded = key.encode()
+        padded = encoded + b' ' * (-(len(encoded) + 4) % 8)
+        entry = struct.pack(f'i{len(padded)}sd', len(encoded), padded, 0.0)
+        while self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            self._file.truncate(self._capacity)
+            self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+        self._mmap[self._used:self._used + len(entry)] = entry
+        position = self._used + len(entry) - 8
+        self._used += len(entry)
+        _HEADER.pack_into(self._mmap, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def inc(self, key: str, amount: float):
+        position = self._positions.get(key)
+        if position is None:
+            position = self._add_key(key)
+        value = struct.unpack_from('d', self._mmap, position)[0]
+        struct.pack_into('d', self._mmap, position, value + amount)
+
+    def set(self, key: str, value: float):
+        position = self._positions.get(key)
+        if position is None:
+            position = self._add_key(key)
+        struct.pack_into('d', self._mmap, position, value)
+
+    def items(self):
+        for key, position in self._positions.items():
+            yield key, struct.unpack_from('d', self._mmap, position)[0]
+
+
+class _LocalValues:
+    """Хранилище одного процесса без файлов."""
+
+    def __init__(self):
+        self._values: dict[str, float] = defaultdict(float)
+
+    def inc(self, key: str, amount: float):
+        self._values[key] += amount
+
+    def set(self, key: str, value: float):
+        self._values[key] = value
+
+    def items(self):
+        return list(self._values.items())
+
+
+def _multiproc_dir() -> str | None:
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+
+
+class Registry:
+    """Метрики процесса; значения — по ключу (метрика, суффикс, метки)."""
+
+    def __init__(self):
+        self.metrics: dict[str, 'Metric'] = {}
+        self._lock = threading.Lock()
+        self._store = None
+        self._pid = None
+
+    def register(self, metric: 'Metric'):
+        if metric.name in self.metrics:
+            raise ValueError(f'Метрика {metric.name} уже зарегистрирована')
+        self.metrics[metric.name] = metric
+
+    def _get_store(self):
+        # После fork воркер должен писать в свой файл
+        pid = os.getpid()
+        if self._store is None or self._pid != pid:
+            directory = _multiproc_dir()
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+                self._store = MmapedDict(os.path.join(directory, f'{pid}.db'))
+            else:
+                self._store = _LocalValues()
+            self._pid = pid
+        return self._store
+
+    def inc(self, key: str, amount: float):
+        with self._lock:
+            self._get_store().inc(key, amount)
+
+    def set(self, key: str, value: float):
+        with self._lock:
+            self._get_store().set(key, value)
+
+    def collect(self) -> dict[str, float]:
+        """Текущие значения: свои или сумма по файлам всех воркеров."""
+        directory = _multiproc_dir()
+        if not directory:
+            with self._lock:
+                return dict(self._get_store().items())
+        totals: dict[str, float] = defaultdict(float)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            for key, value in MmapedDict.read_all(path):
+                totals[key] += value
+        return totals
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus."""
+        samples = defaultdict(list)
+        for key, value in self.collect().items():
+            name, suffix, labels = json.loads(key)
+            samples[name].append((suffix, labels, value))
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for suffix, labels, value in sorted(
+                    samples.get(name, ()), key=metric.sort_key):
+                lines.append(f'{name}{suffix}{_format_labels(labels)} '
+                             f'{_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _escape(value: str) -> str:
+    return (value.replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _format_labels(labels: list) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(int(value)) if value == int(value) else repr(value)
+
+
+class Metric:
+    type = ''
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def _labels(self, labels: dict) -> list:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'{self.name}: ожидались метки {self.labelnames}')
+        return [[name, str(labels[name])] for name in self.labelnames]
+
+    def _key(self, suffix: str, labels: list) -> str:
+        return json.dumps([self.name, suffix, labels], ensure_ascii=False)
+
+    def sort_key(self, sample):
+        suffix, labels, _ = sample
+        return suffix, labels
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик (имя по соглашению оканчивается на _total)."""
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError('Счётчик не может уменьшаться')
+        registry.inc(self._key('', self._labels(labels)), amount)
+
+
+class Gauge(Metric):
+    """Текущее значение процесса (при нескольких воркерах — сумма)."""
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        registry.set(self._key('', self._labels(labels)), value)
+
+
+class Histogram(Metric):
+    """Гистограмма: накопительные корзины, сумма и количество."""
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = (*sorted(buckets), float('inf'))
+
+    def observe(self, value: float, **labels):
+        label_list = self._labels(labels)
+        for bound in self.buckets:
+            if value <= bound:
+                registry.inc(self._key(
+                    '_bucket', [*label_list, ['le', _format_value(bound)]]), 1)
+        registry.inc(self._key('_sum', label_list), value)
+        registry.inc(self._key('_count', label_list), 1)
+
+    def sort_key(self, sample):
+        suffix, labels, _ = sample
+        le = dict(labels).get('le')
+        bound = float('inf') if le in (None, '+Inf') else float(le)
+        return ([label for label in labels if label[0] != 'le'],
+                suffix, bound)
+
+
+# ---- Метрики HTTP, БД и кэша ----
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Время обработки запроса',
+    ('view', 'method', 'status'),
+)
+DB_QUERIES = Counter(
+    'db_queries_total', 'Выполнено SQL-запросов', ('alias',))
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds', 'Время SQL-запроса', ('alias',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+             0.5, 1.0),
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Обращения к кэшу', ('cache', 'result'))
+DB_POOL_CONNECTIONS = Gauge(
+    'db_pool_connections', 'Соединения в пуле: всего, свободные, выданные',
+    ('alias', 'state'))
+DB_POOL_WAITING = Gauge(
+    'db_pool_requests_waiting', 'Запросы, ждущие соединение из пула',
+    ('alias',))
+DB_POOL_REQUESTS = Counter(
+    'db_pool_requests_total', 'Выдано соединений из пула', ('alias',))
+DB_POOL_WAIT = Counter(
+    'db_pool_wait_seconds_total', 'Суммарное ожидание соединения из пула',
+    ('alias',))
+DB_POOL_TIMEOUTS = Counter(
+    'db_pool_timeouts_total', 'Запросы, не дождавшиеся соединения',
+    ('alias',))
+
+# Последняя статистика пулов процесса: alias -> get_pool_stats()
+_pool_stats: dict[str, dict] = {}
+_pool_stats_at = 0.0
+_pool_stats_lock = threading.Lock()
+
+
+def get_pool_metrics_interval() -> float:
+    """Как часто (секунды) воркер обновляет метрики пула соединений."""
+    return getattr(settings, 'DB_POOL_METRICS_SECONDS', 5)
+
+
+def _growth(stats: dict, previous: dict, name: str) -> float:
+    value, before = stats.get(name, 0), previous.get(name, 0)
+    # Счёт меньше прежнего — пул пересоздан и считает заново
+    return value - before if value >= before else value
+
+
+def record_pool_stats(force: bool = False):
+    """Переносит статистику пулов соединений процесса в метрики.
+
+    Вызывается после запросов (MetricsMiddleware), но не чаще раза
+    в DB_POOL_METRICS_SECONDS. Накопительные значения
+    psycopg_pool (requests_num, requests_wait_ms, requests_errors)
+    прибавляются к счётчикам приращениями от прошлого вызова.
+    """
+    global _pool_stats_at
+    now = time.monotonic()
+    if not force and now - _pool_stats_at < get_pool_metrics_interval():
+        return
+    if not _pool_stats_lock.acquire(blocking=False):
+        return
+    try:
+        _pool_stats_at = now
+        for alias in settings.DATABASES:
+            stats = get_pool_stats(alias)
+            if stats is None:
+                continue
+            for state, name in (('size', 'pool_size'),
+                                ('available', 'pool_available'),
+                                ('in_use', 'in_use')):
+                DB_POOL_CONNECTIONS.set(stats.get(name, 0), alias=alias,
+                                        state=state)
+            DB_POOL_WAITING.set(stats.get('requests_waiting', 0),
+                                alias=alias)
+            previous = _pool_stats.get(alias, {})
+            DB_POOL_REQUESTS.inc(
+                _growth(stats, previous, 'requests_num'), alias=alias)
+            DB_POOL_WAIT.inc(
+                _growth(stats, previous, 'requests_wait_ms') / 1000,
+                alias=alias)
+            DB_POOL_TIMEOUTS.inc(
+                _growth(stats, previous, 'requests_errors'), alias=alias)
+            _pool_stats[alias] = stats
+    finally:
+        _pool_stats_lock.release()
+
+
+def _status_class(status: int) -> str:
+    return f'{status // 100}xx'
+
+
+class MetricsMiddleware:
+    """Гистограмма времени запросов по имени URL, методу и статусу."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started)
+        return response
+
+    def observe(self, request, response, elapsed: float):
+        match = request.resolver_match
+        REQUEST_LATENCY.observe(
+            elapsed,
+            # Без имени URL (404) — одна метка, чтобы не плодить ряды
+            view=match.view_name if match else '<unresolved>',
+            method=request.method,
+            status=_status_class(response.status_code),
+        )
+        record_pool_stats()
+
+
+def db_metrics_wrapper(execute, sql, params, many, context):
+    """execute_wrapper: счётчик и время всех SQL-запросов."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        alias = context['connection'].alias
+        DB_QUERIES.inc(alias=alias)
+        DB_QUERY_DURATION.observe(time.perf_counter() - started, alias=alias)
+
+
+@receiver(connection_created, dispatch_uid='corelight.metrics')
+def install_db_metrics(sender, connection, **kwargs):
+    """Вешает db_metrics_wrapper на каждое новое соединение с БД.
+
+    Обёртка ставится в начало списка: connection.execute_wrapper()
+    снимает последнюю обёртку, и соединение, открытое внутри
+    record_queries, иначе потеряло бы нашу вместо временной.
+    """
+    if db_metrics_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, db_metrics_wrapper)
+
+
+class InstrumentedCache(BaseCache):
+    """Обёртка над бэкендом кэша, считающая попадания и промахи.
+
+    Настоящий бэкенд указывается в OPTIONS['BACKEND'], остальные
+    OPTIONS передаются ему.
+    """
+    _missing = object()
+
+    def __init__(self, location, params):
+        params = dict(params)
+        options = dict(params.get('OPTIONS', {}))
+        backend = import_string(options.pop('BACKEND'))
+        params['OPTIONS'] = options
+        self._cache = backend(location, params)
+        self._label = backend.__name__
+        super().__init__(params)
+
+    def _count(self, hits: int, misses: int):
+        if hits:
+            CACHE_REQUESTS.inc(hits, cache=self._label, result='hit')
+        if misses:
+            CACHE_REQUESTS.inc(misses, cache=self._label, result='miss')
+
+    def get(self, key, default=None, version=None):
+        value = self._cache.get(key, self._missing, version=version)
+        if value is self._missing:
+            self._count(0, 1)
+            return default
+        self._count(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = self._cache.get_many(keys, version=version)
+        self._count(len(values), len(keys) - len(values))
+        return values
+
+    def add(self, *args, **kwargs):
+        return self._cache.add(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        return self._cache.set(*args, **kwargs)
+
+    def touch(self, *args, **kwargs):
+        return self._cache.touch(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._cache.delete(*args, **kwargs)
+
+    def has_key(self, *args, **kwargs):
+        return self._cache.has_key(*args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        return self._cache.incr(*args, **kwargs)
+
+    def decr(self, *args, **kwargs):
+        return self._cache.decr(*args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        return self._cache.set_many(*args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        return self._cache.delete_many(*args, **kwargs)
+
+    def clear(self):
+        return self._cache.clear()
+
+    def close(self, **kwargs):
+        return self._cache.close(**kwargs)
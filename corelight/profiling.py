@@ -0,0 +1,270 @@
+"""Семплирующий профилировщик запросов.
+
+Один фоновый поток раз в PROFILING_INTERVAL секунд снимает стеки
+потоков, которые сейчас обрабатывают профилируемые запросы
+(sys._current_frames). Код запроса не инструментируется, поэтому
+накладные расходы не зависят от числа вызовов функций.
+
+Профилируется доля запросов PROFILING_SAMPLE_RATE (её можно поменять
+на лету через /health/profiling/) и любой запрос сотрудника
+с заголовком X-Profile. Стеки запросов складываются в памяти по имени
+URL и раз в PROFILING_FLUSH_SECONDS пишутся одним файлом на URL в
+формате collapsed stacks в PROFILING_DIR/<имя URL>/; в каталоге
+остаются последние PROFILING_MAX_FILES файлов. Команда profile_report
+собирает их во флеймграфы (speedscope и collapsed).
+"""
+import atexit
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import count
+from pathlib import Path
+from types import CodeType, FrameType
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE_KEY = 'profiling:sample_rate'
+# Как часто перечитывать долю профилируемых запросов из кэша (секунды)
+SAMPLE_RATE_TTL = 10
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+_labels: dict[CodeType, str] = {}
+_file_counter = count()
+_sample_rate: tuple[float, float] | None = None
+
+# Стеки, ещё не записанные на диск: имя URL -> 'стек' -> число семплов
+_pending: dict[str, Counter] = {}
+_pending_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def _label(code: CodeType) -> str:
+    """Подпись кадра 'функция (файл:строка)' с путём от корня проекта."""
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename
+        roots = sorted((str(settings.BASE_DIR), *sys.path), key=len,
+                       reverse=True)
+        for root in roots:
+            if root and path.startswith(root):
+                path = os.path.relpath(path, root)
+                break
+        label = f'{code.co_name} ({path}:{code.co_firstlineno})'
+        _labels[code] = label
+    return label
+
+
+def _stack(frame: FrameType | None) -> tuple[CodeType, ...]:
+    codes = []
+    while frame is not None:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    codes.reverse()
+    return tuple(codes)
+
+
+class Sampler:
+    """Фоновый поток, снимающий стеки зарегистрированных потоков."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._targets: dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, thread_id: int) -> Counter:
+        """Начинает снимать стеки потока; возвращает счётчик стеков."""
+        samples = Counter()
+        with self._lock:
+            self._targets[thread_id] = samples
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='profiling-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return samples
+
+    def stop(self, thread_id: int):
+        with self._lock:
+            self._targets.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            # Снимок делается под блокировкой: после stop() счётчик
+            # запроса больше не меняется и его можно безопасно читать
+            with self._lock:
+                if not self._targets:
+                    self._wake.clear()
+                    idle = True
+                else:
+                    idle = False
+                    frames = sys._current_frames()
+                    for thread_id, samples in self._targets.items():
+                        stack = _stack(frames.get(thread_id))
+                        if stack:
+                            samples[stack] += 1
+                    del frames
+            if idle:
+                self._wake.wait()
+            else:
+                time.sleep(self.interval)
+
+
+sampler = Sampler(getattr(settings, 'PROFILING_INTERVAL', 0.005))
+
+
+def get_sample_rate() -> float:
+    """Доля профилируемых запросов: из кэша (переключатель) или настроек.
+
+    Значение кэшируется в процессе на SAMPLE_RATE_TTL секунд, чтобы
+    не ходить в кэш на каждом запросе.
+    """
+    global _sample_rate
+    now = time.monotonic()
+    if _sample_rate is None or _sample_rate[1] < now:
+        rate = cache.get(SAMPLE_RATE_KEY)
+        if rate is None:
+            rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        _sample_rate = (float(rate), now + SAMPLE_RATE_TTL)
+    return _sample_rate[0]
+
+
+def set_sample_rate(rate: float, timeout: int | None = None):
+    """Меняет долю профилируемых запросов во всех воркерах.
+
+    Воркеры подхватят значение в течение SAMPLE_RATE_TTL секунд.
+    По истечении timeout снова действует PROFILING_SAMPLE_RATE.
+    """
+    global _sample_rate
+    cache.set(SAMPLE_RATE_KEY, rate, timeout)
+    _sample_rate = None
+
+
+def get_flush_interval() -> float:
+    """Как часто стеки из памяти пишутся на диск (секунды)."""
+    return getattr(settings, 'PROFILING_FLUSH_SECONDS', 60)
+
+
+def get_max_files() -> int:
+    """Сколько последних файлов хранится в каталоге одного URL."""
+    return getattr(settings, 'PROFILING_MAX_FILES', 200)
+
+
+def record(url_name: str, samples: Counter):
+    """Добавляет стеки запроса к профилю URL.
+
+    Раз в PROFILING_FLUSH_SECONDS накопленные профили пишутся на диск.
+    """
+    stacks = Counter()
+    for stack, n in samples.items():
+        stacks[';'.join(_label(code) for code in stack)] += n
+    with _pending_lock:
+        _pending.setdefault(url_name, Counter()).update(stacks)
+        due = time.monotonic() - _flushed_at >= get_flush_interval()
+    if due:
+        flush()
+
+
+def flush() -> list[Path]:
+    """Пишет накопленные профили на диск: по файлу на URL."""
+    global _flushed_at
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _flushed_at = time.monotonic()
+    return [write_collapsed(url_name, stacks)
+            for url_name, stacks in pending.items()]
+
+
+def write_collapsed(url_name: str, stacks: Counter) -> Path:
+    """Пишет стеки в PROFILING_DIR/<url_name>/*.collapsed.
+
+    Старые файлы сверх PROFILING_MAX_FILES удаляются.
+    """
+    directory = Path(settings.PROFILING_DIR) / url_name.replace(':', '.')
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    path = directory / f'{stamp}-{os.getpid()}-{next(_file_counter)}.collapsed'
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, n in stacks.items():
+            f.write(f'{stack} {n}\n')
+    files = sorted(directory.glob('*.collapsed'),
+                   key=lambda file: file.stat().st_mtime_ns)
+    for old in files[:-get_max_files()]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+class SamplingProfilerMiddleware:
+    """Профилирует часть запросов и запросы с заголовком X-Profile.
+
+    Заголовок учитывается только для сотрудников (is_staff), поэтому
+    middleware должно стоять после AuthenticationMiddleware.
+    Асинхронные запросы не профилируются: их код выполняется в цикле
+    событий и в чужих потоках.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        thread_id = threading.get_ident()
+        samples = sampler.start(thread_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop(thread_id)
+        match = request.resolver_match
+        if samples and match is not None:
+            record(match.view_name, samples)
+        if PROFILE_HEADER in request.META:
+            response['X-Profile-Samples'] = str(sum(samples.values()))
+        return response
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def should_profile(self, request) -> bool:
+        if PROFILE_HEADER in request.META:
+            user = getattr(request, 'user', None)
+            return bool(user is not None and user.is_staff)
+        rate = get_sample_rate()
+        return rate > 0 and random.random() < rate
+
+
+def _after_fork_in_child():
+    # Профили родителя запишет родитель
+    global _pending_lock, _flushed_at
+    _pending.clear()
+    _pending_lock = threading.Lock()
+    _flushed_at = time.monotonic()
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Профилировщик: ошибка записи при остановке')
+
+
+atexit.register(_flush_at_exit)
+os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,278 @@
+"""Учёт SQL-запросов: бюджеты представлений и разбор медленных запросов.
+
+Каждому имени URL в settings.QUERY_BUDGETS задаётся максимум запросов.
+QueryBudgetMiddleware пишет в лог превышения и медленные запросы
+(с планом EXPLAIN), а assert_query_budget() проверяет бюджет в тестах.
+
+Запросы к таблице кэша (DatabaseCache) считаются отдельно и сверяются
+с settings.CACHE_BUDGETS: тесты прогоняют бюджеты и с кэшем в БД,
+чтобы рост обращений к кэшу был так же заметен, как рост запросов.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from corelight.caches import database_tables
+
+logger = logging.getLogger('corelight.queries')
+slow_logger = logging.getLogger('corelight.slow_queries')
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+# IN (%s, %s, ...) разной длины — один и тот же запрос
+_IN_LISTS = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+# Когда в последний раз снимался план запроса: {отпечаток: время}
+_explained: dict[str, float] = {}
+
+
+def fingerprint(sql: str) -> str:
+    """Нормализованный текст запроса без литералов и длины IN-списков."""
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _IN_LISTS.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def get_query_budget(url_name: str) -> int | None:
+    """Бюджет запросов для имени URL ('namespace:name') или None."""
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+
+
+def get_cache_budget(url_name: str) -> int | None:
+    """Бюджет обращений к кэшу для имени URL или None."""
+    return getattr(settings, 'CACHE_BUDGETS', {}).get(url_name)
+
+
+@dataclass
+class QueryRecord:
+    alias: str
+    sql: str
+    params: object
+    duration_ms: float
+
+
+def _touches_tables(query: QueryRecord, tables: set[str]) -> bool:
+    quote_name = connections[query.alias].ops.quote_name
+    return any(quote_name(table) in query.sql for table in tables)
+
+
+@dataclass
+class QueryStats:
+    """Запросы, выполненные внутри record_queries()."""
+    queries: list[QueryRecord] = field(default_factory=list)
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка для connection.execute_wrapper()."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(QueryRecord(
+                alias=context['connection'].alias,
+                sql=sql,
+                params=params,
+                duration_ms=(time.perf_counter() - start) * 1000,
+            ))
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def cache_count(self) -> int:
+        """Запросы к таблицам кэша (DatabaseCache).
+
+        DatabaseCache пишет в atomic-блоке: внутри транзакции это точка
+        сохранения, и она тоже считается запросом к кэшу, если внутри
+        неё были только запросы к таблицам кэша.
+        """
+        tables = database_tables()
+        if not tables:
+            return 0
+        flags = [_touches_tables(query, tables) for query in self.queries]
+        opened = []
+        for index, query in enumerate(self.queries):
+            sql = query.sql.lstrip().upper()
+            if sql.startswith('SAVEPOINT'):
+                opened.append(index)
+            elif sql.startswith(('RELEASE SAVEPOINT',
+                                 'ROLLBACK TO SAVEPOINT')) and opened:
+                start = opened.pop()
+                inner = flags[start + 1:index]
+                if inner and all(inner):
+                    flags[start] = flags[index] = True
+        return sum(flags)
+
+    @property
+    def data_count(self) -> int:
+        """Запросы к данным — без запросов к таблицам кэша."""
+        return self.count - self.cache_count
+
+    @property
+    def time_ms(self) -> float:
+        return sum(query.duration_ms for query in self.queries)
+
+    @property
+    def duplicates(self) -> dict[str, int]:
+        """Отпечатки запросов, выполненных больше одного раза (N+1)."""
+        counts = Counter(fingerprint(query.sql) for query in self.queries)
+        return {sql: n for sql, n in counts.most_common() if n > 1}
+
+    def slow(self, threshold_ms: float) -> list[QueryRecord]:
+        return [query for query in self.queries
+                if query.duration_ms >= threshold_ms]
+
+    def report(self) -> str:
+        """Сводка для сообщений об ошибках и лога."""
+        lines = [f'{self.count} запросов (к кэшу: {self.cache_count}), '
+                 f'{self.time_ms:.1f} мс']
+        for sql, n in self.duplicates.items():
+            lines.append(f'  x{n}: {sql}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def record_queries(using: list[str] | None = None):
+    """Записывает запросы ко всем базам (или к перечисленным в using).
+
+    Работает без DEBUG: запросы перехватываются execute_wrapper,
+    а не через connection.queries.
+    """
+    stats = QueryStats()
+    with ExitStack() as stack:
+        for alias in using or connections:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+        yield stats
+
+
+def explain(query: QueryRecord) -> str | None:
+    """План выполнения SELECT-запроса.
+
+    На PostgreSQL — EXPLAIN (ANALYZE, BUFFERS): запрос выполняется
+    повторно, поэтому план снимается только для чтения.
+    """
+    if not query.sql.lstrip().upper().startswith('SELECT'):
+        return None
+    connection = connections[query.alias]
+    if connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) '
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + query.sql, query.params)
+        return '\n'.join(
+            ' '.join(str(column) for column in row)
+            for row in cursor.fetchall()
+        )
+
+
+def log_slow_queries(stats: QueryStats, label: str):
+    """Пишет медленные запросы с планами в лог corelight.slow_queries.
+
+    План одного и того же запроса снимается не чаще раза
+    в SLOW_QUERY_EXPLAIN_INTERVAL секунд на процесс.
+    """
+    threshold = getattr(settings, 'SLOW_QUERY_MS', 100)
+    interval = getattr(settings, 'SLOW_QUERY_EXPLAIN_INTERVAL', 10 * 60)
+    for query in stats.slow(threshold):
+        key = fingerprint(query.sql)
+        now = time.monotonic()
+        plan = None
+        if now - _explained.get(key, -interval) >= interval:
+            _explained[key] = now
+            try:
+                plan = explain(query)
+            except Exception:
+                logger.exception('Не удалось получить план запроса')
+        slow_logger.warning(
+            '%s: %.1f мс\n%s\n%s', label, query.duration_ms, query.sql,
+            plan or '(план не снимался)')
+
+
+@contextmanager
+def assert_query_budget(url_name: str, budget: int | None = None):
+    """Тестовый помощник: падает, если запросов больше бюджета.
+
+    Запросы к данным сверяются с QUERY_BUDGETS, запросы к таблице
+    кэша (если кэш в БД) — с CACHE_BUDGETS.
+
+    Args:
+        url_name: Имя URL из settings.QUERY_BUDGETS.
+        budget: Явный бюджет вместо настроек.
+
+    Raises:
+        AssertionError: Бюджет превышен или не задан.
+    """
+    if budget is None:
+        budget = get_query_budget(url_name)
+    if budget is None:
+        raise AssertionError(f'Для {url_name} не задан QUERY_BUDGETS')
+    with record_queries() as stats:
+        yield stats
+    if stats.data_count > budget:
+        raise AssertionError(
+            f'{url_name}: бюджет {budget} превышен\n{stats.report()}')
+    cache_count = stats.cache_count
+    if cache_count:
+        cache_budget = get_cache_budget(url_name)
+        if cache_budget is None:
+            raise AssertionError(f'Для {url_name} не задан CACHE_BUDGETS')
+        if cache_count > cache_budget:
+            raise AssertionError(
+                f'{url_name}: бюджет кэша {cache_budget} превышен\n'
+                f'{stats.report()}')
+
+
+class QueryBudgetMiddleware:
+    """Считает запросы представления и сверяет их с бюджетом.
+
+    Превышение бюджета и медленные запросы пишутся в лог; при DEBUG
+    в ответ добавляется заголовок Server-Timing с числом запросов.
+    Асинхронные представления пропускаются: их запросы выполняются
+    в других потоках со своими соединениями.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with record_queries() as stats:
+            response = self.get_response(request)
+        self.check(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def check(self, request, response, stats: QueryStats):
+        match = request.resolver_match
+        url_name = match.view_name if match else request.path
+        budget = get_query_budget(url_name)
+        if budget is not None and stats.data_count > budget:
+            logger.warning('%s: бюджет %s превышен, %s',
+                           url_name, budget, stats.report())
+        cache_budget = get_cache_budget(url_name)
+        if cache_budget is not None and stats.cache_count > cache_budget:
+            logger.warning('%s: бюджет кэша %s превышен, %s',
+                           url_name, cache_budget, stats.report())
+        log_slow_queries(stats, url_name)
+        if settings.DEBUG:
+            response['Server-Timing'] = (
+                f'db;dur={stats.time_ms:.1f};desc="{stats.count} queries"')
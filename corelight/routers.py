@@ -0,0 +1,129 @@
+"""Маршрутизация запросов между основной базой и репликой.
+
+На реплику уходит чтение редко меняющегося контента (локации, монстры,
+предметы, магазины) и отчётные запросы внутри read_from_replica().
+Всё остальное, а также любое чтение после записи, идёт в основную базу:
+записавший запрос закрепляется за основной базой до конца, а на
+следующие REPLICA_PIN_SECONDS секунд — через cookie (редирект после POST
+должен увидеть свои изменения, даже если реплика отстаёт).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.deprecation import MiddlewareMixin
+
+# Модели контента, которые можно читать с реплики
+REPLICA_MODELS = frozenset({
+    'game.globallocation',
+    'game.sublocation',
+    'game.monster',
+    'game.monsterdrop',
+    'game.item',
+    'game.shop',
+    'game.shopitem',
+})
+
+# Приложения, которые читаются только из основной базы: свежая сессия
+# может ещё не доехать до реплики, кэш (DatabaseCache) — тоже
+PRIMARY_ONLY_APPS = frozenset({'sessions', 'django_cache'})
+
+# Запись в таблицу кэша не закрепляет запрос за основной базой
+UNPINNED_APPS = frozenset({'django_cache'})
+
+PIN_COOKIE = 'db_primary'
+
+# Запрос уже писал в БД: всё чтение — из основной базы
+_pinned: ContextVar[bool] = ContextVar('db_pinned', default=False)
+# Отчётный режим: любое чтение можно отдать реплике
+_reporting: ContextVar[bool] = ContextVar('db_reporting', default=False)
+
+
+def get_replica_alias() -> str | None:
+    """Алиас реплики или None, если реплика не настроена."""
+    alias = getattr(settings, 'REPLICA_DATABASE', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+@contextmanager
+def use_primary():
+    """Чтение внутри блока идёт только в основную базу."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+@contextmanager
+def read_from_replica():
+    """Отчётные запросы внутри блока можно читать с реплики.
+
+    Подходит для рейтингов и статистики, где отставание реплики
+    на несколько секунд не заметно игроку.
+    """
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Роутер: контент и отчёты — на реплику, остальное — в основную базу."""
+
+    def db_for_read(self, model, **hints):
+        replica = get_replica_alias()
+        if replica is None or _pinned.get():
+            return DEFAULT_DB_ALIAS
+        # Внутри транзакции читаем то, что пишем
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        if _reporting.get() or model._meta.label_lower in REPLICA_MODELS:
+            return replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in UNPINNED_APPS:
+            _pinned.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия основной базы, связи между ними допустимы
+        databases = {DEFAULT_DB_ALIAS, get_replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class PrimaryPinMiddleware(MiddlewareMixin):
+    """Закрепляет запросы за основной базой после записи.
+
+    Пишущие методы (POST и т.п.) сразу читают из основной базы.
+    Если запрос что-то записал, ставится короткоживущая cookie,
+    и следующие запросы игрока тоже читают из основной базы.
+    GET-запросы по путям из REPLICA_READ_PATHS (админка) читают
+    с реплики целиком.
+    """
+
+    def process_request(self, request):
+        pinned = (request.method not in ('GET', 'HEAD', 'OPTIONS')
+                  or PIN_COOKIE in request.COOKIES)
+        _pinned.set(pinned)
+        _reporting.set(not pinned and request.path.startswith(
+            tuple(getattr(settings, 'REPLICA_READ_PATHS', ()))))
+
+    def process_response(self, request, response):
+        if _pinned.get() and get_replica_alias() is not None:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+        # Поток воркера обслужит следующий запрос с чистым состоянием
+        _pinned.set(False)
+        _reporting.set(False)
+        return response
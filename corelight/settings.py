@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from corelight.db import pool_options
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,11 +48,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'corelight.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'corelight.queries.QueryBudgetMiddleware',
+    'corelight.routers.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'corelight.profiling.SamplingProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -68,6 +74,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'game.context_processors.current_user_data',
+                'game.context_processors.world_content',
             ],
         },
     },
@@ -82,13 +89,151 @@ WSGI_APPLICATION = 'corelight.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'corelight',
-        'USER': 'postgres',
-        'PASSWORD': 'root',
-        'HOST': 'localhost',              # хост (если локально — localhost)
-        'PORT': '5432',                   # порт PostgreSQL (по умолчанию 5432)
+        'NAME': os.environ.get('DB_NAME', 'corelight'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'root'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),  # хост (если локально — localhost)
+        'PORT': os.environ.get('DB_PORT', '5432'),       # порт PostgreSQL (по умолчанию 5432)
+        'OPTIONS': {},
+    }
+}
+
+# Пул соединений psycopg 3 (по умолчанию включён). С пулом
+# CONN_MAX_AGE должен быть 0: временем жизни соединений управляет пул,
+# а CONN_HEALTH_CHECKS включает проверку соединения при выдаче из пула.
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if os.environ.get('DB_POOL', '1') == '1':
+    DATABASES['default']['OPTIONS']['pool'] = pool_options()
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(
+        os.environ.get('DB_CONN_MAX_AGE', 0))
+# Как часто воркер переносит статистику пула в /metrics (секунды)
+DB_POOL_METRICS_SECONDS = 5
+
+# Локальная разработка и тесты без PostgreSQL: DB_ENGINE=sqlite
+if os.environ.get('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME', str(BASE_DIR / 'db.sqlite3')),
+    }
+
+# Реплика для чтения контента мира и отчётов (см. corelight/routers.py).
+# Включается, если задан DB_REPLICA_HOST (PostgreSQL) или DB_REPLICA_NAME
+# (для SQLite — путь к копии файла базы). Остальные параметры
+# подключения берутся из основной базы.
+REPLICA_DATABASE = os.environ.get('DB_REPLICA_ALIAS', 'replica')
+
+if os.environ.get('DB_REPLICA_HOST') or os.environ.get('DB_REPLICA_NAME'):
+    replica = {
+        **DATABASES['default'],
+        'OPTIONS': {**DATABASES['default'].get('OPTIONS', {})},
+        'TEST': {'MIRROR': 'default'},
+    }
+    for key in ('NAME', 'USER', 'PASSWORD', 'HOST', 'PORT'):
+        if os.environ.get(f'DB_REPLICA_{key}'):
+            replica[key] = os.environ[f'DB_REPLICA_{key}']
+    DATABASES[REPLICA_DATABASE] = replica
+    DATABASE_ROUTERS = ['corelight.routers.PrimaryReplicaRouter']
+
+# Сколько секунд после записи игрок читает только из основной базы
+REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+
+# GET-запросы по этим путям целиком читают с реплики
+REPLICA_READ_PATHS = ('/admin/',)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Кэш общий для всех воркеров (corelight/caches.py): в нём версия
+# контента мира (game/world.py), версии игроков и ключи идемпотентности.
+# LocMemCache у каждого процесса свой — правка в админке не дошла бы
+# до остальных воркеров.
+# По умолчанию — Redis (CACHE_LOCATION=redis://host:6379/1). Memcached:
+# CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache
+# DatabaseCache (таблица django_cache, миграция game.0038_cache_table)
+# тоже общий, но каждое чтение кэша в нём — SQL-запрос к основной базе:
+# без DEBUG его не пропустит проверка game.E001.
+# Локальная разработка без Redis (runserver, DEBUG):
+# CACHE_BACKEND=django.core.cache.backends.locmem.LocMemCache
+CACHE_BACKEND = os.environ.get(
+    'CACHE_BACKEND', 'django.core.cache.backends.redis.RedisCache')
+CACHES = {
+    'default': {
+        # Обёртка считает попадания и промахи для /metrics
+        'BACKEND': 'corelight.metrics.InstrumentedCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION',
+                                   'redis://127.0.0.1:6379/1'),
+        'OPTIONS': {
+            'BACKEND': CACHE_BACKEND,
+        },
     }
 }
+if CACHE_BACKEND == 'django.core.cache.backends.db.DatabaseCache':
+    CACHES['default']['LOCATION'] = os.environ.get(
+        'CACHE_LOCATION', 'django_cache')
+    # Таблица чистится при MAX_ENTRIES записей (по умолчанию 300)
+    CACHES['default']['OPTIONS']['MAX_ENTRIES'] = int(
+        os.environ.get('CACHE_MAX_ENTRIES', 1_000_000))
+
+# Время жизни кэшированных фрагментов игрового мира (секунды)
+WORLD_CACHE_TIMEOUT = 60 * 60
+# Сколько секунд воркер не перечитывает версию мира из кэша:
+# правка в админке доходит до остальных воркеров с этой задержкой
+WORLD_VERSION_TTL = 1
+
+
+# Query budgets (corelight/queries.py)
+
+# Максимум SQL-запросов на представление (имя URL с пространством имён).
+# Проверяется в тестах, в работе превышение пишется в лог.
+QUERY_BUDGETS = {
+    'index': 2,
+    'player_character': 3,
+    'game:city': 2,
+    'game:city_sublocation': 3,
+    'game:hunting_zones': 2,
+    'game:sublocations_list': 2,
+    'game:sublocation': 2,
+    'game:attack_monster': 19,
+    'game:travel_status': 4,
+    'game:start_travel': 3,
+    'game:teleport': 9,
+    'game:trader_test': 6,
+    'game:trade': 19,
+    'game:leaderboard': 4,
+    'game:api_v1:attack_monster': 19,
+    'game:api_v1:start_travel': 3,
+    'game:api_v1:teleport': 9,
+    'game:api_v1:trade': 19,
+}
+# Максимум SQL-запросов к таблице кэша, если кэш в БД (DatabaseCache):
+# чтение — один запрос, запись — несколько. Проверяется в тестах
+# (game.tests.DatabaseCacheBudgetTests), в работе превышение пишется в лог.
+CACHE_BUDGETS = {
+    'index': 6,
+    'player_character': 1,
+    'game:city': 7,
+    'game:city_sublocation': 12,
+    'game:hunting_zones': 7,
+    'game:sublocations_list': 7,
+    'game:sublocation': 8,
+    'game:attack_monster': 20,
+    'game:travel_status': 1,
+    'game:start_travel': 11,
+    'game:teleport': 11,
+    'game:trader_test': 1,
+    'game:trade': 7,
+    'game:leaderboard': 7,
+    'game:api_v1:attack_monster': 21,
+    'game:api_v1:start_travel': 11,
+    'game:api_v1:teleport': 11,
+    'game:api_v1:trade': 2,
+}
+
+# Запросы дольше SLOW_QUERY_MS пишутся в logs/slow_queries.log с планом
+SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 100))
+SLOW_QUERY_EXPLAIN_INTERVAL = 10 * 60
 
 
 # Password validation
@@ -138,6 +283,57 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.CustomUser'
 
+AUTHENTICATION_BACKENDS = [
+    # Игрок из кэша или одним запросом со строками игрока и локациями
+    # (users/backends.py). Без select_related асинхронные представления
+    # не смогли бы читать поля игрока, поэтому ModelBackend не указан.
+    'users.backends.PlayerBackend',
+]
+# Время жизни закэшированного игрока, секунды
+USER_CACHE_TIMEOUT = 5 * 60
+
+# Рейтинги (game/services/leaderboards.py): строк топа в кэше
+# и время его жизни в секундах (страховка от потерянных обновлений)
+LEADERBOARD_SIZE = 100
+LEADERBOARD_TIMEOUT = 60 * 60
+
+# Популяции монстров (game/services/spawns.py): сколько секунд воркер
+# доверяет своему пулу особей, как часто run_spawner проверяет кэш
+# и сохраняет снимки в БД. Убитые особи — ключи в кэше (CACHES):
+# он должен быть общим для воркеров и run_spawner и не вытеснять
+# записи раньше срока (Redis). Без DEBUG с LocMemCache или DatabaseCache
+# не пройдёт проверка game.E001.
+SPAWN_POOL_TTL = 2
+SPAWN_TICK_SECONDS = 5
+SPAWN_SNAPSHOT_SECONDS = 60
+
+# Журнал действий (game/services/action_log.py): фоновый сброс буфера
+# раз в ACTION_LOG_FLUSH_MS или по ACTION_LOG_BATCH_SIZE записей;
+# при ACTION_LOG_MAX_BUFFER запрос сбрасывает буфер сам
+ACTION_LOG_BACKGROUND = True
+ACTION_LOG_FLUSH_MS = 500
+ACTION_LOG_BATCH_SIZE = 500
+ACTION_LOG_MAX_BUFFER = 10_000
+
+# Отложенная запись опыта, убийств, здоровья и времени боя
+# (users/volatile.py): интервал сброса в БД и время жизни в кэше.
+# Включается только с кэшем из DURABLE_CACHE_BACKENDS (corelight/caches.py,
+# Redis с maxmemory-policy noeviction), иначе значения пишутся сразу
+VOLATILE_WRITE_BEHIND = True
+VOLATILE_BACKGROUND = True
+VOLATILE_FLUSH_SECONDS = 5
+VOLATILE_TIMEOUT = 24 * 60 * 60
+
+# Ключи идемпотентности игровых действий (game/idempotency.py): сколько
+# хранится ответ, сколько ключ занят запросом и сколько ждёт повтор
+IDEMPOTENCY_TIMEOUT = 24 * 60 * 60
+IDEMPOTENCY_LOCK_SECONDS = 30
+IDEMPOTENCY_WAIT_SECONDS = 5
+
+# Списки админки: начиная с такой оценки планировщика число строк
+# не считается точным COUNT(*) (corelight/pagination.py)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10_000
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -147,6 +343,11 @@ LOGOUT_REDIRECT_URL = '/'
 
 (LOGS_DIR := BASE_DIR / "logs").mkdir(exist_ok=True)
 
+# Обработчики работают в фоновых потоках (corelight/log.py):
+# запрос только кладёт запись в очередь
+LOGGING_CONFIG = 'corelight.log.configure_logging'
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -155,29 +356,74 @@ LOGGING = {
             'format': '{levelname} {asctime} {name} {funcName}(): {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'corelight.log.JsonFormatter',
+        },
     },
     'handlers': {
         'file': {
             'level': 'DEBUG',
             'class': 'logging.FileHandler',
             'filename': str(LOGS_DIR / 'game.log'),
-            'formatter': 'detailed',
+            'formatter': 'json',
         },
         'console': {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
             'formatter': 'detailed',
         },
+        'slow_queries': {
+            'level': 'WARNING',
+            'class': 'logging.FileHandler',
+            'filename': str(LOGS_DIR / 'slow_queries.log'),
+            'formatter': 'json',
+        },
     },
     'root': {
         'handlers': ['console', 'file'],
-        'level': 'DEBUG',
+        'level': LOG_LEVEL,
     },
     'loggers': {
         'game': {
             'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'level': os.environ.get('LOG_LEVEL_GAME', LOG_LEVEL),
             'propagate': False,
         },
+        'corelight.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+    # Доля записей ниже WARNING, попадающих в лог, по префиксу логгера
+    'sampling': {
+        'game': float(os.environ.get('LOG_SAMPLE_RATE_GAME', 1)),
+        'django.db.backends': 0.01,
     },
-}
\ No newline at end of file
+}
+
+
+# Sampling profiler (corelight/profiling.py)
+
+# Доля профилируемых запросов; 0.01 безопасно держать в продакшене
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+# Период снятия стеков, секунды
+PROFILING_INTERVAL = 0.005
+PROFILING_DIR = LOGS_DIR / 'profiles'
+# Стеки копятся в памяти и пишутся по файлу на URL раз в
+# PROFILING_FLUSH_SECONDS; в каталоге URL хранятся последние
+# PROFILING_MAX_FILES файлов
+PROFILING_FLUSH_SECONDS = 60
+PROFILING_MAX_FILES = 200
+
+# Метрики Prometheus (/metrics)
+# Каталог для счётчиков нескольких процессов (gunicorn/uvicorn workers);
+# очищается при перезапуске сервера
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+# Доступ к /metrics (corelight.views.metrics_allowed): Prometheus
+# передаёт Authorization: Bearer METRICS_TOKEN; без токена — только
+# сотрудники и прямые запросы (не через прокси) с METRICS_ALLOWED_IPS,
+# например METRICS_ALLOWED_IPS=127.0.0.1,::1
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [
+    ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip]
@@ -0,0 +1,55 @@
+"""Настройки для тестов: по умолчанию SQLite в памяти.
+
+Прогнать тесты на PostgreSQL: DB_ENGINE=postgresql pytest
+"""
+import atexit
+import copy
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault('DB_ENGINE', 'sqlite')
+
+from corelight.settings import *  # noqa: E402,F401,F403
+
+# Журнал действий сбрасывается в потоке теста (action_log.flush()):
+# записи фонового потока не откатывались бы вместе с тестом
+ACTION_LOG_BACKGROUND = False
+VOLATILE_BACKGROUND = False
+
+# Кэш в памяти процесса: тесты идут в одном процессе, общий кэш им
+# не нужен, поэтому проверка game.E001 отключена. Обращения к общему
+# кэшу считает game.tests.DatabaseCacheBudgetTests: там те же бюджеты
+# прогоняются с DatabaseCache и сверяются с CACHE_BUDGETS
+CACHES = {
+    'default': {
+        'BACKEND': 'corelight.metrics.InstrumentedCache',
+        'LOCATION': 'corelight-tests',
+        'OPTIONS': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+}
+SILENCED_SYSTEM_CHECKS = ['game.E001']
+
+# Логи тестов не пишутся в logs/ рабочей копии
+LOGGING = copy.deepcopy(LOGGING)  # noqa: F405
+LOGGING['handlers']['file'] = {'class': 'logging.NullHandler'}
+
+# Медленные запросы пишутся во временный каталог, удаляемый при выходе
+LOGS_DIR = Path(tempfile.mkdtemp(prefix='corelight-tests-'))
+atexit.register(shutil.rmtree, LOGS_DIR, ignore_errors=True)
+LOGGING['handlers']['slow_queries']['filename'] = str(
+    LOGS_DIR / 'slow_queries.log')
+PROFILING_DIR = LOGS_DIR / 'profiles'
+
+# Вторая база для тестов роутера (corelight/tests.py) — зеркало
+# основной. Роутер читает с неё только внутри
+# override_settings(REPLICA_DATABASE=TEST_REPLICA_DATABASE)
+TEST_REPLICA_DATABASE = 'test_replica'
+DATABASES[TEST_REPLICA_DATABASE] = {  # noqa: F405
+    **DATABASES['default'],  # noqa: F405
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_ROUTERS = ['corelight.routers.PrimaryReplicaRouter']
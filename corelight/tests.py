@@ -0,0 +1,308 @@
+import os
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache.backends.db import BaseDatabaseCache
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from corelight import metrics, profiling, routers
+from corelight.db import pool_options
+from game.models import ActionLog, Monster
+from users.models import CustomUser
+
+REPLICA = settings.TEST_REPLICA_DATABASE
+
+
+@override_settings(REPLICA_DATABASE=REPLICA)
+class ReplicaRouterTests(SimpleTestCase):
+    """Чтение контента — с реплики, после записи — из основной базы."""
+
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    def setUp(self):
+        # Состояние роутера — контекстные переменные потока теста
+        pinned = routers._pinned.set(False)
+        reporting = routers._reporting.set(False)
+        self.addCleanup(routers._pinned.reset, pinned)
+        self.addCleanup(routers._reporting.reset, reporting)
+        self.middleware = routers.PrimaryPinMiddleware(
+            lambda request: HttpResponse())
+        self.factory = RequestFactory()
+
+    def assertReadsFrom(self, model, alias):
+        self.assertEqual(router.db_for_read(model), alias)
+
+    def test_content_from_replica(self):
+        self.assertReadsFrom(Monster, REPLICA)
+        self.assertReadsFrom(CustomUser, DEFAULT_DB_ALIAS)
+        self.assertEqual(Monster.objects.all().db, REPLICA)
+
+    def test_pinned_after_write(self):
+        self.assertEqual(router.db_for_write(ActionLog), DEFAULT_DB_ALIAS)
+        self.assertReadsFrom(Monster, DEFAULT_DB_ALIAS)
+
+    def test_cache_table_does_not_pin(self):
+        cache_model = BaseDatabaseCache('django_cache', {}).cache_model_class
+        router.db_for_write(cache_model)
+        self.assertReadsFrom(Monster, REPLICA)
+        self.assertReadsFrom(cache_model, DEFAULT_DB_ALIAS)
+
+    def test_pin_cookie(self):
+        request = self.factory.get('/')
+        self.middleware.process_request(request)
+        router.db_for_write(ActionLog)
+        response = self.middleware.process_response(request, HttpResponse())
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        self.assertReadsFrom(Monster, REPLICA)
+
+        # Следующий запрос игрока читает из основной базы
+        request = self.factory.get('/')
+        request.COOKIES[routers.PIN_COOKIE] = '1'
+        self.middleware.process_request(request)
+        self.assertReadsFrom(Monster, DEFAULT_DB_ALIAS)
+        self.middleware.process_response(request, HttpResponse())
+
+        request = self.factory.post('/')
+        self.middleware.process_request(request)
+        self.assertReadsFrom(Monster, DEFAULT_DB_ALIAS)
+
+    def test_sessions_from_primary(self):
+        self.assertReadsFrom(Session, DEFAULT_DB_ALIAS)
+        with routers.read_from_replica():
+            self.assertReadsFrom(Session, DEFAULT_DB_ALIAS)
+
+    def test_read_from_replica(self):
+        with routers.read_from_replica():
+            self.assertReadsFrom(CustomUser, REPLICA)
+        self.assertReadsFrom(CustomUser, DEFAULT_DB_ALIAS)
+
+    def test_admin_get_reads_from_replica(self):
+        self.middleware.process_request(self.factory.get('/admin/'))
+        self.assertReadsFrom(CustomUser, REPLICA)
+
+    def test_atomic_block_reads_primary(self):
+        with transaction.atomic():
+            self.assertReadsFrom(Monster, DEFAULT_DB_ALIAS)
+            with routers.read_from_replica():
+                self.assertReadsFrom(CustomUser, DEFAULT_DB_ALIAS)
+
+    def test_without_replica(self):
+        with self.settings(REPLICA_DATABASE='missing'):
+            self.assertIsNone(routers.get_replica_alias())
+            self.assertReadsFrom(Monster, DEFAULT_DB_ALIAS)
+
+
+class ProfilingTests(SimpleTestCase):
+    """Стеки копятся по URL в памяти, на диске — ограниченное число файлов."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = self.settings(
+            PROFILING_DIR=self.directory, PROFILING_FLUSH_SECONDS=3600,
+            PROFILING_MAX_FILES=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        profiling.flush()
+
+    def test_aggregated_per_url(self):
+        samples = Counter({profiling._stack(sys._getframe()): 3})
+        profiling.record('game:city', samples)
+        profiling.record('game:city', samples)
+        self.assertFalse(self.directory.exists()
+                         and any(self.directory.iterdir()))
+
+        [path] = profiling.flush()
+        self.assertEqual(path.parent.name, 'game.city')
+        [line] = path.read_text(encoding='utf-8').splitlines()
+        self.assertTrue(line.endswith(' 6'))
+        self.assertIn('test_aggregated_per_url', line)
+        self.assertEqual(profiling.flush(), [])
+
+    def test_old_files_rotated(self):
+        for n in range(3):
+            profiling.write_collapsed('game:city', Counter({'f': n + 1}))
+        files = list((self.directory / 'game.city').glob('*.collapsed'))
+        self.assertEqual(len(files), 2)
+
+
+class MetricsTests(TestCase):
+    """Доступ к /metrics и сумма счётчиков всех воркеров."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_user(
+            'admin', password='password', nickname='Admin', is_staff=True)
+
+    def setUp(self):
+        self.url = reverse('metrics')
+
+    def test_denied_by_default(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_allowed_ips(self):
+        with self.settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            # Через прокси REMOTE_ADDR — адрес прокси
+            response = self.client.get(
+                self.url, HTTP_X_FORWARDED_FOR='203.0.113.7')
+            self.assertEqual(response.status_code, 403)
+        with self.settings(METRICS_ALLOWED_IPS=['10.0.0.1']):
+            self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_token(self):
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get(
+                self.url, HTTP_AUTHORIZATION='Bearer secret',
+                HTTP_X_FORWARDED_FOR='203.0.113.7')
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(
+                self.url, HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(response.status_code, 403)
+
+    def test_staff(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_multiprocess_sum(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        registry = metrics.registry
+        store = registry._store, registry._pid
+        self.addCleanup(setattr, registry, '_store', store[0])
+        self.addCleanup(setattr, registry, '_pid', store[1])
+        registry._store = None
+
+        with self.settings(METRICS_MULTIPROC_DIR=directory.name,
+                           METRICS_TOKEN='secret'):
+            pid = os.fork()
+            if pid == 0:
+                # Второй воркер пишет в свой файл <pid>.db
+                try:
+                    metrics.CACHE_REQUESTS.inc(2, cache='test', result='hit')
+                finally:
+                    os._exit(0)
+            os.waitpid(pid, 0)
+            metrics.CACHE_REQUESTS.inc(1, cache='test', result='hit')
+            self.assertEqual(len(os.listdir(directory.name)), 2)
+            response = self.client.get(
+                self.url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertIn(
+            'cache_requests_total{cache="test",result="hit"} 3',
+            response.content.decode())
+
+
+class _Pool:
+    """Пул с заданной статистикой вместо psycopg_pool.ConnectionPool."""
+
+    def __init__(self, **stats):
+        self.stats = stats
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
+
+
+class DbPoolTests(TestCase):
+    """Параметры пула из окружения, статистика и её метрики."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_user(
+            'admin', password='password', nickname='Admin', is_staff=True)
+
+    def _set_env(self, **values):
+        """Задаёт переменные окружения на время теста (None — убрать)."""
+        for name, value in values.items():
+            self.addCleanup(self._restore_env, name, os.environ.get(name))
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    @staticmethod
+    def _restore_env(name: str, value: str | None):
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+    def _use_pool(self, pool):
+        connection = connections[DEFAULT_DB_ALIAS]
+        connection.pool = pool
+        self.addCleanup(delattr, connection, 'pool')
+
+    def test_pool_options_from_env(self):
+        self._set_env(DB_POOL_MIN_SIZE=None, DB_POOL_MAX_SIZE=None,
+                      DB_POOL_TIMEOUT=None, DB_POOL_MAX_IDLE=None,
+                      DB_POOL_MAX_LIFETIME=None)
+        self.assertEqual(pool_options(), {
+            'min_size': 2, 'max_size': 10, 'timeout': 10.0,
+            'max_idle': 600.0, 'max_lifetime': 3600.0})
+
+        self._set_env(DB_POOL_MIN_SIZE='4', DB_POOL_MAX_SIZE='32',
+                      DB_POOL_TIMEOUT='2.5')
+        options = pool_options()
+        self.assertEqual(
+            (options['min_size'], options['max_size'], options['timeout']),
+            (4, 32, 2.5))
+
+        self._set_env(DB_POOL_MAX_SIZE='many')
+        with self.assertRaises(ValueError):
+            pool_options()
+
+    def test_health_endpoint(self):
+        url = reverse('db_pool_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        # SQLite без пула
+        self.assertEqual(self.client.get(url).json(), {'default': None})
+
+        self._use_pool(_Pool(pool_size=5, pool_available=2,
+                             requests_num=4, requests_wait_ms=20))
+        stats = self.client.get(url).json()['default']
+        self.assertEqual((stats['in_use'], stats['wait_ms_avg'],
+                          stats['timeouts']), (3, 5.0, 0))
+
+    def test_pool_metrics(self):
+        def value(metric, **labels):
+            key = metric._key('', metric._labels(labels))
+            return metrics.registry.collect().get(key, 0)
+
+        requests_before = value(metrics.DB_POOL_REQUESTS, alias='default')
+        pool = _Pool(pool_size=5, pool_available=2, requests_waiting=1,
+                     requests_num=10, requests_wait_ms=500)
+        self._use_pool(pool)
+        self.addCleanup(metrics._pool_stats.clear)
+        metrics._pool_stats.clear()
+        metrics.record_pool_stats(force=True)
+        self.assertEqual(value(metrics.DB_POOL_CONNECTIONS,
+                               alias='default', state='in_use'), 3)
+        self.assertEqual(value(metrics.DB_POOL_WAITING, alias='default'), 1)
+
+        # Счётчики растут на приращение статистики пула
+        pool.stats.update(pool_available=5, requests_num=15)
+        metrics.record_pool_stats(force=True)
+        self.assertEqual(value(metrics.DB_POOL_CONNECTIONS,
+                               alias='default', state='in_use'), 0)
+        self.assertEqual(value(metrics.DB_POOL_REQUESTS, alias='default'),
+                         requests_before + 15)
+        # Без force — не чаще DB_POOL_METRICS_SECONDS
+        pool.stats.update(requests_num=100)
+        metrics.record_pool_stats()
+        self.assertEqual(value(metrics.DB_POOL_REQUESTS, alias='default'),
+                         requests_before + 15)
+        self.assertIn('# TYPE db_pool_connections gauge',
+                      metrics.registry.render())
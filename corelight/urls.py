@@ -12,6 +12,9 @@ urlpatterns = [
     path('register/', views.register, name='register'),
     path('player/', views.player_character, name='player_character'),
     path('game/', include('game.urls')),
+    path('health/db-pool/', views.db_pool_stats, name='db_pool_stats'),
+    path('health/profiling/', views.profiling_toggle, name='profiling_toggle'),
+    path('metrics', views.metrics, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -1,9 +1,17 @@
+import hmac
 from typing import cast
 
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from corelight.db import get_pool_stats
+from corelight.metrics import CONTENT_TYPE, registry
+from corelight.profiling import get_sample_rate, set_sample_rate
+from game import stat_schema
 from game.models import GlobalLocation, ItemStack, SubLocation, Wallet
 from users.forms import CustomUserCreationForm
 from users.models import CustomUser
@@ -21,6 +29,60 @@ def handler500(request):
     """Внутренняя ошибка сервера."""
     return render(request, 'errors/500.html', status=500)
 
+@staff_member_required
+def db_pool_stats(request):
+    """Статистика пула соединений с БД текущего воркера."""
+    return JsonResponse({'default': get_pool_stats('default')})
+
+@staff_member_required
+def profiling_toggle(request):
+    """Доля профилируемых запросов: GET — текущая, POST — задать.
+
+    POST rate=0.05&timeout=600 — профилировать 5% запросов 10 минут.
+    """
+    if request.method == 'POST':
+        try:
+            rate = float(request.POST.get('rate', 0))
+            timeout = int(request.POST.get('timeout', 600))
+        except ValueError:
+            return JsonResponse({'error': 'Некорректные rate/timeout'},
+                                status=400)
+        if not 0 <= rate <= 1:
+            return JsonResponse({'error': 'rate должен быть от 0 до 1'},
+                                status=400)
+        set_sample_rate(rate, timeout)
+    return JsonResponse({'sample_rate': get_sample_rate()})
+
+def metrics_allowed(request) -> bool:
+    """Можно ли отдать запросу /metrics.
+
+    Пускаются запросы с заголовком Authorization: Bearer METRICS_TOKEN,
+    сотрудники и прямые запросы с адресов METRICS_ALLOWED_IPS. За
+    обратным прокси REMOTE_ADDR — адрес самого прокси, поэтому запрос
+    с X-Forwarded-For/Forwarded по адресу не пропускается.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        scheme, _, value = request.headers.get(
+            'Authorization', '').partition(' ')
+        if scheme.lower() == 'bearer' and hmac.compare_digest(
+                value.encode(), token.encode()):
+            return True
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    if ('HTTP_X_FORWARDED_FOR' in request.META
+            or 'HTTP_FORWARDED' in request.META):
+        return False
+    return request.META.get('REMOTE_ADDR') in getattr(
+        settings, 'METRICS_ALLOWED_IPS', ())
+
+def metrics(request):
+    """Метрики в текстовом формате Prometheus (доступ — metrics_allowed)."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+
 def index(request):
     """Главная страница сайта."""
     return render(request, 'game/home.html')
@@ -45,7 +107,7 @@ def player_character(request):
         'hide_right_sidebar': True,
     }
     user = cast(CustomUser, request.user)
-    inventory_slots = user.item_slots
+    inventory_slots = user.effective_stats[stat_schema.ITEM_SLOTS]
     stacks = ItemStack.objects.filter(owner=user).select_related('item').order_by('item__name')
     instances = []
     inventory_display = []
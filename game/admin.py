@@ -1,10 +1,22 @@
+import logging
+
 from django import forms
 from django.contrib import admin
-from django.contrib.contenttypes.models import ContentType
+from django.contrib.admin.widgets import (
+    AutocompleteMixin,
+    get_select2_language,
+)
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse
+from django.urls import path, reverse
+
+from corelight.pagination import EstimatedCountPaginator
 
 from .models import (
+    ActionLog,
     ActivityLink,
     Currency,
+    Equipment,
     GlobalLocation,
     Item,
     ItemInstance,
@@ -16,20 +28,60 @@ from .models import (
     SubLocation,
     Wallet,
 )
+from .services import activities
+
+logger = logging.getLogger(__name__)
 
-# Список моделей, которые могут быть активностями
-ACTIVITY_MODELS = [Shop]
 
 class ShopItemInline(admin.TabularInline):
     model = ShopItem
     extra = 1  # сколько пустых строк показывать по умолчанию
     autocomplete_fields = ['item']  # улучшает UX при большом количестве предметов
 
+
+class ActivityAutocomplete(forms.Select):
+    """Выбор активности через select2 админки.
+
+    В HTML попадает только выбранная активность, остальные страницами
+    подгружает SubLocationAdmin.activity_autocomplete.
+    """
+    # Те же скрипты и стили, что у autocomplete_fields
+    media = AutocompleteMixin.media
+
+    def __init__(self, attrs=None):
+        super().__init__(attrs)
+        self.i18n_name = get_select2_language()
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs=extra_attrs)
+        attrs.update({
+            'class': f"{attrs.get('class', '')} admin-autocomplete".strip(),
+            'data-ajax--cache': 'true',
+            'data-ajax--delay': 250,
+            'data-ajax--type': 'GET',
+            'data-ajax--url': reverse(
+                'admin:game_sublocation_activity_autocomplete'),
+            'data-theme': 'admin-autocomplete',
+            'data-allow-clear': 'true',
+            'data-placeholder': '— Выберите активность —',
+            'lang': self.i18n_name,
+        })
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        labels = dict(activities.get_activity_choices())
+        self.choices = [('', '')] + [(key, labels.get(key, key))
+                                     for key in value if key]
+        return super().optgroups(name, value, attrs)
+
+
 class ActivityLinkForm(forms.ModelForm):
-    activity_obj = forms.ChoiceField(
-        choices=[],
+    # Список не строится на каждую форму: значение проверяет
+    # clean_activity_obj, варианты подгружает виджет
+    activity_obj = forms.CharField(
         required=False,
-        label="Активность"
+        label="Активность",
+        widget=ActivityAutocomplete,
     )
 
     class Meta:
@@ -43,46 +95,30 @@ class ActivityLinkForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        # Собираем все доступные объекты
-        choices = [('', '— Выберите активность —')]
-        for model in ACTIVITY_MODELS:
-            ct = ContentType.objects.get_for_model(model)
-            for obj in model.objects.all():
-                choices.append((
-                    f"{ct.id}:{obj.pk}",
-                    f"{obj}"  # или f"{model._meta.verbose_name}: {obj}"
-                ))
-        self.fields['activity_obj'].choices = choices
-
-        # Если объект уже сохранён — подставляем текущее значение
-        if self.instance and self.instance.pk and self.instance.activity:
-            ct = ContentType.objects.get_for_model(self.instance.activity)
-            self.fields['activity_obj'].initial = f"{ct.id}:{self.instance.activity.pk}"
+        # Если объект уже сохранён — подставляем текущее значение.
+        # Сам объект активности не загружаем, хватает ключей ссылки.
+        if self.instance and self.instance.pk and self.instance.object_id:
+            self.fields['activity_obj'].initial = activities.activity_key(
+                self.instance.content_type_id, self.instance.object_id)
 
     def clean_activity_obj(self):
         data = self.cleaned_data['activity_obj']
         if data:
             try:
-                ct_id, obj_id = data.split(':')
-                ct_id = int(ct_id)
-                obj_id = int(obj_id)
-                # Проверяем, что такая комбинация существует
-                ct = ContentType.objects.get(id=ct_id)
-                model_class = ct.model_class()
-                if not model_class:
-                    raise forms.ValidationError("Недопустимый тип активности")
-                if not model_class.objects.filter(pk=obj_id).exists():
-                    raise forms.ValidationError("Объект не найден")
-            except (ValueError, ContentType.DoesNotExist):
+                activities.parse_activity_key(data)
+            except ValueError:
                 raise forms.ValidationError("Некорректный формат выбора")
+            # Проверяем по тому же кэшу, из которого выбирает виджет
+            if data not in dict(activities.get_activity_choices()):
+                raise forms.ValidationError("Объект не найден")
         return data
 
     def save(self, commit=True):
         activity_choice = self.cleaned_data.get('activity_obj')
         if activity_choice:
-            ct_id, obj_id = activity_choice.split(':')
-            self.instance.content_type_id = int(ct_id)
-            self.instance.object_id = int(obj_id)
+            ct_id, obj_id = activities.parse_activity_key(activity_choice)
+            self.instance.content_type_id = ct_id
+            self.instance.object_id = obj_id
         else:
             # Если ничего не выбрано — обнуляем связь
             self.instance.content_type = None
@@ -91,7 +127,8 @@ class ActivityLinkForm(forms.ModelForm):
    
     def clean(self):
         cleaned_data = super().clean()
-        print("Ошибки формы:", self.errors)
+        if self.errors:
+            logger.debug('Ошибки формы: %s', self.errors.as_json())
         return cleaned_data
         
 
@@ -134,6 +171,29 @@ class SubLocationAdmin(admin.ModelAdmin):
     autocomplete_fields = ('monsters',)
     inlines = [ActivityLinkInline]
 
+    def get_urls(self):
+        return [
+            path('activity-autocomplete/',
+                 self.admin_site.admin_view(self.activity_autocomplete),
+                 name='game_sublocation_activity_autocomplete'),
+            *super().get_urls(),
+        ]
+
+    def activity_autocomplete(self, request):
+        """Страница активностей для ActivityAutocomplete (формат select2)."""
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        choices, more = activities.search_activities(
+            request.GET.get('term', ''), page)
+        return JsonResponse({
+            'results': [{'id': key, 'text': label} for key, label in choices],
+            'pagination': {'more': more},
+        })
+
     def levels(self, obj):
         return f'{obj.min_level} - {obj.max_level}'
     levels.short_description = 'Уровни локации'  # Подпись в админке
@@ -158,7 +218,11 @@ class WalletAdmin(admin.ModelAdmin):
     list_filter = (
         'currency',
     )
-    search_fields = ('user',)
+    list_select_related = ('user', 'currency')
+    search_fields = ('user__nickname',)
+    raw_id_fields = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Monster)
@@ -167,6 +231,8 @@ class MonsterAdmin(admin.ModelAdmin):
         'name',
         'level',
         'xp_reward',
+        'spawn_count',
+        'respawn_seconds',
         'avatar',
     )
     prepopulated_fields = {'slug': ('name',)}
@@ -196,6 +262,8 @@ class MonsterDropAdmin(admin.ModelAdmin):
         'amount',
         'chance_percent'
     )
+    list_select_related = ('monster', 'currency', 'item')
+    autocomplete_fields = ('monster', 'item')
 
     def amount(self, obj):
         return f'{obj.min_amount} - {obj.max_amount}'
@@ -208,9 +276,12 @@ class ItemStackAdmin(admin.ModelAdmin):
         'item',
         'quantity',
     )
-    search_fields = (
-        'owner',
-    )
+    list_select_related = ('owner', 'item')
+    search_fields = ('owner__nickname', 'item__name')
+    raw_id_fields = ('owner',)
+    autocomplete_fields = ('item',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(ItemInstance)
 class ItemInstanceAdmin(admin.ModelAdmin):
@@ -219,6 +290,63 @@ class ItemInstanceAdmin(admin.ModelAdmin):
         'item',
         'world_id'
     )
+    list_select_related = ('owner', 'item')
+    search_fields = ('owner__nickname', 'item__name')
+    raw_id_fields = ('owner',)
+    autocomplete_fields = ('item',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_readonly_fields(self, request, obj=None):
+        # Владелец надетого предмета меняется только вместе с экипировкой
+        if obj is not None and hasattr(obj, 'equipment'):
+            return ('owner',)
+        return ()
+
+@admin.register(Equipment)
+class EquipmentAdmin(admin.ModelAdmin):
+    """Только просмотр: экипировку меняет game.services.equipment."""
+    list_display = (
+        'owner',
+        'slot',
+        'instance',
+    )
+    list_select_related = ('owner', 'instance__item', 'instance__owner')
+    raw_id_fields = ('owner', 'instance')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(ActionLog)
+class ActionLogAdmin(admin.ModelAdmin):
+    """Только просмотр: журнал пишет game.services.action_log."""
+    list_display = (
+        'created_at',
+        'user',
+        'action',
+        'payload',
+    )
+    list_filter = ('action',)
+    list_select_related = ('user',)
+    # Точный COUNT(*) по журналу слишком дорогой
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(Shop)
 class ShopAdmin(admin.ModelAdmin):
@@ -0,0 +1,2 @@
+# Версионированный JSON API игровых действий.
+# Каждая версия — отдельный модуль со своими urlpatterns.
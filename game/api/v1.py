@@ -0,0 +1,155 @@
+"""JSON API v1: игровые действия без редиректов.
+
+Ответ на успешное действие: {"ok": true, "delta": {...}} — только
+изменившиеся значения состояния игрока. Ошибки:
+{"ok": false, "error": "<код>", "message": "<текст>"}.
+
+Бой, телепорт и сделка принимают заголовок Idempotency-Key: повтор
+запроса с тем же ключом вернёт первый ответ (game.idempotency).
+"""
+from functools import wraps
+from typing import cast
+
+from django.http import JsonResponse
+from django.urls import path
+from django.views.decorators.http import require_POST
+
+from game.exceptions import (
+    EquipError,
+    FightCooldown,
+    GameError,
+    MonsterNotSpawned,
+    TradeError,
+)
+from game.idempotency import idempotent
+from game.services import actions, world
+from users.models import CustomUser
+
+app_name = 'api_v1'
+
+# Компактный JSON: без пробелов и без \uXXXX для кириллицы
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def _ok(delta: dict) -> JsonResponse:
+    return JsonResponse({'ok': True, 'delta': delta},
+                        json_dumps_params=JSON_PARAMS)
+
+
+def _error(code: str, message: str, status: int) -> JsonResponse:
+    return JsonResponse(
+        {'ok': False, 'error': code, 'message': message},
+        status=status, json_dumps_params=JSON_PARAMS)
+
+
+def api_login_required(view):
+    """Как login_required, но вместо редиректа на логин отвечает 401."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error('unauthorized', 'Требуется авторизация', 401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _get_target(global_location_slug, sublocation_slug):
+    """Глобальная локация и саблокация из снимка мира (или None, None)."""
+    snapshot = world.get_world()
+    global_location = snapshot.get_global_location(global_location_slug)
+    sublocation = snapshot.get_sublocation(sublocation_slug, global_location)
+    if global_location is None or sublocation is None:
+        return None, None
+    return global_location, sublocation
+
+
+@require_POST
+@api_login_required
+@idempotent
+def attack_monster(request, monster_slug):
+    monster = world.get_world().monsters_by_slug.get(monster_slug)
+    if monster is None:
+        return _error('not_found', 'Монстр не найден', 404)
+    user = cast(CustomUser, request.user)
+    try:
+        return _ok(actions.attack_monster(user, monster))
+    except FightCooldown as e:
+        return _error('cooldown', str(e), 429)
+    except MonsterNotSpawned as e:
+        return _error('not_spawned', str(e), 409)
+
+
+@require_POST
+@api_login_required
+def start_travel(request, global_location_slug, sublocation_slug):
+    global_location, sublocation = _get_target(global_location_slug,
+                                               sublocation_slug)
+    if sublocation is None:
+        return _error('not_found', 'Локация не найдена', 404)
+    user = cast(CustomUser, request.user)
+    return _ok(actions.start_travel(user, global_location, sublocation))
+
+
+@require_POST
+@api_login_required
+@idempotent
+def teleport(request, global_location_slug, sublocation_slug):
+    global_location, sublocation = _get_target(global_location_slug,
+                                               sublocation_slug)
+    if sublocation is None:
+        return _error('not_found', 'Локация не найдена', 404)
+    user = cast(CustomUser, request.user)
+    return _ok(actions.teleport(user, global_location, sublocation))
+
+
+@require_POST
+@api_login_required
+@idempotent
+def trade(request):
+    try:
+        item_id = int(request.POST.get('item_id', ''))
+        quantity = int(request.POST.get('quantity', 1))
+    except ValueError:
+        return _error('bad_request', 'Некорректный предмет или количество',
+                      400)
+    user = cast(CustomUser, request.user)
+    try:
+        return _ok(actions.trade_item(
+            user,
+            request.POST.get('source'),
+            item_id,
+            quantity,
+            request.POST.get('world_id') or None,
+        ))
+    except TradeError as e:
+        return _error('trade_failed', str(e), 409)
+    except GameError as e:
+        return _error('game_error', str(e), 409)
+
+
+@require_POST
+@api_login_required
+def equip(request, world_id):
+    user = cast(CustomUser, request.user)
+    try:
+        return _ok(actions.equip_item(user, world_id))
+    except EquipError as e:
+        return _error('equip_failed', str(e), 409)
+
+
+@require_POST
+@api_login_required
+def unequip(request, slot):
+    user = cast(CustomUser, request.user)
+    return _ok(actions.unequip_item(user, slot))
+
+
+urlpatterns = [
+    path('attack/<slug:monster_slug>/', attack_monster, name='attack_monster'),
+    path('travel/<slug:global_location_slug>/<slug:sublocation_slug>/',
+         start_travel, name='start_travel'),
+    path('teleport/<slug:global_location_slug>/<slug:sublocation_slug>/',
+         teleport, name='teleport'),
+    path('trade/', trade, name='trade'),
+    path('equip/<uuid:world_id>/', equip, name='equip'),
+    path('unequip/<slug:slot>/', unequip, name='unequip'),
+]
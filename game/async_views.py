@@ -0,0 +1,162 @@
+"""Асинхронные версии «горячих» игровых представлений для ASGI.
+
+Работают параллельно с синхронными из views.py (URL с префиксом async/),
+чтобы их можно было сравнить командой compare_async_views.
+"""
+import logging
+from typing import cast
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.utils import timezone
+
+from game.exceptions import FightCooldown, MonsterNotSpawned
+from game.idempotency import idempotent
+from game.metrics import TRAVEL_COMPLETED
+from game.services import action_log, actions, inventory, trade, world
+from users.backends import abump_user_version
+from users.models import CustomUser, PlayerTravel
+
+from .views import _or_404
+
+logger = logging.getLogger(__name__)
+
+arender = sync_to_async(render)
+
+
+async def _auser(request) -> CustomUser:
+    """Загружает пользователя и подставляет его в request.user,
+    чтобы шаблоны и контекстные процессоры не грузили его повторно.
+    """
+    user = cast(CustomUser, await request.auser())
+    request.user = user
+    return user
+
+
+def _redirect_to_sublocation(snapshot: world.WorldSnapshot,
+                             sublocation_id: int):
+    sublocation = snapshot.sublocations[sublocation_id]
+    return redirect(
+        'game:sublocation',
+        global_location_slug=sublocation.global_location.slug,
+        sublocation_slug=sublocation.slug
+    )
+
+
+@login_required
+@idempotent
+async def attack_monster(request, global_location_slug, sublocation_slug,
+                         monster_slug):
+    """Бой с монстром: та же логика, что у actions.attack_monster.
+
+    Бой выполняется в потоке одним вызовом сервиса.
+    """
+    snapshot = await world.aget_world()
+    monster = _or_404(snapshot.monsters_by_slug.get(monster_slug))
+    user = await _auser(request)
+    try:
+        await sync_to_async(actions.attack_monster)(user, monster)
+    except FightCooldown:
+        pass
+    except MonsterNotSpawned as e:
+        messages.error(request, str(e))
+    return _redirect_to_sublocation(snapshot, user.current_sublocation_id)
+
+
+@login_required
+async def travel_status(request):
+    """Статус ожидания перемещения"""
+    user = await _auser(request)
+    if not user.travel_destination_id or not user.travel_started_at:
+        return redirect('game:hunting_zones')
+    snapshot = await world.aget_world()
+    destination = snapshot.sublocations[user.travel_destination_id]
+    time_from_start = timezone.now() - user.travel_started_at
+    time_remained = user.travel_time - time_from_start.total_seconds()
+
+    if time_remained <= 0:
+        await PlayerTravel.objects.filter(user_id=user.pk).aupdate(
+            current_sublocation=destination,
+            current_global_location=destination.global_location,
+            travel_destination=None,
+            travel_time=0,
+            travel_started_at=None,
+        )
+        await abump_user_version(user.pk)
+        TRAVEL_COMPLETED.inc()
+        await action_log.arecord(user.pk, 'arrive', sublocation=destination.pk)
+        if destination.slug != 'gorodskaya-ploshad':
+            return _redirect_to_sublocation(snapshot, destination.pk)
+        else:
+            return redirect(
+                'game:city'
+            )
+
+    context = {
+        'destination': destination,
+        'time_remained': int(time_remained)
+    }
+    return await arender(request, 'game/travel_status.html', context)
+
+
+@login_required
+async def trader_test(request):
+    """
+    Страница торговца.
+    """
+    user = await _auser(request)
+    context = {
+        'player_inventory': await inventory.aget_user_inventory_data(user),
+        'trader_items': await inventory.aget_shop_inventory_data(
+            trade.TRADER_SHOP),
+        'trade_url': reverse('game:async_trade'),
+    }
+    return await arender(request, 'game/trader.html', context)
+
+
+@login_required
+@idempotent
+async def trade_view(request):
+    if request.method == 'POST':
+        user = await _auser(request)
+        try:
+            item_id = int(request.POST.get('item_id', ''))
+            quantity = int(request.POST.get('quantity', 1))
+        except ValueError:
+            messages.error(request, "Некорректный предмет или количество")
+            return redirect('game:async_trader_test')
+        source = request.POST.get('source')
+        world_id = request.POST.get('world_id') or None
+
+        if source == 'shop':
+            success, error = await trade.abuy_item(
+                user, item_id, quantity, world_id)
+            if success:
+                messages.success(request, f"Куплено: {quantity} шт.")
+            else:
+                messages.error(request, f"Ошибка покупки: {error}")
+        elif source == 'player':
+            success, error = await trade.asell_item(
+                user, item_id, quantity, world_id)
+            if success:
+                messages.success(request, f"Продано: {quantity} шт.")
+            else:
+                messages.error(request, f"Ошибка продажи: {error}")
+        else:
+            messages.error(request, "Неверный источник сделки")
+    return redirect('game:async_trader_test')
+
+
+@login_required
+async def player_character(request):
+    """Страница с данными о своём персонаже"""
+    user = await _auser(request)
+    context = {
+        'hide_left_sidebar': True,
+        'hide_right_sidebar': True,
+        'inventory_display': await inventory.aget_user_stacks_data(user),
+    }
+    return await arender(request, 'game/player_character.html', context)
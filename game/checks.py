@@ -0,0 +1,29 @@
+"""Системные проверки настроек игры (manage.py check)."""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+from corelight.caches import get_backend, is_in_database, is_shared
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Кэш должен быть общим для всех воркеров и не жить в БД.
+
+    Места спавна (game/services/spawns.py), версия контента мира и
+    ключи идемпотентности живут в кэше: в LocMemCache у каждого
+    процесса свои особи, а run_spawner не видит убитых в воркерах.
+    DatabaseCache общий, но превращает каждое чтение кэша в SQL-запрос
+    к основной базе. С DEBUG — только предупреждение: runserver
+    работает в одном процессе.
+    """
+    if not is_shared():
+        message = f'Кэш {get_backend()} не общий для процессов'
+    elif is_in_database():
+        message = (f'Кэш {get_backend()} хранится в БД: каждое чтение '
+                   f'кэша — SQL-запрос')
+    else:
+        return []
+    hint = 'Укажите CACHE_BACKEND: Redis или Memcached'
+    if settings.DEBUG:
+        return [Warning(message, hint=hint, id='game.W001')]
+    return [Error(message, hint=hint, id='game.E001')]
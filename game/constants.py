@@ -14,6 +14,19 @@ ITEM_TYPE_CHOICES = [
     ('QUEST', 'Квестовый'),
 ]
 
+# Действия в журнале game.models.ActionLog
+ACTION_CHOICES = [
+    ('fight', 'Бой'),
+    ('loot', 'Добыча'),
+    ('buy', 'Покупка'),
+    ('sell', 'Продажа'),
+    ('travel', 'Перемещение'),
+    ('teleport', 'Телепорт'),
+    ('arrive', 'Прибытие'),
+    ('equip', 'Надевание'),
+    ('unequip', 'Снятие'),
+]
+
 SLOT_CHOICES = [
         ('HEAD', 'Голова'),
         ('CHEST', 'Тело'),
@@ -4,7 +4,21 @@ from django.utils import timezone
 
 from users.models import CustomUser
 
+from . import stat_schema
 from .constants import FIGHT_COOLDOWN_SECONDS
+from .services import world
+
+# Характеристики левой панели: подпись -> индекс в векторе
+SIDEBAR_STATS = (
+    ('Сила', stat_schema.STRENGTH),
+    ('Защита', stat_schema.DEFENSE),
+    ('Ловкость', stat_schema.DEXTERITY),
+    ('Выносливость', stat_schema.STAMINA),
+    ('Интеллект', stat_schema.INTELLIGENCE),
+    ('Дух', stat_schema.SPIRIT),
+    ('Воля', stat_schema.WILLPOWER),
+    ('Удача', stat_schema.LUCK),
+)
 
 
 def current_user_data(request):
@@ -24,6 +38,7 @@ def current_user_data(request):
     }
     if request.user.is_authenticated:
         user = cast(CustomUser, request.user)
+        snapshot = world.get_world()
         # ---- Считаем кулдаун между атаками ----
         cooldown = 0
         on_cooldown = False
@@ -36,16 +51,10 @@ def current_user_data(request):
         # ---------------------------------------
 
         # ---- Готовим списки статов для отображения ----
-        stats = {
-                'Сила': user.strength,
-                'Защита': user.defense,
-                'Ловкость': user.dexterity,
-                'Выносливость': user.stamina,
-                'Интеллект': user.intelligence,
-                'Дух': user.spirit,
-                'Воля': user.willpower,
-                'Удача': user.luck,
-        }
+        # Итоговые значения с учётом экипировки (player_stats.effective_stats)
+        effective_stats = user.effective_stats
+        stats = {name: effective_stats[index]
+                 for name, index in SIDEBAR_STATS}
 
         stats_with_desc = [
             {'name': k, 'value': v, 'desc': STATS_DESCRIPTIONS.get(k, '')}
@@ -68,8 +77,10 @@ def current_user_data(request):
                     'nickname': user.nickname,
                     'level': user.level,
                     'avatar_path': user.avatar,
-                    'current_global_location': user.current_global_location,
-                    'current_sublocation': user.current_sublocation,
+                    'current_global_location': snapshot.global_locations.get(
+                        user.current_global_location_id),
+                    'current_sublocation': snapshot.sublocations.get(
+                        user.current_sublocation_id),
                     'left_stats': left_stats,
                     'right_stats': right_stats,
                     'max_hp': user.max_hp,
@@ -87,3 +98,14 @@ def current_user_data(request):
         return {
             'current_user_data': None
         }
+
+
+def world_content(request):
+    """
+    Добавляет версию игрового контента для ключей
+    кэширования фрагментов шаблонов.
+    """
+    return {
+        'world_version': world.get_world_version(),
+        'world_cache_timeout': world.get_world_cache_timeout(),
+    }
@@ -26,6 +26,22 @@ class AddDropListInInventoryError(GameError):
     """Не удалось добавить дроп-лист в инвентарь игрока"""
 
 
+class FightCooldown(GameError):
+    """Игрок ещё не отдохнул после прошлого боя"""
+
+
+class MonsterNotSpawned(GameError):
+    """Живых особей монстра в саблокации игрока нет"""
+
+
+class TradeError(GameError):
+    """Сделка с магазином не состоялась"""
+
+
+class EquipError(GameError):
+    """Предмет нельзя надеть или снять"""
+
+
 class TheBigDelta(Exception):
     pass
 
@@ -37,8 +53,8 @@ class NoWorldID(Exception):
 class WorldIDItemFalseDelta(Exception):
     pass
 
-class NoItemInInventory(Exception):
-    pass
+class NoItemInInventory(GameError):
+    """Предмета нет в инвентаре (или его нельзя забрать)"""
 
 class NoItemForWorldId(Exception):
     pass
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""Ключи идемпотентности для игровых действий.
+
+Двойной клик и повтор запроса браузером выполняли бы действие заново:
+вторая покупка, второй свиток телепорта, лишний бой. Клиент передаёт
+ключ (заголовок Idempotency-Key или поле idempotency_key), а
+декоратор @idempotent сохраняет первый ответ на этот ключ в общем кэше
+на IDEMPOTENCY_TIMEOUT секунд. Повтор с тем же ключом получает
+сохранённый ответ, не доходя до представления и БД.
+
+Пока первый запрос выполняется, ключ занят меткой (cache.add атомарен
+на любом бэкенде): повтор ждёт до IDEMPOTENCY_WAIT_SECONDS и отдаёт
+готовый ответ, иначе — 409. Ключ, повторно присланный с другими
+данными, — ошибка клиента (422). Запросы без ключа выполняются как
+раньше.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+HEADER = 'Idempotency-Key'
+FIELD = 'idempotency_key'
+MAX_KEY_LENGTH = 128
+# Заголовок ответа, отданного из кэша
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+# Метка ключа, по которому запрос ещё выполняется
+PENDING = 'pending'
+POLL_SECONDS = 0.05
+
+
+def get_idempotency_timeout() -> int:
+    """Сколько секунд хранится ответ на ключ."""
+    return getattr(settings, 'IDEMPOTENCY_TIMEOUT', 24 * 60 * 60)
+
+
+def get_lock_timeout() -> int:
+    """Сколько секунд ключ занят выполняющимся запросом.
+
+    Если воркер упал посреди действия, ключ освободится сам.
+    """
+    return getattr(settings, 'IDEMPOTENCY_LOCK_SECONDS', 30)
+
+
+def get_wait_seconds() -> float:
+    """Сколько повтор ждёт ответа на выполняющийся запрос."""
+    return getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 5)
+
+
+def _error(code: str, message: str, status: int) -> JsonResponse:
+    # Формат ошибок JSON API (game.api.v1)
+    return JsonResponse(
+        {'ok': False, 'error': code, 'message': message}, status=status,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def get_key(request) -> str | None:
+    """Ключ идемпотентности запроса (None, если клиент его не прислал)."""
+    return (request.headers.get(HEADER) or request.POST.get(FIELD)
+            or request.GET.get(FIELD) or None)
+
+
+def _cache_key(user_id, key: str) -> str:
+    # Ключ клиента произвольный: в ключ кэша идёт его хеш
+    digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+    return f'idempotency:{user_id}:{digest}'
+
+
+def _fingerprint(request) -> str:
+    """Отпечаток запроса: тот же ключ с другими данными — ошибка."""
+    data = sorted((name, request.POST.getlist(name))
+                  for name in request.POST
+                  if name not in (FIELD, 'csrfmiddlewaretoken'))
+    payload = json.dumps([request.method, request.path, data])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _stored(fingerprint: str, response) -> tuple:
+    """Ответ в виде, пригодном для кэша."""
+    return (fingerprint, response.status_code, dict(response.headers),
+            response.content)
+
+
+def _replay(fingerprint: str, stored) -> HttpResponse:
+    if stored == PENDING or stored is None:
+        # Первый запрос не успел за время ожидания
+        return _error('in_progress', 'Запрос с этим ключом ещё выполняется',
+                      409)
+    stored_fingerprint, status, headers, content = stored
+    if stored_fingerprint != fingerprint:
+        return _error('key_reused',
+                      'Ключ уже использован для другого запроса', 422)
+    response = HttpResponse(content, status=status, headers=headers)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _check_key(key: str) -> HttpResponse | None:
+    if len(key) > MAX_KEY_LENGTH:
+        return _error('bad_request', 'Слишком длинный ключ идемпотентности',
+                      400)
+    return None
+
+
+def _save(cache_key: str, fingerprint: str, response):
+    if response.status_code >= 500 or getattr(response, 'streaming', False):
+        # Ошибку сервера клиент может повторить с тем же ключом
+        cache.delete(cache_key)
+    else:
+        cache.set(cache_key, _stored(fingerprint, response),
+                  get_idempotency_timeout())
+
+
+async def _asave(cache_key: str, fingerprint: str, response):
+    if response.status_code >= 500 or getattr(response, 'streaming', False):
+        await cache.adelete(cache_key)
+    else:
+        await cache.aset(cache_key, _stored(fingerprint, response),
+                         get_idempotency_timeout())
+
+
+def idempotent(view):
+    """Декоратор представления игрового действия.
+
+    Ставится под login_required: ключи хранятся отдельно для каждого
+    игрока. Подходит и для синхронных, и для асинхронных представлений.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            key = get_key(request)
+            if key is None:
+                return await view(request, *args, **kwargs)
+            error = _check_key(key)
+            if error is not None:
+                return error
+            user = await request.auser()
+            cache_key = _cache_key(user.pk, key)
+            fingerprint = _fingerprint(request)
+            if not await cache.aadd(cache_key, PENDING, get_lock_timeout()):
+                deadline = time.monotonic() + get_wait_seconds()
+                stored = await cache.aget(cache_key)
+                while stored == PENDING and time.monotonic() < deadline:
+                    await asyncio.sleep(POLL_SECONDS)
+                    stored = await cache.aget(cache_key)
+                return _replay(fingerprint, stored)
+            try:
+                response = await view(request, *args, **kwargs)
+            except BaseException:
+                await cache.adelete(cache_key)
+                raise
+            await _asave(cache_key, fingerprint, response)
+            return response
+
+        return markcoroutinefunction(async_wrapper)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = get_key(request)
+        if key is None:
+            return view(request, *args, **kwargs)
+        error = _check_key(key)
+        if error is not None:
+            return error
+        cache_key = _cache_key(request.user.pk, key)
+        fingerprint = _fingerprint(request)
+        if not cache.add(cache_key, PENDING, get_lock_timeout()):
+            deadline = time.monotonic() + get_wait_seconds()
+            stored = cache.get(cache_key)
+            while stored == PENDING and time.monotonic() < deadline:
+                time.sleep(POLL_SECONDS)
+                stored = cache.get(cache_key)
+            return _replay(fingerprint, stored)
+        try:
+            response = view(request, *args, **kwargs)
+        except BaseException:
+            cache.delete(cache_key)
+            raise
+        _save(cache_key, fingerprint, response)
+        return response
+
+    return wrapper
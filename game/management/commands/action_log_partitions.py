@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from game.services import action_log
+
+
+class Command(BaseCommand):
+    help = ('Создаёт месячные секции журнала действий заранее и удаляет '
+            'старые (PostgreSQL, запускать по cron раз в сутки)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=2,
+                            help='На сколько месяцев вперёд создать секции')
+        parser.add_argument('--keep-months', type=int, default=None,
+                            help='Удалить секции старше N месяцев')
+
+    def handle(self, *args, **options):
+        created = action_log.ensure_partitions(options['months_ahead'])
+        if not created:
+            self.stdout.write('Журнал не секционирован (не PostgreSQL)')
+            return
+        self.stdout.write(f'Секции: {", ".join(created)}')
+        if options['keep_months'] is not None:
+            dropped = action_log.drop_partitions(options['keep_months'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Удалено секций: {len(dropped)}'))
@@ -0,0 +1,58 @@
+import statistics
+import time
+
+import psycopg
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from corelight.db import get_pool_stats
+
+
+def _report(name: str, timings: list[float]) -> str:
+    cuts = statistics.quantiles(timings, n=100)
+    return (f'{name:<22} mean={statistics.mean(timings) * 1000:7.2f}ms  '
+            f'p50={cuts[49] * 1000:7.2f}ms  p95={cuts[94] * 1000:7.2f}ms')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает стоимость «соединение на запрос» '
+            'и выдачи соединения из пула psycopg')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError('Нужна база PostgreSQL')
+        iterations = options['iterations']
+
+        # Без пула: TCP + аутентификация на каждый «запрос»
+        params = connection.get_connection_params()
+        direct = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            with psycopg.connect(**params) as conn:
+                conn.execute('SELECT 1')
+            direct.append(time.perf_counter() - started)
+        self.stdout.write(_report('новое соединение', direct))
+
+        pool = getattr(connection, 'pool', None)
+        if pool is None:
+            self.stdout.write('Пул выключен (DB_POOL=0), сравнение пропущено')
+            return
+        # Django открывает пул при первом соединении
+        connection.ensure_connection()
+        connection.close()
+        pooled = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            with pool.connection() as conn:
+                conn.execute('SELECT 1')
+            pooled.append(time.perf_counter() - started)
+        self.stdout.write(_report('соединение из пула', pooled))
+        self.stdout.write(
+            f'Экономия на запрос: '
+            f'{(statistics.mean(direct) - statistics.mean(pooled)) * 1000:.2f}ms')
+        self.stdout.write(f'Статистика пула: {get_pool_stats(options["database"])}')
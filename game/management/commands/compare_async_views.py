@@ -0,0 +1,117 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from game.services import world
+from users.models import CustomUser
+
+
+def _summary(latencies: list[float], errors: int, elapsed: float) -> str:
+    """Строка отчёта: запросы в секунду и перцентили задержки"""
+    if len(latencies) < 2:
+        return f'{len(latencies)} ответов, ошибок: {errors}'
+    cuts = statistics.quantiles(latencies, n=100)
+    return (f'{len(latencies) / elapsed:8.1f} req/s  '
+            f'p50={cuts[49] * 1000:6.1f}ms  p95={cuts[94] * 1000:6.1f}ms  '
+            f'ошибок: {errors}')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность синхронных '
+            'и асинхронных версий игровых представлений')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True,
+                            help='Игрок, от имени которого идут запросы')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на каждую страницу')
+        parser.add_argument('--concurrency', type=int, default=20,
+                            help='Одновременных запросов')
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(username=options['username'])
+        except CustomUser.DoesNotExist:
+            raise CommandError('Игрок не найден')
+
+        # Тестовые клиенты ходят с Host: testserver
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(ALLOWED_HOSTS=allowed_hosts):
+            for sync_url, async_url in self._url_pairs(user):
+                self.stdout.write(sync_url)
+                self.stdout.write(
+                    '  sync : ' + self._run_sync(user, sync_url, options))
+                self.stdout.write(
+                    '  async: ' + asyncio.run(
+                        self._run_async(user, async_url, options)))
+
+    def _url_pairs(self, user):
+        pairs = [
+            (reverse('game:travel_status'),
+             reverse('game:async_travel_status')),
+            (reverse('game:trader_test'),
+             reverse('game:async_trader_test')),
+            (reverse('player_character'),
+             reverse('game:async_player_character')),
+        ]
+        snapshot = world.get_world()
+        sublocation = snapshot.sublocations.get(user.current_sublocation_id)
+        monsters = snapshot.sublocation_monsters.get(
+            user.current_sublocation_id)
+        if sublocation and monsters:
+            kwargs = {
+                'global_location_slug': sublocation.global_location.slug,
+                'sublocation_slug': sublocation.slug,
+                'monster_slug': monsters[0].slug,
+            }
+            pairs.append((reverse('game:attack_monster', kwargs=kwargs),
+                          reverse('game:async_attack_monster', kwargs=kwargs)))
+        return pairs
+
+    def _run_sync(self, user, url, options):
+        def worker(count):
+            client = Client()
+            client.force_login(user)
+            latencies, errors = [], 0
+            for _ in range(count):
+                started = time.perf_counter()
+                response = client.get(url)
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code >= 400
+            return latencies, errors
+
+        concurrency = options['concurrency']
+        per_worker = max(1, options['requests'] // concurrency)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(worker, [per_worker] * concurrency))
+        elapsed = time.perf_counter() - started
+        return _summary([lat for res in results for lat in res[0]],
+                        sum(res[1] for res in results), elapsed)
+
+    async def _run_async(self, user, url, options):
+        async def worker(count):
+            client = AsyncClient()
+            await client.aforce_login(user)
+            latencies, errors = [], 0
+            for _ in range(count):
+                started = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code >= 400
+            return latencies, errors
+
+        concurrency = options['concurrency']
+        per_worker = max(1, options['requests'] // concurrency)
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(worker(per_worker) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        return _summary([lat for res in results for lat in res[0]],
+                        sum(res[1] for res in results), elapsed)
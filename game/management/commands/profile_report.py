@@ -0,0 +1,128 @@
+import json
+import re
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# 'функция (файл:строка)' — подпись кадра из corelight.profiling
+FRAME_RE = re.compile(r'^(?P<name>.*) \((?P<file>.*):(?P<line>\d+)\)$')
+SPEEDSCOPE_SCHEMA = 'https://www.speedscope.app/file-format-schema.json'
+
+
+def read_collapsed(paths) -> Counter:
+    """Складывает стеки из файлов collapsed stacks."""
+    stacks = Counter()
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                stack, _, n = line.rstrip('\n').rpartition(' ')
+                if stack and n.isdigit():
+                    stacks[stack] += int(n)
+    return stacks
+
+
+def to_speedscope(name: str, stacks: Counter) -> dict:
+    """Профиль в формате speedscope (sampled), открывается в speedscope.app."""
+    frames, index = [], {}
+    samples, weights = [], []
+    for stack, n in stacks.most_common():
+        sample = []
+        for label in stack.split(';'):
+            if label not in index:
+                index[label] = len(frames)
+                match = FRAME_RE.match(label)
+                frames.append(
+                    {'name': match['name'], 'file': match['file'],
+                     'line': int(match['line'])}
+                    if match else {'name': label})
+            sample.append(index[label])
+        samples.append(sample)
+        weights.append(n)
+    total = sum(weights)
+    return {
+        '$schema': SPEEDSCOPE_SCHEMA,
+        'name': name,
+        'exporter': 'corelight.profiling',
+        'activeProfileIndex': 0,
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'none',
+            'startValue': 0,
+            'endValue': total,
+            'samples': samples,
+            'weights': weights,
+        }],
+    }
+
+
+def top_frames(stacks: Counter, limit: int) -> list[tuple[str, int]]:
+    """Кадры с наибольшим собственным временем (вершины стеков)."""
+    leaves = Counter()
+    for stack, n in stacks.items():
+        leaves[stack.rsplit(';', 1)[-1]] += n
+    return leaves.most_common(limit)
+
+
+class Command(BaseCommand):
+    help = ('Собирает стеки семплирующего профилировщика во флеймграфы '
+            '(speedscope и collapsed) по именам URL')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None,
+                            help='Каталог профилей (PROFILING_DIR)')
+        parser.add_argument('--output', default=None,
+                            help='Куда писать отчёты (<dir>/reports)')
+        parser.add_argument('--url-name', default=None,
+                            help='Только этот URL (например game.trader_test)')
+        parser.add_argument('--since', default=None,
+                            help='Только профили не старше даты YYYY-MM-DD')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Сколько самых горячих функций показать')
+
+    def handle(self, *args, **options):
+        root = Path(options['dir'] or settings.PROFILING_DIR)
+        output = Path(options['output'] or root / 'reports')
+        if not root.is_dir():
+            raise CommandError(f'Нет каталога профилей: {root}')
+        since = None
+        if options['since']:
+            since = datetime.strptime(options['since'], '%Y-%m-%d')
+
+        directories = sorted(
+            path for path in root.iterdir()
+            if path.is_dir() and path != output
+            and options['url_name'] in (None, path.name))
+        if not directories:
+            raise CommandError('Профилей не найдено')
+        output.mkdir(parents=True, exist_ok=True)
+
+        for directory in directories:
+            files = [
+                path for path in directory.glob('*.collapsed')
+                if since is None
+                or datetime.fromtimestamp(path.stat().st_mtime) >= since
+            ]
+            stacks = read_collapsed(files)
+            if not stacks:
+                continue
+            url_name = directory.name
+            collapsed = output / f'{url_name}.collapsed'
+            collapsed.write_text(
+                ''.join(f'{stack} {n}\n' for stack, n in stacks.items()),
+                encoding='utf-8')
+            speedscope = output / f'{url_name}.speedscope.json'
+            speedscope.write_text(
+                json.dumps(to_speedscope(url_name, stacks)),
+                encoding='utf-8')
+
+            total = sum(stacks.values())
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{url_name}: {len(files)} файлов, {total} семплов'))
+            for label, n in top_frames(stacks, options['top']):
+                self.stdout.write(f'  {n / total:6.1%}  {label}')
+            self.stdout.write(f'  -> {speedscope}')
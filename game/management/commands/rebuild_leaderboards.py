@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from game.services import leaderboards
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает топы всех рейтингов в кэше запросами к БД '
+            '(страховка от потерянных обновлений, запускать по cron)')
+
+    def handle(self, *args, **options):
+        boards = leaderboards.all_boards()
+        for board in boards:
+            entries = board.rebuild()
+            self.stdout.write(f'{board.key}: {len(entries)} строк')
+        self.stdout.write(self.style.SUCCESS(
+            f'Перестроено рейтингов: {len(boards)}'))
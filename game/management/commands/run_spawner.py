@@ -0,0 +1,64 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from corelight.caches import get_backend, is_shared
+from game.services import spawns
+
+
+class Command(BaseCommand):
+    help = ('Планировщик популяций монстров: восстанавливает особи после '
+            'потери кэша и периодически сохраняет снимки в БД')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tick', type=float,
+            default=getattr(settings, 'SPAWN_TICK_SECONDS', 5),
+            help='Как часто проверять, не потерян ли кэш (секунды)')
+        parser.add_argument(
+            '--snapshot', type=float,
+            default=getattr(settings, 'SPAWN_SNAPSHOT_SECONDS', 60),
+            help='Как часто сохранять снимки (секунды)')
+        parser.add_argument('--once', action='store_true',
+                            help='Один проход: восстановить и сохранить')
+
+    def handle(self, *args, **options):
+        # В кэше процесса команда не увидела бы особей, убитых в воркерах
+        if not is_shared():
+            raise CommandError(
+                f'Кэш {get_backend()} не общий для процессов: '
+                f'run_spawner работает только с Redis, Memcached '
+                f'или DatabaseCache')
+        if options['once']:
+            self._restore()
+            self._save()
+            return
+
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        next_snapshot = time.monotonic() + options['snapshot']
+        while not stopping:
+            self._restore()
+            if time.monotonic() >= next_snapshot:
+                self._save()
+                next_snapshot = time.monotonic() + options['snapshot']
+            time.sleep(options['tick'])
+        # При остановке сохраняем последнее состояние
+        self._save()
+
+    def _restore(self):
+        restored = spawns.restore_snapshots()
+        if restored is not None:
+            self.stdout.write(f'Кэш потерян, восстановлено особей: {restored}')
+
+    def _save(self):
+        dead = spawns.save_snapshots()
+        self.stdout.write(f'Снимок сохранён, мёртвых особей: {dead}')
@@ -0,0 +1,218 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from game import stat_schema
+from game.constants import BASE_STATS
+from game.models import (
+    ActivityLink,
+    Currency,
+    GlobalLocation,
+    Item,
+    ItemInstance,
+    ItemStack,
+    Monster,
+    MonsterDrop,
+    Shop,
+    ShopItem,
+    SubLocation,
+    Wallet,
+)
+from game.services import world
+from game.services.actions import TELEPORT_SCROLL_SLUG
+from users.models import CustomUser, PlayerState, PlayerStats, PlayerTravel
+
+# Префикс slug/code синтетического контента
+PREFIX = 'syn'
+SUBLOCATIONS_PER_LOCATION = 3
+PLAYER_PASSWORD = 'synthetic'
+
+
+def _items(count: int) -> list[Item]:
+    """Предметы: половина хлама, четверть расходников, четверть оружия."""
+    items = []
+    for n in range(1, count + 1):
+        kind = n % 4
+        if kind in (0, 1):
+            params = {'item_type': 'JUNK'}
+        elif kind == 2:
+            params = {'item_type': 'CONSUMABLE'}
+        else:
+            params = {'item_type': 'WEAPON', 'slot': 'MAIN_HAND',
+                      'is_stacked': False, 'strength': n % 7 + 1}
+        items.append(Item(
+            name=f'Предмет {n}', code=f'{PREFIX}-item-{n}',
+            slug=f'{PREFIX}-item-{n}', cost=n * 3, is_sellable=True,
+            **params,
+        ))
+    return Item.objects.bulk_create(items)
+
+
+@transaction.atomic
+def seed_world(locations: int = 5,
+               monsters: int = 20,
+               players: int = 50,
+               items: int = 40,
+               seed: int = 0) -> dict:
+    """Создаёт синтетический мир для бенчмарков и нагрузочных тестов.
+
+    Город с рынком и магазином 'Походник', locations охотничьих
+    локаций по SUBLOCATIONS_PER_LOCATION саблокаций, monsters монстров
+    с таблицами дропа и players игроков с заполненным инвентарём.
+    Игроки получают логины '<PREFIX>-player-<n>' и пароль PLAYER_PASSWORD.
+
+    Returns:
+        Словарь с количеством созданных объектов.
+    """
+    if Item.objects.filter(code__startswith=f'{PREFIX}-').exists():
+        raise CommandError('Синтетический мир уже создан')
+    rng = random.Random(seed)
+
+    gold, _ = Currency.objects.get_or_create(
+        code='GOLD', defaults={'name': 'Золото'})
+    city, _ = GlobalLocation.objects.get_or_create(
+        slug='gorod', defaults={'name': 'Город', 'is_city': True})
+    SubLocation.objects.get_or_create(
+        slug='gorodskaya-ploshad',
+        defaults={'name': 'Городская площадь', 'global_location': city})
+    market, _ = SubLocation.objects.get_or_create(
+        slug='rynok', defaults={'name': 'Рынок', 'global_location': city})
+
+    sublocations = []
+    for i in range(1, locations + 1):
+        location = GlobalLocation.objects.create(
+            name=f'Локация {i}', slug=f'{PREFIX}-loc-{i}',
+            distance_to_the_city=i, min_level=1 + (i - 1) * 5,
+            max_level=i * 5)
+        sublocations += SubLocation.objects.bulk_create(
+            SubLocation(
+                name=f'Зона {i}.{j}', slug=f'{PREFIX}-loc-{i}-{j}',
+                global_location=location, distance_to_location_start=j * 2,
+                min_level=location.min_level, max_level=location.max_level)
+            for j in range(1, SUBLOCATIONS_PER_LOCATION + 1)
+        )
+
+    item_list = _items(items)
+    scroll, _ = Item.objects.get_or_create(
+        slug=TELEPORT_SCROLL_SLUG,
+        defaults={'name': 'Свиток телепорта', 'code': TELEPORT_SCROLL_SLUG,
+                  'cost': 10, 'item_type': 'CONSUMABLE'})
+    stackable = [item for item in item_list if item.is_stacked]
+    unique = [item for item in item_list if not item.is_stacked]
+
+    monster_list = Monster.objects.bulk_create(
+        Monster(name=f'Монстр {n}', slug=f'{PREFIX}-monster-{n}',
+                level=n % 30 + 1, stamina=rng.randint(1, 10),
+                strength=rng.randint(1, 10), xp_reward=rng.randint(10, 50),
+                # Под нагрузкой игроки не должны упираться в респавн
+                spawn_count=50, respawn_seconds=5)
+        for n in range(1, monsters + 1)
+    )
+    drops = []
+    for monster in monster_list:
+        for item in rng.sample(item_list, k=min(4, len(item_list))):
+            drops.append(MonsterDrop(
+                monster=monster, item_type='ITEM', item=item,
+                chance_percent=Decimal(rng.randint(5, 100)),
+                min_amount=1, max_amount=3 if item.is_stacked else 1))
+    MonsterDrop.objects.bulk_create(drops)
+
+    through = SubLocation.monsters.through
+    through.objects.bulk_create(
+        through(sublocation_id=sublocation.pk, monster_id=monster.pk)
+        for sublocation in sublocations
+        for monster in rng.sample(monster_list, k=min(4, len(monster_list)))
+    )
+
+    shop, _ = Shop.objects.get_or_create(name='Походник')
+    ShopItem.objects.bulk_create(
+        [ShopItem(shop=shop, item=item)
+         for item in [scroll, *item_list] if item.item_type != 'JUNK'],
+        ignore_conflicts=True)
+    shop_type = ContentType.objects.get_for_model(Shop)
+    if not ActivityLink.objects.filter(
+            content_type=shop_type, object_id=shop.pk).exists():
+        ActivityLink.objects.create(
+            sublocation=market, content_type=shop_type, object_id=shop.pk)
+
+    # Пароль хэшируется один раз: PBKDF2 на каждого игрока слишком долог
+    password = make_password(PLAYER_PASSWORD)
+    max_hp = BASE_STATS['stamina'] * 10 + 10
+    player_list = CustomUser.objects.bulk_create(
+        CustomUser(username=f'{PREFIX}-player-{n}', nickname=f'Игрок {n}',
+                   password=password)
+        for n in range(1, players + 1))
+    # bulk_create не сохраняет строки игрока — создаём их отдельно
+    PlayerState.objects.bulk_create(
+        PlayerState(user=player, current_hp=max_hp) for player in player_list)
+    PlayerStats.objects.bulk_create(
+        PlayerStats(user=player,
+                    effective_stats=stat_schema.BASE_VECTOR.tolist())
+        for player in player_list)
+    travels = []
+    for player in player_list:
+        sublocation = rng.choice(sublocations)
+        travels.append(PlayerTravel(
+            user=player, current_sublocation=sublocation,
+            current_global_location_id=sublocation.global_location_id))
+    PlayerTravel.objects.bulk_create(travels)
+
+    Wallet.objects.bulk_create(
+        Wallet(user=player, currency=gold, amount=10_000)
+        for player in player_list)
+    # Инвентарь заполнен: стаки и уникальные предметы на все слоты
+    unique_slots = min(4, len(unique))
+    stack_slots = min(BASE_STATS['item_slots'] - unique_slots,
+                      len(stackable))
+    stacks, instances = [], []
+    for player in player_list:
+        stacks += [ItemStack(owner=player, item=item,
+                             quantity=rng.randint(1, 50))
+                   for item in rng.sample(stackable, k=stack_slots)]
+        instances += [ItemInstance(owner=player, item=item)
+                      for item in rng.sample(unique, k=unique_slots)]
+    ItemStack.objects.bulk_create(stacks)
+    ItemInstance.objects.bulk_create(instances)
+
+    # bulk_create не шлёт сигналы — версию мира повышаем сами
+    world.bump_world_version()
+    return {
+        'locations': locations,
+        'sublocations': len(sublocations),
+        'monsters': len(monster_list),
+        'drops': len(drops),
+        'items': len(item_list),
+        'players': len(player_list),
+        'stacks': len(stacks),
+        'instances': len(instances),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетический мир (локации, монстры с дропом, '
+            'игроки с полным инвентарём) для бенчмарков и нагрузки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locations', type=int, default=5)
+        parser.add_argument('--monsters', type=int, default=20)
+        parser.add_argument('--players', type=int, default=50)
+        parser.add_argument('--items', type=int, default=40)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора случайных чисел')
+
+    def handle(self, *args, **options):
+        created = seed_world(
+            locations=options['locations'],
+            monsters=options['monsters'],
+            players=options['players'],
+            items=options['items'],
+            seed=options['seed'],
+        )
+        for name, count in created.items():
+            self.stdout.write(f'{name:14} {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Пароль игроков {PREFIX}-player-N: {PLAYER_PASSWORD}'))
@@ -0,0 +1,431 @@
+import asyncio
+import json
+import multiprocessing
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from game.management.commands.seed_world import PLAYER_PASSWORD, PREFIX
+from game.models import ItemStack
+from game.services import world
+from users.backends import bump_user_version
+from users.models import CustomUser, PlayerTravel
+
+CITY = ('gorod', 'gorodskaya-ploshad')
+
+
+@dataclass(frozen=True)
+class Step:
+    """Один шаг сценария: HTTP-запрос или перемотка времени в пути."""
+    action: str
+    method: str
+    url: str = ''
+    data: dict | None = None
+
+
+@dataclass(frozen=True)
+class Plan:
+    """Всё, что нужно сценарию: URL охотничьих зон, монстры, хлам игрока."""
+    # (url перемещения, url страницы, [url атаки])
+    hunting: list[tuple[str, str, list[str]]]
+    junk: dict[int, list[int]]
+    teleport_url: str
+    travel_status_url: str
+    trader_url: str
+    trade_url: str
+
+
+def scenario(plan: Plan, user_id: int, rng: random.Random):
+    """Игровая сессия: дорога на охоту → охота → продажа хлама → телепорт."""
+    travel_url, page_url, attack_urls = rng.choice(plan.hunting)
+    yield Step('travel', 'post', travel_url)
+    yield Step('arrive', 'arrive')
+    yield Step('travel_status', 'get', plan.travel_status_url)
+    yield Step('sublocation', 'get', page_url)
+    for _ in range(rng.randint(3, 8)):
+        yield Step('attack', 'post', rng.choice(attack_urls))
+    yield Step('trader', 'get', plan.trader_url)
+    junk = plan.junk.get(user_id, [])
+    for item_id in rng.sample(junk, k=min(3, len(junk))):
+        yield Step('sell', 'post', plan.trade_url, {
+            'source': 'player', 'item_id': item_id, 'quantity': 1})
+    yield Step('teleport', 'post', plan.teleport_url)
+    yield Step('arrive', 'arrive')
+    yield Step('travel_status', 'get', plan.travel_status_url)
+
+
+def _arrive(user_id: int):
+    """Сжимает время в пути: следующий travel_status завершит перемещение."""
+    PlayerTravel.objects.filter(user_id=user_id).update(travel_time=0)
+    bump_user_version(user_id)
+
+
+def _outcome(status: int) -> str:
+    if status >= 500:
+        return f'error:http_{status}'
+    # 4xx — отказ игры (кулдаун, нет денег), а не сбой
+    return 'rejected' if status >= 400 else 'ok'
+
+
+def _error_kind(exc: Exception) -> str:
+    if isinstance(exc, OperationalError) and 'locked' in str(exc):
+        return 'error:db_locked'
+    return f'error:{type(exc).__name__}'
+
+
+class ClientTransport:
+    """Запросы через тестовый клиент Django в этом же процессе."""
+
+    def __init__(self, user: CustomUser):
+        self.client = Client()
+        self.client.force_login(user)
+
+    def request(self, step: Step) -> str:
+        try:
+            response = getattr(self.client, step.method)(
+                step.url, step.data or {})
+        except Exception as e:
+            return _error_kind(e)
+        return _outcome(response.status_code)
+
+
+class LiveTransport:
+    """Запросы к запущенному серверу (urllib, cookie-сессия, CSRF)."""
+
+    def __init__(self, user: CustomUser, base_url: str, password: str):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+        login_url = reverse('login')
+        self._open('get', login_url)
+        self._open('post', login_url, {
+            'username': user.username, 'password': password,
+            'csrfmiddlewaretoken': self._csrf_token()})
+        if not any(cookie.name == settings.SESSION_COOKIE_NAME
+                   for cookie in self.cookies):
+            raise CommandError(f'Не удалось войти как {user.username}')
+
+    def _csrf_token(self) -> str:
+        return next((cookie.value for cookie in self.cookies
+                     if cookie.name == settings.CSRF_COOKIE_NAME), '')
+
+    def _open(self, method: str, path: str, data: dict | None = None) -> int:
+        url = self.base_url + path
+        body = urlencode(data or {}).encode() if method == 'post' else None
+        request = Request(url, data=body, method=method.upper(), headers={
+            'X-CSRFToken': self._csrf_token(), 'Referer': url})
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except HTTPError as e:
+            return e.code
+
+    def request(self, step: Step) -> str:
+        try:
+            return _outcome(self._open(step.method, step.url, step.data))
+        except (URLError, OSError) as e:
+            return f'error:{type(e).__name__}'
+
+
+def run_player(user_id: int, plan: Plan, duration: float, seed: int,
+               base_url: str | None, password: str) -> list[tuple]:
+    """Гоняет сценарий за одного игрока duration секунд.
+
+    Returns:
+        Записи (действие, секунды, исход).
+    """
+    rng = random.Random(seed)
+    user = CustomUser.objects.get(pk=user_id)
+    transport = (LiveTransport(user, base_url, password) if base_url
+                 else ClientTransport(user))
+    records = []
+    deadline = time.monotonic() + duration
+    try:
+        while time.monotonic() < deadline:
+            for step in scenario(plan, user_id, rng):
+                if time.monotonic() >= deadline:
+                    break
+                if step.method == 'arrive':
+                    _arrive(user_id)
+                    continue
+                started = time.perf_counter()
+                outcome = transport.request(step)
+                records.append(
+                    (step.action, time.perf_counter() - started, outcome))
+    finally:
+        connections.close_all()
+    return records
+
+
+async def arun_player(user_id: int, plan: Plan, duration: float,
+                      seed: int) -> list[tuple]:
+    """Асинхронная версия run_player: AsyncClient, один поток на всех."""
+    rng = random.Random(seed)
+    user = await CustomUser.objects.aget(pk=user_id)
+    client = AsyncClient()
+    await client.aforce_login(user)
+    arrive = sync_to_async(_arrive)
+    records = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        for step in scenario(plan, user_id, rng):
+            if time.monotonic() >= deadline:
+                break
+            if step.method == 'arrive':
+                await arrive(user_id)
+                continue
+            started = time.perf_counter()
+            try:
+                response = await getattr(client, step.method)(
+                    step.url, step.data or {})
+                outcome = _outcome(response.status_code)
+            except Exception as e:
+                outcome = _error_kind(e)
+            records.append(
+                (step.action, time.perf_counter() - started, outcome))
+    return records
+
+
+@dataclass
+class LockWaitSampler:
+    """Фоновый опрос PostgreSQL: сколько сессий ждут блокировок.
+
+    Для других СУБД не делает ничего: на SQLite блокировки видны
+    как ошибки db_locked.
+    """
+    interval: float = 0.2
+    samples: list[int] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        if connection.vendor == 'postgresql':
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self._stop.wait(self.interval):
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE wait_event_type = 'Lock' "
+                        "AND datname = current_database()")
+                    self.samples.append(cursor.fetchone()[0])
+        finally:
+            connection.close()
+
+    def summary(self) -> str:
+        if not self.samples:
+            return 'ожидания блокировок: нет данных (не PostgreSQL)'
+        waiting = [n for n in self.samples if n]
+        return (f'ожидания блокировок: max={max(self.samples)} '
+                f'avg={statistics.fmean(self.samples):.2f} '
+                f'в {len(waiting) / len(self.samples):.0%} замеров')
+
+
+def _percentiles(latencies: list[float]) -> dict:
+    if len(latencies) < 2:
+        value = round(latencies[0] * 1000, 2) if latencies else 0.0
+        return {'p50_ms': value, 'p95_ms': value, 'p99_ms': value}
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {'p50_ms': round(cuts[49] * 1000, 2),
+            'p95_ms': round(cuts[94] * 1000, 2),
+            'p99_ms': round(cuts[98] * 1000, 2)}
+
+
+def summarize(records: list[tuple], elapsed: float) -> dict:
+    """Пропускная способность, задержки и ошибки по действиям."""
+    by_action = defaultdict(list)
+    outcomes = defaultdict(lambda: defaultdict(int))
+    for action, seconds, outcome in records:
+        by_action[action].append(seconds)
+        outcomes[action][outcome] += 1
+    errors = sum(n for counts in outcomes.values()
+                 for outcome, n in counts.items()
+                 if outcome.startswith('error'))
+    return {
+        'requests': len(records),
+        'rps': round(len(records) / elapsed, 2) if elapsed else 0.0,
+        'error_rate': round(errors / len(records), 4) if records else 0.0,
+        **_percentiles([seconds for _, seconds, _ in records]),
+        'actions': {
+            action: {
+                'requests': len(latencies),
+                **_percentiles(latencies),
+                'outcomes': dict(outcomes[action]),
+            }
+            for action, latencies in sorted(by_action.items())
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = ('Нагрузка синтетическими игроками: перемещение, охота, '
+            'продажа хлама, телепорт. Прогон для каждого числа воркеров')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', default='1,4,16',
+            help='Числа одновременных игроков через запятую')
+        parser.add_argument(
+            '--mode', choices=('threads', 'processes', 'asyncio'),
+            default='threads')
+        parser.add_argument(
+            '--duration', type=float, default=30,
+            help='Секунд на каждое число воркеров')
+        parser.add_argument(
+            '--url', default=None,
+            help='Адрес запущенного сервера (по умолчанию тестовый клиент)')
+        parser.add_argument('--prefix', default=f'{PREFIX}-player-',
+                            help='Префикс логинов игроков')
+        parser.add_argument('--password', default=PLAYER_PASSWORD)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', default=None,
+                            help='Сохранить результаты в JSON')
+
+    def handle(self, *args, **options):
+        try:
+            worker_counts = [int(n) for n in options['workers'].split(',')]
+        except ValueError:
+            raise CommandError('--workers: числа через запятую')
+        if options['mode'] == 'asyncio' and options['url']:
+            raise CommandError('asyncio работает только с тестовым клиентом')
+
+        users = list(CustomUser.objects.filter(
+            username__startswith=options['prefix']
+        ).order_by('pk').values_list('pk', flat=True)[:max(worker_counts)])
+        if len(users) < max(worker_counts):
+            raise CommandError(
+                f'Нужно {max(worker_counts)} игроков {options["prefix"]}*, '
+                f'есть {len(users)}. Создайте: manage.py seed_world '
+                f'--players {max(worker_counts)}')
+        plan = self._plan(users)
+
+        # Тестовый клиент ходит с Host: testserver
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        results = {}
+        with override_settings(ALLOWED_HOSTS=allowed_hosts):
+            for workers in worker_counts:
+                with LockWaitSampler() as sampler:
+                    started = time.perf_counter()
+                    records = self._run(users[:workers], plan, options)
+                    elapsed = time.perf_counter() - started
+                result = summarize(records, elapsed)
+                result['lock_wait_samples'] = sampler.samples
+                results[workers] = result
+                self._report(workers, result, sampler)
+
+        self.stdout.write('\nворкеры    req/s     p50     p95     p99  ошибки')
+        for workers, result in results.items():
+            self.stdout.write(
+                f'{workers:7} {result["rps"]:8.1f} {result["p50_ms"]:7.1f} '
+                f'{result["p95_ms"]:7.1f} {result["p99_ms"]:7.1f} '
+                f'{result["error_rate"]:7.2%}')
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump({'mode': options['mode'], 'url': options['url'],
+                           'duration': options['duration'],
+                           'database': connection.vendor,
+                           'results': results},
+                          f, ensure_ascii=False, indent=2)
+
+    def _plan(self, users: list[int]) -> Plan:
+        snapshot = world.get_world()
+        hunting = []
+        for sublocation in snapshot.sublocations.values():
+            monsters = snapshot.sublocation_monsters[sublocation.pk]
+            location = sublocation.global_location
+            if location.is_city or not monsters:
+                continue
+            hunting.append((
+                reverse('game:api_v1:start_travel',
+                        args=[location.slug, sublocation.slug]),
+                reverse('game:sublocation',
+                        args=[location.slug, sublocation.slug]),
+                [reverse('game:api_v1:attack_monster', args=[monster.slug])
+                 for monster in monsters],
+            ))
+        if not hunting:
+            raise CommandError('Нет саблокаций с монстрами')
+
+        junk = defaultdict(list)
+        stacks = ItemStack.objects.filter(
+            owner_id__in=users, item__item_type='JUNK'
+        ).values_list('owner_id', 'item_id')
+        for owner_id, item_id in stacks:
+            junk[owner_id].append(item_id)
+
+        return Plan(
+            hunting=hunting,
+            junk=dict(junk),
+            teleport_url=reverse('game:api_v1:teleport', args=CITY),
+            travel_status_url=reverse('game:travel_status'),
+            trader_url=reverse('game:trader_test'),
+            trade_url=reverse('game:api_v1:trade'),
+        )
+
+    def _run(self, users: list[int], plan: Plan, options) -> list[tuple]:
+        jobs = [
+            (user_id, plan, options['duration'], options['seed'] + n,
+             options['url'], options['password'])
+            for n, user_id in enumerate(users)
+        ]
+        if options['mode'] == 'asyncio':
+            return asyncio.run(self._run_async(jobs))
+        if options['mode'] == 'processes':
+            # Соединения и пулы родителя не должны попасть в дочерние процессы
+            for conn in connections.all():
+                if hasattr(conn, 'close_pool'):
+                    conn.close_pool()
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                len(users), mp_context=multiprocessing.get_context('fork'))
+        else:
+            executor = ThreadPoolExecutor(len(users))
+        with executor:
+            futures = [executor.submit(run_player, *job) for job in jobs]
+            return [record for future in futures
+                    for record in future.result()]
+
+    async def _run_async(self, jobs) -> list[tuple]:
+        results = await asyncio.gather(*(
+            arun_player(user_id, plan, duration, seed)
+            for user_id, plan, duration, seed, _, _ in jobs))
+        return [record for records in results for record in records]
+
+    def _report(self, workers: int, result: dict, sampler: LockWaitSampler):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\nворкеров: {workers}  {result["requests"]} запросов, '
+            f'{result["rps"]} req/s, ошибок {result["error_rate"]:.2%}'))
+        for action, stats in result['actions'].items():
+            outcomes = ', '.join(
+                f'{outcome}={n}' for outcome, n in stats['outcomes'].items())
+            self.stdout.write(
+                f'  {action:14} {stats["requests"]:6} '
+                f'p50={stats["p50_ms"]:7.1f} p95={stats["p95_ms"]:7.1f} '
+                f'p99={stats["p99_ms"]:7.1f}  {outcomes}')
+        self.stdout.write('  ' + sampler.summary())
@@ -0,0 +1,23 @@
+"""Игровые счётчики для /metrics."""
+from corelight.metrics import Counter
+
+MONSTER_KILLS = Counter(
+    'game_monster_kills_total', 'Убито монстров', ('monster',))
+LOOT_ITEMS = Counter(
+    'game_loot_items_total', 'Предметов выпало с монстров')
+TRADE_GOLD = Counter(
+    'game_trade_gold_total',
+    'Золото в сделках с магазином: spent — покупки, earned — продажи',
+    ('direction',))
+TRAVEL_STARTED = Counter(
+    'game_travel_started_total', 'Начато перемещений', ('kind',))
+TRAVEL_COMPLETED = Counter(
+    'game_travel_completed_total', 'Завершено перемещений')
+
+
+def record_kill(monster, drop_list: list[tuple]):
+    """Убийство монстра и выпавшие предметы (item_id, amount, world_id)."""
+    MONSTER_KILLS.inc(monster=monster.slug)
+    amount = sum(amount for _, amount, _ in drop_list)
+    if amount:
+        LOOT_ITEMS.inc(amount)
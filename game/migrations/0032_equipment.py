@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0031_alter_monsterdrop_item'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Equipment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.CharField(choices=[('HEAD', 'Голова'), ('CHEST', 'Тело'), ('HANDS', 'Руки'), ('LEGS', 'Ноги'), ('FEET', 'Обувь'), ('MAIN_HAND', 'Основная рука'), ('OFF_HAND', 'Вторая рука'), ('NECK', 'Шея (амулет)'), ('FINGER', 'Палец (кольцо)'), ('WAIST', 'Пояс (амулет)'), ('EAR', 'Ухо (серьга)')], max_length=20, verbose_name='Слот')),
+                ('instance', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='equipment', to='game.iteminstance', verbose_name='Предмет')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='equipment', to=settings.AUTH_USER_MODEL, verbose_name='Игрок')),
+            ],
+            options={
+                'verbose_name': 'Надетый предмет',
+                'verbose_name_plural': 'Экипировка',
+                'unique_together': {('owner', 'slot')},
+            },
+        ),
+    ]
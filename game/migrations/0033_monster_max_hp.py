@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:11
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0032_equipment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monster',
+            name='max_hp',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('stamina'), '*', models.Value(8)), output_field=models.PositiveIntegerField(), verbose_name='Максимум здоровья'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0033_monster_max_hp'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonsterKill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Убито')),
+            ],
+            options={
+                'verbose_name': 'Убийства монстров',
+                'verbose_name_plural': 'Убийства монстров',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='wallet',
+            index=models.Index(fields=['currency', '-amount'], name='wallet_currency_amount'),
+        ),
+        migrations.AddField(
+            model_name='monsterkill',
+            name='monster',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kills', to='game.monster', verbose_name='Монстр'),
+        ),
+        migrations.AddField(
+            model_name='monsterkill',
+            name='player',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monster_kills', to=settings.AUTH_USER_MODEL, verbose_name='Игрок'),
+        ),
+        migrations.AddIndex(
+            model_name='monsterkill',
+            index=models.Index(fields=['monster', '-count'], name='monsterkill_monster_count'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='monsterkill',
+            unique_together={('player', 'monster')},
+        ),
+    ]
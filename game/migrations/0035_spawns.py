@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0034_monsterkill'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monster',
+            name='respawn_seconds',
+            field=models.PositiveIntegerField(default=60, verbose_name='Время возрождения, сек'),
+        ),
+        migrations.AddField(
+            model_name='monster',
+            name='spawn_count',
+            field=models.PositiveSmallIntegerField(default=3, verbose_name='Особей в саблокации'),
+        ),
+        migrations.CreateModel(
+            name='SpawnSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.JSONField(default=dict, verbose_name='Мёртвые особи')),
+                ('saved_at', models.DateTimeField(auto_now=True, verbose_name='Сохранён')),
+                ('sublocation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='spawn_snapshot', to='game.sublocation', verbose_name='Саблокация')),
+            ],
+            options={
+                'verbose_name': 'Снимок популяции',
+                'verbose_name_plural': 'Снимки популяций',
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:21
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+# В PostgreSQL журнал секционирован по месяцам: первичный ключ
+# секционированной таблицы обязан включать ключ секционирования.
+# Секции на следующие месяцы создаёт команда action_log_partitions,
+# секция DEFAULT принимает записи, для которых секции ещё нет.
+CREATE_PARTITIONED = '''
+CREATE TABLE game_actionlog (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    created_at timestamp with time zone NOT NULL,
+    user_id bigint NOT NULL,
+    action varchar(16) NOT NULL,
+    payload jsonb NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+CREATE TABLE game_actionlog_default PARTITION OF game_actionlog DEFAULT;
+CREATE INDEX actionlog_user_created
+    ON game_actionlog (user_id, created_at DESC);
+CREATE INDEX actionlog_action_created
+    ON game_actionlog (action, created_at DESC);
+'''
+CREATE_PARTITION = '''
+CREATE TABLE IF NOT EXISTS game_actionlog_{start:%Y_%m}
+    PARTITION OF game_actionlog
+    FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}');
+'''
+
+
+def _next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def create_table(apps, schema_editor):
+    model = apps.get_model('game', 'ActionLog')
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.create_model(model)
+        return
+    schema_editor.execute(CREATE_PARTITIONED)
+    start = timezone.now().date().replace(day=1)
+    for _ in range(2):
+        end = _next_month(start)
+        schema_editor.execute(CREATE_PARTITION.format(start=start, end=end))
+        start = end
+
+
+def drop_table(apps, schema_editor):
+    schema_editor.delete_model(apps.get_model('game', 'ActionLog'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0035_spawns'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ActionLog',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('created_at', models.DateTimeField(verbose_name='Время')),
+                        ('action', models.CharField(choices=[('fight', 'Бой'), ('loot', 'Добыча'), ('buy', 'Покупка'), ('sell', 'Продажа'), ('travel', 'Перемещение'), ('teleport', 'Телепорт'), ('arrive', 'Прибытие'), ('equip', 'Надевание'), ('unequip', 'Снятие')], max_length=16, verbose_name='Действие')),
+                        ('payload', models.JSONField(default=dict, verbose_name='Данные')),
+                        ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Игрок')),
+                    ],
+                    options={
+                        'verbose_name': 'Действие игрока',
+                        'verbose_name_plural': 'Журнал действий',
+                        'indexes': [models.Index(fields=['user', '-created_at'], name='actionlog_user_created'), models.Index(fields=['action', '-created_at'], name='actionlog_action_created')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_table, drop_table),
+    ]
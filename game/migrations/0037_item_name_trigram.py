@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:05
+
+from django.db import migrations
+
+
+# Как users.0025_trigram_search: поиск по названию предмета
+# в админке (в том числе item__name в стеках и экземплярах)
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS item_name_trgm ON game_item '
+        'USING gin ((UPPER(name::text)) gin_trgm_ops)')
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS item_name_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0036_actionlog'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:10
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import BaseDatabaseCache
+from django.core.management import call_command
+from django.db import migrations
+
+
+# Таблица кэша по умолчанию (DatabaseCache, corelight/settings.py).
+# Сам createcachetable её не видит: бэкенд обёрнут в
+# corelight.metrics.InstrumentedCache. Для Redis/Memcached ничего
+# не делается.
+def create_cache_table(apps, schema_editor):
+    for alias in settings.CACHES:
+        backend = getattr(caches[alias], '_cache', caches[alias])
+        if isinstance(backend, BaseDatabaseCache):
+            call_command('createcachetable', backend._table,
+                         database=schema_editor.connection.alias,
+                         verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0037_item_name_trigram'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,16 @@
 
 # Теперь модели импортируются, как раньше:
 # from game.models import Model
+from .action_log import ActionLog
 from .economy import Currency, Wallet
+from .equipment import Equipment
 from .items import Item, ItemInstance, ItemStack, item_logo_path
 from .locations import GlobalLocation, SubLocation
-from .monsters import Monster, MonsterDrop, monster_avatar_path
+from .monsters import (
+    Monster,
+    MonsterDrop,
+    MonsterKill,
+    SpawnSnapshot,
+    monster_avatar_path,
+)
 from .shops import ActivityLink, Shop, ShopItem
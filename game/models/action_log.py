@@ -0,0 +1,43 @@
+from django.db import models
+
+from game.constants import ACTION_CHOICES
+from users.models import CustomUser
+
+
+class ActionLog(models.Model):
+    """Запись журнала игровых действий (только добавление).
+
+    Записи пишет пачками game.services.action_log. В PostgreSQL таблица
+    секционирована по месяцам created_at (миграция 0036), старые
+    секции удаляет команда action_log_partitions.
+    """
+    created_at = models.DateTimeField(verbose_name='Время')
+    # Без внешнего ключа в БД: журнал не мешает удалять игроков
+    # и не проверяет ссылку на каждой вставке
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+        verbose_name='Игрок'
+    )
+    action = models.CharField(
+        max_length=16,
+        choices=ACTION_CHOICES,
+        verbose_name='Действие'
+    )
+    payload = models.JSONField(default=dict, verbose_name='Данные')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'],
+                         name='actionlog_user_created'),
+            models.Index(fields=['action', '-created_at'],
+                         name='actionlog_action_created'),
+        ]
+        verbose_name = 'Действие игрока'
+        verbose_name_plural = 'Журнал действий'
+
+    def __str__(self):
+        return f'{self.created_at:%Y-%m-%d %H:%M:%S} {self.user_id} {self.action}'
@@ -34,6 +34,9 @@ class Wallet(models.Model):
 
     class Meta:
         unique_together = ('user', 'currency')
+        # Рейтинг по валюте: ORDER BY amount DESC LIMIT N по индексу
+        indexes = [models.Index(fields=['currency', '-amount'],
+                                name='wallet_currency_amount')]
         default_related_name = 'wallets'
         verbose_name = 'кошелек'
         verbose_name_plural = 'Кошельки'
@@ -0,0 +1,46 @@
+from django.core.exceptions import ValidationError
+from django.db import models
+
+from game.constants import SLOT_CHOICES
+from users.models import CustomUser
+
+from .items import ItemInstance
+
+
+class Equipment(models.Model):
+    """Предмет, надетый игроком в слот экипировки.
+
+    Надевать и снимать предметы нужно через game.services.equipment:
+    он же обновляет бонусы экипировки в player_stats.
+    """
+    owner = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='equipment',
+        verbose_name='Игрок'
+    )
+    slot = models.CharField(
+        max_length=20,
+        choices=SLOT_CHOICES,
+        verbose_name='Слот'
+    )
+    instance = models.OneToOneField(
+        ItemInstance,
+        on_delete=models.CASCADE,
+        related_name='equipment',
+        verbose_name='Предмет'
+    )
+
+    class Meta:
+        unique_together = ('owner', 'slot')
+        verbose_name = 'Надетый предмет'
+        verbose_name_plural = 'Экипировка'
+
+    def __str__(self):
+        return f'{self.owner_id}: {self.get_slot_display()}'
+
+    def clean(self):
+        # Надеть можно только свой предмет
+        if self.instance_id and self.owner_id != self.instance.owner_id:
+            raise ValidationError(
+                {'instance': 'Предмет принадлежит другому игроку'})
@@ -4,7 +4,8 @@ from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.text import slugify
 
-from game.models import Currency, Item
+from game.models import Currency, Item, SubLocation
+from users.models import CustomUser
 
 
 def monster_avatar_path(instance, filename):
@@ -50,6 +51,14 @@ class Monster(models.Model):
     )
 
     xp_reward = models.PositiveIntegerField(default=20)
+    spawn_count = models.PositiveSmallIntegerField(
+        default=3,
+        verbose_name='Особей в саблокации'
+    )
+    respawn_seconds = models.PositiveIntegerField(
+        default=60,
+        verbose_name='Время возрождения, сек'
+    )
     is_active = models.BooleanField(default=True)
     slug = models.SlugField(unique=True, blank=True)
 
@@ -72,14 +81,17 @@ class Monster(models.Model):
     def __str__(self):
         return f"{self.name} [{self.level}]"
 
+    # --- Расчет статов (считает БД) ---
+    max_hp = models.GeneratedField(
+        expression=models.F('stamina') * 8,
+        output_field=models.PositiveIntegerField(),
+        db_persist=True,
+        verbose_name='Максимум здоровья'
+    )
+
     if TYPE_CHECKING:
         drops: models.manager.Manager["MonsterDrop"]
 
-    # --- Расчет статов ---
-    @property
-    def max_hp(self):
-        return self.vitality * 8
-
 
 class MonsterDrop(models.Model):
 
@@ -153,4 +165,56 @@ class MonsterDrop(models.Model):
             
     def save(self, *args, **kwargs):
         self.full_clean()  # вызывает clean()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class MonsterKill(models.Model):
+    """Сколько монстров этого типа убил игрок (для рейтингов)."""
+    player = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='monster_kills',
+        verbose_name='Игрок'
+    )
+    monster = models.ForeignKey(
+        Monster,
+        on_delete=models.CASCADE,
+        related_name='kills',
+        verbose_name='Монстр'
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name='Убито')
+
+    class Meta:
+        unique_together = ('player', 'monster')
+        # Рейтинг по монстру: ORDER BY count DESC LIMIT N по индексу
+        indexes = [models.Index(fields=['monster', '-count'],
+                                name='monsterkill_monster_count')]
+        verbose_name = 'Убийства монстров'
+        verbose_name_plural = 'Убийства монстров'
+
+    def __str__(self):
+        return f'{self.player_id}: {self.monster_id} x{self.count}'
+
+
+class SpawnSnapshot(models.Model):
+    """Мёртвые особи саблокации на момент снимка (game.services.spawns).
+
+    Живые особи хранятся в общем кэше, снимок нужен, чтобы
+    восстановить их после потери кэша.
+    """
+    sublocation = models.OneToOneField(
+        SubLocation,
+        on_delete=models.CASCADE,
+        related_name='spawn_snapshot',
+        verbose_name='Саблокация'
+    )
+    # {id монстра: {слот: время возрождения (unix)}}
+    state = models.JSONField(default=dict, verbose_name='Мёртвые особи')
+    saved_at = models.DateTimeField(auto_now=True, verbose_name='Сохранён')
+
+    class Meta:
+        verbose_name = 'Снимок популяции'
+        verbose_name_plural = 'Снимки популяций'
+
+    def __str__(self):
+        return f'{self.sublocation_id}: {self.saved_at:%Y-%m-%d %H:%M:%S}'
@@ -70,3 +70,8 @@ class ShopItem(models.Model):
 
     def __str__(self):
         return f"{self.item.name} в {self.shop.name}"
+
+    @property
+    def price(self) -> int:
+        """Цена покупки одной штуки в этом магазине."""
+        return self.item.cost * self.price_coef
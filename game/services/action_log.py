@@ -0,0 +1,279 @@
+"""Журнал игровых действий: бои, добыча, сделки, перемещения.
+
+Горячий путь не пишет в БД: record() кладёт компактную запись
+(время, игрок, действие, данные) в буфер процесса. Фоновый поток
+сбрасывает буфер раз в ACTION_LOG_FLUSH_MS миллисекунд или сразу,
+как только в нём набралось ACTION_LOG_BATCH_SIZE записей: в PostgreSQL
+одним COPY, в остальных базах — многострочным INSERT.
+
+Противодавление: если буфер дорос до ACTION_LOG_MAX_BUFFER (БД не
+успевает), запрос сбрасывает его сам и ждёт записи. При остановке
+процесса буфер сбрасывается (atexit); теряются только записи
+процесса, убитого без остановки, — не больше чем за один интервал.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connection, connections
+from django.db.models import Count
+from django.utils import timezone
+
+from corelight.routers import read_from_replica
+from game.models import ActionLog
+
+logger = logging.getLogger(__name__)
+
+COPY_SQL = ('COPY {table} (created_at, user_id, action, payload) '
+            'FROM STDIN')
+
+# (время, id игрока, действие, данные)
+Entry = tuple[datetime, int, str, dict]
+
+_buffer: list[Entry] = []
+_buffer_lock = threading.Lock()
+# Сбросы идут по одному, чтобы записи попадали в таблицу по порядку
+_flush_lock = threading.Lock()
+_wake = threading.Event()
+_thread: threading.Thread | None = None
+
+
+def get_batch_size() -> int:
+    """Сколько записей будит фоновый поток раньше интервала."""
+    return getattr(settings, 'ACTION_LOG_BATCH_SIZE', 500)
+
+
+def get_max_buffer() -> int:
+    """Размер буфера, при котором запрос сбрасывает его сам."""
+    return getattr(settings, 'ACTION_LOG_MAX_BUFFER', 10_000)
+
+
+def get_flush_interval() -> float:
+    """Интервал фонового сброса в секундах."""
+    return getattr(settings, 'ACTION_LOG_FLUSH_MS', 500) / 1000
+
+
+def _append(user_id: int, action: str, payload: dict) -> int:
+    entry = (timezone.now(), user_id, action, payload)
+    with _buffer_lock:
+        _buffer.append(entry)
+        return len(_buffer)
+
+
+def record(user_id: int, action: str, **payload):
+    """Добавляет действие в журнал (запись в БД — позже, пачкой).
+
+    Args:
+        user_id: id игрока.
+        action: Действие из ACTION_CHOICES.
+        **payload: Данные действия (должны сериализоваться в JSON).
+    """
+    size = _append(user_id, action, payload)
+    if size >= get_max_buffer():
+        flush()
+    elif size >= get_batch_size():
+        _wake.set()
+    _ensure_thread()
+
+
+async def arecord(user_id: int, action: str, **payload):
+    """Асинхронная версия record."""
+    size = _append(user_id, action, payload)
+    if size >= get_max_buffer():
+        await sync_to_async(flush)()
+    elif size >= get_batch_size():
+        _wake.set()
+    _ensure_thread()
+
+
+def _write(entries: list[Entry]):
+    if connection.vendor == 'postgresql':
+        sql = COPY_SQL.format(
+            table=connection.ops.quote_name(ActionLog._meta.db_table))
+        with connection.cursor() as cursor, cursor.copy(sql) as copy:
+            for created_at, user_id, action, payload in entries:
+                copy.write_row((created_at, user_id, action,
+                                json.dumps(payload, ensure_ascii=False)))
+    else:
+        ActionLog.objects.bulk_create(
+            [ActionLog(created_at=created_at, user_id=user_id,
+                       action=action, payload=payload)
+             for created_at, user_id, action, payload in entries],
+            batch_size=get_batch_size())
+
+
+def flush() -> int:
+    """Записывает буфер в БД.
+
+    Если запись не удалась, записи возвращаются в начало буфера
+    (не больше ACTION_LOG_MAX_BUFFER), остальные теряются.
+
+    Returns:
+        int: Сколько записей записано.
+    """
+    with _flush_lock:
+        with _buffer_lock:
+            entries = _buffer[:]
+            _buffer.clear()
+        if not entries:
+            return 0
+        try:
+            _write(entries)
+        except DatabaseError:
+            with _buffer_lock:
+                room = max(get_max_buffer() - len(_buffer), 0)
+                keep = entries[len(entries) - room:] if room else []
+                _buffer[:0] = keep
+            logger.exception('Журнал действий: не записано %d записей, '
+                             'потеряно %d', len(entries),
+                             len(entries) - len(keep))
+            return 0
+    return len(entries)
+
+
+def _run():
+    while True:
+        _wake.wait(get_flush_interval())
+        _wake.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Журнал действий: ошибка фонового сброса')
+        finally:
+            # Соединение потока возвращается в пул до следующего сброса
+            connections.close_all()
+
+
+def _ensure_thread():
+    global _thread
+    if not getattr(settings, 'ACTION_LOG_BACKGROUND', True):
+        return
+    if _thread is None or not _thread.is_alive():
+        with _buffer_lock:
+            if _thread is None or not _thread.is_alive():
+                _thread = threading.Thread(
+                    target=_run, name='action-log-flusher', daemon=True)
+                _thread.start()
+
+
+def _after_fork_in_child():
+    # Записи родителя сбросит родитель; потоки не переживают fork,
+    # а блокировки могли быть захвачены ими в момент fork
+    global _thread, _buffer_lock, _flush_lock
+    _buffer.clear()
+    _buffer_lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _thread = None
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Журнал действий: ошибка сброса при остановке')
+
+
+atexit.register(_flush_at_exit)
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _month_start(day: date, months: int = 0) -> date:
+    """Первое число месяца, отстоящего от day на months месяцев."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def ensure_partitions(months_ahead: int = 2) -> list[str]:
+    """Создаёт месячные секции журнала на months_ahead месяцев вперёд.
+
+    Только PostgreSQL. Секции нужно создавать заранее: пока записи
+    попадают в секцию DEFAULT, секцию их месяца создать нельзя.
+
+    Returns:
+        list[str]: Имена секций (созданных и уже существовавших).
+    """
+    if connection.vendor != 'postgresql':
+        return []
+    table = ActionLog._meta.db_table
+    today = timezone.now().date()
+    names = []
+    with connection.cursor() as cursor:
+        for months in range(months_ahead + 1):
+            start = _month_start(today, months)
+            end = _month_start(start, 1)
+            name = f'{table}_{start:%Y_%m}'
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} '
+                f"FOR VALUES FROM ('{start}') TO ('{end}')")
+            names.append(name)
+    return names
+
+
+def drop_partitions(keep_months: int) -> list[str]:
+    """Удаляет секции журнала старше keep_months месяцев.
+
+    Удаление секции — мгновенный DROP TABLE вместо DELETE по
+    миллионам строк. Только PostgreSQL.
+
+    Returns:
+        list[str]: Имена удалённых секций.
+    """
+    if connection.vendor != 'postgresql':
+        return []
+    table = ActionLog._meta.db_table
+    cutoff = _month_start(timezone.now().date(), -keep_months)
+    dropped = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = %s', [table])
+        for (name,) in cursor.fetchall():
+            suffix = name.removeprefix(f'{table}_')
+            try:
+                start = datetime.strptime(suffix, '%Y_%m').date()
+            except ValueError:
+                # Секция DEFAULT
+                continue
+            if start < cutoff:
+                cursor.execute(f'DROP TABLE {name}')
+                dropped.append(name)
+    return dropped
+
+
+def player_history(user_id: int,
+                   since: datetime | None = None,
+                   until: datetime | None = None,
+                   actions: list[str] | None = None,
+                   limit: int = 100) -> list[ActionLog]:
+    """Последние действия игрока (для поддержки).
+
+    Читает индекс (user, -created_at); в PostgreSQL при заданном
+    периоде — только нужные секции.
+    """
+    rows = ActionLog.objects.filter(user_id=user_id)
+    if since is not None:
+        rows = rows.filter(created_at__gte=since)
+    if until is not None:
+        rows = rows.filter(created_at__lt=until)
+    if actions:
+        rows = rows.filter(action__in=actions)
+    with read_from_replica():
+        return list(rows.order_by('-created_at')[:limit])
+
+
+def action_counts(since: datetime,
+                  until: datetime | None = None) -> dict[str, int]:
+    """Сколько действий каждого вида было за период (для аналитики)."""
+    rows = ActionLog.objects.filter(created_at__gte=since)
+    if until is not None:
+        rows = rows.filter(created_at__lt=until)
+    with read_from_replica():
+        return dict(rows.values_list('action')
+                    .annotate(n=Count('pk')).order_by())
@@ -0,0 +1,235 @@
+"""Игровые действия игрока.
+
+Каждое действие меняет состояние игрока и возвращает компактную
+дельту (только то, что изменилось). Дельту отдаёт JSON API,
+а HTML-представления используют те же функции и делают редирект.
+"""
+import logging
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from game import stat_schema
+from game.constants import FIGHT_COOLDOWN_SECONDS
+from game.exceptions import FightCooldown, MonsterNotSpawned, TradeError
+from game.metrics import TRAVEL_STARTED, record_kill
+from game.models import GlobalLocation, ItemStack, Monster, SubLocation, Wallet
+from game.utils import perform_attack
+from users import volatile
+from users.models import CustomUser
+
+from . import (
+    action_log,
+    equipment,
+    inventory,
+    leaderboards,
+    monsters,
+    spawns,
+    trade,
+    travel,
+    world,
+)
+
+logger = logging.getLogger(__name__)
+
+TELEPORT_SCROLL_SLUG = 'svitok-teleporta'
+
+
+def get_fight_cooldown(user: CustomUser) -> int:
+    """Сколько секунд игроку осталось отдыхать после боя."""
+    if not user.last_fight_at:
+        return 0
+    elapsed = (timezone.now() - user.last_fight_at).total_seconds()
+    if elapsed < FIGHT_COOLDOWN_SECONDS:
+        return int(FIGHT_COOLDOWN_SECONDS - elapsed)
+    return 0
+
+
+def _loot_delta(drop_list: list[tuple]) -> list[dict]:
+    return [
+        {'item_id': item_id, 'quantity': amount, 'world_id': world_id}
+        for item_id, amount, world_id in drop_list
+    ]
+
+
+def _travel_delta(user: CustomUser) -> dict:
+    return {
+        'destination': user.travel_destination.slug,
+        'travel_time': user.travel_time,
+        'arrives_at': (user.travel_started_at + timedelta(
+            seconds=user.travel_time)).isoformat(),
+    }
+
+
+def attack_monster(user: CustomUser, monster: Monster) -> dict:
+    """Бой с живой особью монстра: дроп в инвентарь, опыт, кулдаун.
+
+    Raises:
+        FightCooldown: Если игрок ещё не отдохнул после прошлого боя.
+        MonsterNotSpawned: Если монстра нет в саблокации игрока
+                           или все его особи убиты.
+    """
+    cooldown = get_fight_cooldown(user)
+    if cooldown:
+        raise FightCooldown(f'Отдыхайте ещё {cooldown} сек.')
+    sublocation_id = user.current_sublocation_id
+    if monster not in world.get_world().sublocation_monsters.get(
+            sublocation_id, ()):
+        raise MonsterNotSpawned(f'Здесь не водится {monster.name}')
+    if not spawns.claim(sublocation_id, monster):
+        raise MonsterNotSpawned(
+            f'{monster.name}: все особи убиты, ждите возрождения')
+
+    if not perform_attack(user, monster):
+        logger.warning('Бой %s с %s не состоялся', user.pk, monster.slug)
+    drop_list = monsters.get_amount_of_loot(monster)
+    if not drop_list:
+        logger.debug('%s: с %s ничего не выпало', user.pk, monster.slug)
+    else:
+        inventory.add_drop_list_in_inventory(user, drop_list)
+    record_kill(monster, drop_list)
+    action_log.record(user.pk, 'fight', monster=monster.pk,
+                      sublocation=sublocation_id, xp=monster.xp_reward)
+    if drop_list:
+        action_log.record(user.pk, 'loot', monster=monster.pk,
+                          items=drop_list)
+    level_before = user.level
+    # Опыт, убийства и время боя пишутся в БД отложенно (users.volatile)
+    volatile.update(user, {'experience': monster.xp_reward, 'kills': 1},
+                    last_fight_at=timezone.now())
+    leaderboards.record_fight(user, monster)
+    return {
+        'hp': user.current_hp,
+        'max_hp': user.max_hp,
+        'xp_gained': monster.xp_reward,
+        'experience': user.experience,
+        'level': user.level,
+        'level_up': user.level > level_before,
+        'cooldown': FIGHT_COOLDOWN_SECONDS,
+        'loot': _loot_delta(drop_list),
+    }
+
+
+def start_travel(user: CustomUser,
+                 target_global_location: GlobalLocation,
+                 target_sublocation: SubLocation) -> dict:
+    """Старт пешего перемещения."""
+    user.travel_destination = target_sublocation
+    user.travel_started_at = timezone.now()
+    user.travel_time = travel.calculate_travel_time(
+        user, target_global_location, target_sublocation)
+    user.save(update_fields=['travel_destination', 'travel_started_at',
+                             'travel_time'])
+    TRAVEL_STARTED.inc(kind='walk')
+    action_log.record(user.pk, 'travel', destination=target_sublocation.pk,
+                      travel_time=user.travel_time)
+    return _travel_delta(user)
+
+
+def _use_scroll(stack_id: int) -> bool:
+    """Тратит один свиток из стака условным UPDATE или DELETE.
+
+    Два параллельных телепорта не потратят один и тот же последний
+    свиток: условие проверяет БД, а не прочитанное раньше количество.
+
+    Returns:
+        bool: Свиток потрачен.
+    """
+    stack = ItemStack.objects.filter(pk=stack_id)
+    if stack.filter(quantity__gte=2).update(quantity=F('quantity') - 1):
+        return True
+    deleted, _ = stack.filter(quantity=1).delete()
+    return deleted > 0
+
+
+def teleport(user: CustomUser,
+             target_global_location: GlobalLocation,
+             target_sublocation: SubLocation) -> dict:
+    """Телепорт: со свитком мгновенно, без свитка — втрое дольше пешком."""
+    travel_time = travel.calculate_travel_time(
+        user, target_global_location, target_sublocation)
+
+    scroll = (ItemStack.objects
+              .filter(owner=user, item__slug=TELEPORT_SCROLL_SLUG)
+              .values_list('pk', 'item_id').first())
+
+    inventory_delta = []
+    if scroll is not None and _use_scroll(scroll[0]):
+        travel_time = 0
+        inventory_delta.append(
+            {'item_id': scroll[1], 'quantity': -1, 'world_id': None})
+    else:
+        travel_time *= 3
+
+    user.travel_destination = target_sublocation
+    user.travel_started_at = timezone.now()
+    user.travel_time = travel_time
+    user.save(update_fields=['travel_destination', 'travel_started_at', 'travel_time'])
+    TRAVEL_STARTED.inc(kind='teleport')
+    action_log.record(user.pk, 'teleport', destination=target_sublocation.pk,
+                      travel_time=travel_time, scroll=bool(inventory_delta))
+    return {**_travel_delta(user), 'inventory': inventory_delta}
+
+
+def trade_item(user: CustomUser,
+               source: str,
+               item_id: int,
+               quantity: int,
+               world_id: str | None = None) -> dict:
+    """Покупка (source='shop') или продажа (source='player') предмета.
+
+    Цену считает сервер: покупка — по цене магазина, продажа —
+    по стоимости предмета.
+
+    Raises:
+        TradeError: Если сделка не состоялась.
+    """
+    if source == 'shop':
+        success, error = trade.buy_item(user, item_id, quantity, world_id)
+        delta = quantity
+    elif source == 'player':
+        success, error = trade.sell_item(user, item_id, quantity, world_id)
+        delta = -quantity
+    else:
+        raise TradeError('Неверный источник сделки')
+    if not success:
+        raise TradeError(error)
+
+    gold = Wallet.objects.filter(
+        user=user, currency__code='GOLD').values_list('amount', flat=True)
+    return {
+        'gold': gold.first() or 0,
+        'inventory': [
+            {'item_id': int(item_id), 'quantity': delta,
+             'world_id': world_id}
+        ],
+    }
+
+
+def equip_item(user: CustomUser, world_id: str) -> dict:
+    """Надевает предмет из инвентаря.
+
+    Raises:
+        EquipError: Если предмет нельзя надеть.
+    """
+    removed = equipment.equip(user, world_id)
+    action_log.record(user.pk, 'equip', world_id=str(world_id),
+                      removed=str(removed.world_id) if removed else None)
+    return {
+        'equipped': str(world_id),
+        'unequipped': str(removed.world_id) if removed else None,
+        'stats': stat_schema.to_dict(user.effective_stats),
+    }
+
+
+def unequip_item(user: CustomUser, slot: str) -> dict:
+    """Снимает предмет из слота в инвентарь."""
+    removed = equipment.unequip(user, slot)
+    if removed is not None:
+        action_log.record(user.pk, 'unequip', slot=slot,
+                          world_id=str(removed.world_id))
+    return {
+        'unequipped': str(removed.world_id) if removed else None,
+        'stats': stat_schema.to_dict(user.effective_stats),
+    }
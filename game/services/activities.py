@@ -0,0 +1,129 @@
+from collections import defaultdict
+from typing import Iterable
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import models
+
+from corelight.routers import use_primary
+from game.models import ActivityLink, Shop
+
+from . import world
+
+# Список моделей, которые могут быть активностями
+ACTIVITY_MODELS = (Shop,)
+
+
+def activity_key(content_type_id: int, object_id: int) -> str:
+    """Ключ активности вида '<content_type_id>:<object_id>'."""
+    return f'{content_type_id}:{object_id}'
+
+
+def parse_activity_key(key: str) -> tuple[int, int]:
+    """Разбирает ключ активности.
+
+    Raises:
+        ValueError: Если ключ имеет неверный формат.
+    """
+    ct_id, obj_id = key.split(':')
+    return int(ct_id), int(obj_id)
+
+
+def resolve_activities(
+        pairs: Iterable[tuple[int, int]]
+) -> dict[tuple[int, int], models.Model]:
+    """Загружает объекты активностей пачками.
+
+    Ссылки группируются по типу контента, объекты каждого типа
+    забираются одним запросом. ContentType берётся из кэша Django.
+
+    Args:
+        pairs: Пары (content_type_id, object_id).
+
+    Returns:
+        Словарь {(content_type_id, object_id): объект}.
+        Отсутствующие объекты в словарь не попадают.
+    """
+    ids_by_type: dict[int, set[int]] = defaultdict(set)
+    for ct_id, obj_id in pairs:
+        if ct_id is not None and obj_id is not None:
+            ids_by_type[ct_id].add(obj_id)
+
+    resolved = {}
+    for ct_id, ids in ids_by_type.items():
+        model = ContentType.objects.get_for_id(ct_id).model_class()
+        if model is None:
+            continue
+        for pk, obj in model._base_manager.in_bulk(ids).items():
+            resolved[(ct_id, pk)] = obj
+    return resolved
+
+
+def resolve_activity_links(
+        links: Iterable[ActivityLink]) -> list[models.Model]:
+    """Возвращает активности для списка ссылок в их порядке.
+
+    Битые ссылки (удалённый объект, пустой тип) пропускаются.
+    """
+    links = list(links)
+    resolved = resolve_activities(
+        (link.content_type_id, link.object_id) for link in links)
+    return [resolved[(link.content_type_id, link.object_id)]
+            for link in links
+            if (link.content_type_id, link.object_id) in resolved]
+
+
+def get_sublocation_activities(sublocation_id: int) -> list[models.Model]:
+    """Активности саблокации, закэшированные до смены версии мира."""
+    snapshot = world.get_world()
+    cache_key = f'world:{snapshot.version}:activities:{sublocation_id}'
+    activities = cache.get(cache_key)
+    if activities is None:
+        # Кэш живёт до смены версии — читаем без отставания реплики
+        with use_primary():
+            activities = resolve_activity_links(
+                snapshot.activity_links.get(sublocation_id, ()))
+        cache.set(cache_key, activities, world.get_world_cache_timeout())
+    return activities
+
+
+def get_activity_objects() -> list[tuple[ContentType, models.Model]]:
+    """Все доступные активности: один запрос на модель."""
+    objects = []
+    for model in ACTIVITY_MODELS:
+        ct = ContentType.objects.get_for_model(model)
+        objects.extend((ct, obj) for obj in model.objects.all())
+    return objects
+
+
+def get_activity_choices() -> list[tuple[str, str]]:
+    """Выбор активности для админки: [(ключ, подпись)].
+
+    Строится одним проходом по ACTIVITY_MODELS и кэшируется до смены
+    версии мира (изменение любой активности её повышает).
+    """
+    snapshot = world.get_world()
+    cache_key = f'world:{snapshot.version}:activity_choices'
+    choices = cache.get(cache_key)
+    if choices is None:
+        with use_primary():
+            choices = [
+                (activity_key(ct.pk, obj.pk), str(obj))
+                for ct, obj in get_activity_objects()
+            ]
+        cache.set(cache_key, choices, world.get_world_cache_timeout())
+    return choices
+
+
+def search_activities(term: str, page: int = 1, page_size: int = 20
+                      ) -> tuple[list[tuple[str, str]], bool]:
+    """Страница выбора активностей, в подписи которых есть term.
+
+    Returns:
+        tuple: (страница [(ключ, подпись)], есть ли следующая страница).
+    """
+    term = term.casefold()
+    found = [choice for choice in get_activity_choices()
+             if term in choice[1].casefold()]
+    start = (page - 1) * page_size
+    return found[start:start + page_size], len(found) > start + page_size
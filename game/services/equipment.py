@@ -0,0 +1,123 @@
+"""Экипировка игрока.
+
+Бонусы надетых предметов хранятся суммой-вектором (game.stat_schema)
+в player_stats.equipment_bonus и меняются на статы одного предмета при каждом
+надевании или снятии. Итоговые характеристики (effective_stats)
+пересчитывает PlayerStats.save(), поэтому бою и интерфейсу не нужно
+перебирать надетые предметы.
+"""
+from array import array
+from uuid import UUID
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from game import stat_schema
+from game.exceptions import EquipError
+from game.models import Equipment, ItemInstance
+from users.models import CustomUser, PlayerStats
+
+
+def _lock_stats(user: CustomUser) -> PlayerStats:
+    """Строка характеристик игрока под блокировкой до конца транзакции.
+
+    Блокировка упорядочивает параллельные надевания одного игрока:
+    каждое меняет сумму бонусов, прочитанную после предыдущего.
+    """
+    return PlayerStats.objects.select_for_update().get(user=user)
+
+
+def _save_bonus(user: CustomUser, stats: PlayerStats, bonus: array):
+    stats.equipment_bonus = bonus.tolist()
+    stats.save(update_fields=['equipment_bonus'])
+    user.player_stats = stats
+
+
+def get_equipment(user: CustomUser) -> dict[str, ItemInstance]:
+    """Надетые предметы игрока: слот -> экземпляр предмета."""
+    equipment = Equipment.objects.filter(
+        owner=user).select_related('instance__item')
+    return {equip.slot: equip.instance for equip in equipment}
+
+
+@transaction.atomic
+def equip(user: CustomUser, world_id: str | UUID) -> ItemInstance | None:
+    """Надевает предмет из инвентаря, предмет из того же слота снимается.
+
+    Args:
+        user: Игрок.
+        world_id: world_id предмета в инвентаре игрока.
+
+    Raises:
+        EquipError: Если предмета нет в инвентаре, он не экипировка
+                    или игроку не хватает уровня.
+
+    Returns:
+        ItemInstance | None: Снятый предмет, если слот был занят.
+    """
+    try:
+        # Блокировка экземпляра: пока он надевается, его нельзя
+        # продать или передать другому игроку
+        instance = (ItemInstance.objects.select_related('item')
+                    .select_for_update(of=('self',))
+                    .get(owner=user, world_id=world_id))
+    except (ItemInstance.DoesNotExist, ValidationError) as e:
+        raise EquipError('Предмета нет в инвентаре') from e
+    item = instance.item
+    if not item.slot:
+        raise EquipError(f'{item.name} нельзя надеть')
+    if item.min_level > user.level:
+        raise EquipError(f'{item.name} доступен с {item.min_level} уровня')
+
+    stats = _lock_stats(user)
+    if Equipment.objects.filter(instance=instance).exists():
+        return None
+    bonus = stat_schema.from_list(stats.equipment_bonus)
+    current = (Equipment.objects.select_related('instance__item')
+               .filter(owner=user, slot=item.slot).first())
+    removed = None
+    if current is not None:
+        removed = current.instance
+        bonus = stat_schema.sub(bonus, stat_schema.item_vector(removed))
+        current.delete()
+    Equipment.objects.create(owner=user, slot=item.slot, instance=instance)
+    _save_bonus(user, stats,
+                stat_schema.add(bonus, stat_schema.item_vector(instance)))
+    return removed
+
+
+@transaction.atomic
+def unequip(user: CustomUser, slot: str) -> ItemInstance | None:
+    """Снимает предмет из слота обратно в инвентарь.
+
+    Returns:
+        ItemInstance | None: Снятый предмет, None если слот пуст.
+    """
+    stats = _lock_stats(user)
+    current = (Equipment.objects.select_related('instance__item')
+               .filter(owner=user, slot=slot).first())
+    if current is None:
+        return None
+    current.delete()
+    _save_bonus(user, stats, stat_schema.sub(
+        stat_schema.from_list(stats.equipment_bonus),
+        stat_schema.item_vector(current.instance)))
+    return current.instance
+
+
+@transaction.atomic
+def rebuild_equipment_bonus(user: CustomUser) -> array:
+    """Пересчитывает бонусы экипировки по надетым предметам.
+
+    Нужен, если экипировку меняли в обход equip/unequip
+    (например, удалили экземпляр предмета в админке).
+
+    Returns:
+        array: Итоговые характеристики игрока.
+    """
+    stats = _lock_stats(user)
+    bonus = stat_schema.zeros()
+    for instance in get_equipment(user).values():
+        bonus = stat_schema.add(bonus, stat_schema.item_vector(instance))
+    _save_bonus(user, stats, bonus)
+    return user.effective_stats
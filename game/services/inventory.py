@@ -1,7 +1,7 @@
-from typing import overload, cast
+from typing import overload
 from uuid import UUID
-from pprint import pprint
 
+from game import stat_schema
 from game.exceptions import (
     AddDropListInInventoryError,
     InsufficientQuantity,
@@ -10,12 +10,62 @@ from game.exceptions import (
     WrongDeltaForInstance,
     ZeroDelta,
 )
-from game.models import Item, ItemInstance, ItemStack, ShopItem, Shop
-from game.models.shops import Shop
-from users.models import CustomUser
+from game.models import Item, ItemInstance, ItemStack, Shop, ShopItem
 from game.utils import get_item_stats_fot_tooltip  # нужно перенести
+from users.models import CustomUser
 
-from .items import create_item_instance
+
+def _stack_row(stack: ItemStack) -> dict:
+    """Строка инвентаря для стака предметов"""
+    item: Item = stack.item
+    return {
+        'type': 'stack',
+        'item_id': item.id,
+        'name': item.name,
+        'description': item.description,
+        'logo_url': item.logo.url if item.logo else None,
+        'quantity': stack.quantity
+    }
+
+
+def _instance_row(instance: ItemInstance) -> dict:
+    """Строка инвентаря для уникального предмета"""
+    inst_item: Item = instance.item
+    return {
+        'type': 'instance',
+        'item_id': inst_item.id,
+        'name': inst_item.name,
+        'description': inst_item.description,
+        'logo_url': inst_item.logo.url if inst_item.logo else None,
+        'stats': get_item_stats_fot_tooltip(instance),
+        'world_id': instance.world_id
+    }
+
+
+def _shop_row(stack: ShopItem) -> dict:
+    """Строка инвентаря магазина"""
+    item: Item = stack.item
+    if item.is_stacked:
+        max_quantity = 1000
+    max_quantity = 1
+    return {
+        'is_stacked': item.is_stacked,
+        'type': item.item_type,
+        'item_id': item.id,
+        'name': item.name,
+        'description': item.description,
+        'logo_url': item.logo.url if item.logo else None,
+        'stats': get_item_stats_fot_tooltip(stack),
+        'base_price': stack.price,
+        'max_quantity': max_quantity
+    }
+
+
+def _add_empty_slots(player_inventory: list[dict], inventory_slots: int):
+    """Добавляет пустые слоты до максимально возможных"""
+    while len(player_inventory) < inventory_slots:
+        player_inventory.append({'type': 'empty',
+                                 'slot_number': len(player_inventory) + 1})
 
 
 @overload
@@ -64,8 +114,10 @@ def get_item_from_inventory(
         if world_id is None:
             item_in_bag = ItemStack.objects.get(owner=user, item=item)
         else:
-            item_in_bag = ItemInstance.objects.get(owner=user,
-                                                   world_id=world_id)
+            # Надетый предмет не лежит в инвентаре: его нельзя
+            # продать или выбросить, пока он не снят
+            item_in_bag = ItemInstance.objects.get(
+                owner=user, world_id=world_id, equipment__isnull=True)
         return item_in_bag
     except (ItemStack.DoesNotExist, ItemInstance.DoesNotExist) as e:
         raise NoItemInInventory(
@@ -110,6 +162,13 @@ def change_stack_quantity(user: CustomUser,
         raise ZeroDelta('Кол-во нельзя изменять на 0')
 
 
+def _unowned(item: Item, world_id: str | UUID):
+    """Экземпляр предмета без владельца, который не надет."""
+    return ItemInstance.objects.filter(
+        item=item, world_id=world_id, owner__isnull=True,
+        equipment__isnull=True)
+
+
 def add_or_remove_unique_item(user: CustomUser,
                               item: Item,
                               delta: int,
@@ -124,13 +183,23 @@ def add_or_remove_unique_item(user: CustomUser,
                   По умолчанию None.
     """
     if delta == 1:
-        item_instance = ItemInstance.objects.get(world_id=world_id)
-        item_instance.owner = user
-        item_instance.save(update_fields=['owner'])
+        # Забрать можно только ничей предмет (новый дроп, товар
+        # магазина): чужой или надетый предмет не переходит
+        taken = _unowned(item, world_id).update(owner=user)
+        if not taken:
+            raise NoItemInInventory(
+                f'Предмет {item.name} (world_id={world_id}) недоступен')
         return
     elif delta == -1 and world_id is not None:
-        item_in_inventory = get_item_from_inventory(user, item, world_id)
-        item_in_inventory.delete()
+        # Условный DELETE: предмет, надетый между проверкой и
+        # удалением, остаётся у игрока вместе с экипировкой
+        deleted, _ = ItemInstance.objects.filter(
+            owner=user, item=item, world_id=world_id,
+            equipment__isnull=True).delete()
+        if not deleted:
+            raise NoItemInInventory(
+                f'Предмет {item.name} (world_id={world_id}) '
+                f'отсутствует в инвентаре')
         return
     else:
         raise WrongDeltaForInstance(
@@ -197,42 +266,18 @@ def get_user_inventory_data(user: CustomUser) -> list[dict]:
         player_inventory: Список с предметами в инвентаре.
     """
     player_inventory = []
-    inventiry_slots = user.item_slots
+    inventiry_slots = user.effective_stats[stat_schema.ITEM_SLOTS]
     stacks = ItemStack.objects.filter(
         owner=user).select_related('item').order_by('item__name')
     instances = ItemInstance.objects.filter(
-        owner=user).select_related('item').order_by('item__name')
+        owner=user, equipment__isnull=True).select_related(
+        'item').order_by('item__name')
     for stack in stacks:
-        item: Item = stack.item
-        player_inventory.append(
-            {
-                'type': 'stack',
-                'item_id': item.id,
-                'name': item.name,
-                'description': item.description,
-                'logo_url': item.logo.url if item.logo else None,
-                'quantity': stack.quantity
-            }
-        )
+        player_inventory.append(_stack_row(stack))
     for instance in instances:
-        inst_item: Item = instance.item
-        print(type(item))
-        player_inventory.append(
-            {
-                'type': 'instance',
-                'item_id': inst_item.id,
-                'name': inst_item.name,
-                'description': inst_item.description,
-                'logo_url': inst_item.logo.url if inst_item.logo else None,
-                'stats': get_item_stats_fot_tooltip(instance),
-                'world_id': instance.world_id
-            }
-
-        )
+        player_inventory.append(_instance_row(instance))
     # Добавим пустые слоты до максимальных возможных
-    while len(player_inventory) < inventiry_slots:
-        player_inventory.append({'type': 'empty',
-                                 'slot_number': len(player_inventory) + 1})
+    _add_empty_slots(player_inventory, inventiry_slots)
     return player_inventory
 
 
@@ -251,21 +296,42 @@ def get_shop_inventory_data(shop_name: str):
     stacks = ShopItem.objects.filter(shop=shop,
                                      is_active=True).select_related('item')
     for stack in stacks:
-        item: Item = stack.item
-        if item.is_stacked:
-            max_quantity = 1000
-        max_quantity = 1
-        trader_inventory.append(
-            {
-                'is_stacked': item.is_stacked,
-                'type': item.item_type,
-                'item_id': item.id,
-                'name': item.name,
-                'description': item.description,
-                'logo_url': item.logo.url if item.logo else None,
-                'stats': get_item_stats_fot_tooltip(stack),
-                'base_price': item.cost,
-                'max_quantity': max_quantity
-            }
-        )
+        trader_inventory.append(_shop_row(stack))
     return trader_inventory
+
+
+# ---- Асинхронные версии для ASGI-представлений ----
+
+
+async def aget_user_inventory_data(user: CustomUser) -> list[dict]:
+    """Асинхронная версия get_user_inventory_data."""
+    player_inventory = []
+    stacks = ItemStack.objects.filter(
+        owner=user).select_related('item').order_by('item__name')
+    instances = ItemInstance.objects.filter(
+        owner=user, equipment__isnull=True).select_related(
+        'item').order_by('item__name')
+    async for stack in stacks:
+        player_inventory.append(_stack_row(stack))
+    async for instance in instances:
+        player_inventory.append(_instance_row(instance))
+    _add_empty_slots(player_inventory,
+                     user.effective_stats[stat_schema.ITEM_SLOTS])
+    return player_inventory
+
+
+async def aget_user_stacks_data(user: CustomUser) -> list[dict]:
+    """Стаки предметов игрока с пустыми слотами (страница персонажа)."""
+    stacks = ItemStack.objects.filter(
+        owner=user).select_related('item').order_by('item__name')
+    player_inventory = [_stack_row(stack) async for stack in stacks]
+    _add_empty_slots(player_inventory,
+                     user.effective_stats[stat_schema.ITEM_SLOTS])
+    return player_inventory
+
+
+async def aget_shop_inventory_data(shop_name: str) -> list[dict]:
+    """Асинхронная версия get_shop_inventory_data."""
+    stacks = ShopItem.objects.filter(
+        shop__name=shop_name, is_active=True).select_related('item')
+    return [_shop_row(stack) async for stack in stacks]
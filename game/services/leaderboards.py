@@ -0,0 +1,298 @@
+"""Рейтинги игроков: опыт, валюта, убийства всего и по монстрам.
+
+Топ каждого рейтинга (LEADERBOARD_SIZE строк) хранится в общем кэше
+списком (счёт, id игрока, ник) и обновляется на игровых событиях:
+игрок, чей счёт изменился, вставляется в список или сдвигается в нём.
+Страница рейтинга читает только этот список.
+
+Если из полного топа выбывает игрок, кэш не знает, кто займёт
+последнее место: топ сбрасывается и при следующем чтении строится
+заново одним запросом ORDER BY ... LIMIT по индексу. Тот же запрос
+страхует от потерянных обновлений (два воркера одновременно
+переписали топ): кэш живёт LEADERBOARD_TIMEOUT секунд, а команда
+rebuild_leaderboards перестраивает все рейтинги целиком.
+
+Место игрока вне топа считается запросом COUNT(счёт > мой) по индексу.
+"""
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, QuerySet
+
+from corelight.routers import read_from_replica
+from game.models import Currency, Monster, MonsterKill, Wallet
+from users.models import CustomUser, PlayerState
+
+from . import world
+
+# (счёт, id игрока, ник)
+Entry = tuple[int, int, str]
+
+
+def get_leaderboard_size() -> int:
+    """Сколько строк топа хранится в кэше."""
+    return getattr(settings, 'LEADERBOARD_SIZE', 100)
+
+
+def get_leaderboard_timeout() -> int:
+    """Время жизни топа в кэше в секундах."""
+    return getattr(settings, 'LEADERBOARD_TIMEOUT', 60 * 60)
+
+
+def _sort_key(entry: Entry):
+    # Больший счёт выше, при равенстве — кто раньше зарегистрировался
+    return -entry[0], entry[1]
+
+
+def _merge(entries: list[Entry], entry: Entry,
+           size: int) -> list[Entry] | None:
+    """Топ после изменения счёта игрока.
+
+    Returns:
+        list | None: Новый топ (тот же объект, если он не изменился)
+                     или None, если топ нужно перестроить запросом.
+    """
+    score, user_id, _ = entry
+    rest = [row for row in entries if row[1] != user_id]
+    full = len(entries) == size
+    if len(rest) == len(entries):
+        # Игрока не было в топе
+        if score <= 0 or (full and _sort_key(entry) > _sort_key(rest[-1])):
+            return entries
+    elif entry in entries:
+        return entries
+    elif full and (score <= 0 or not rest
+                   or _sort_key(entry) > _sort_key(rest[-1])):
+        # Игрок выбыл из полного топа: кто теперь последний, знает только БД
+        return None
+    if score <= 0:
+        return rest
+    return sorted([*rest, entry], key=_sort_key)[:size]
+
+
+def with_ranks(entries: list[Entry]) -> list[dict]:
+    """Строки топа с местами (при равном счёте место одно)."""
+    rows = []
+    for position, (score, user_id, nickname) in enumerate(entries, 1):
+        if rows and rows[-1]['score'] == score:
+            rank = rows[-1]['rank']
+        else:
+            rank = position
+        rows.append({'rank': rank, 'user_id': user_id,
+                     'nickname': nickname, 'score': score})
+    return rows
+
+
+@dataclass(frozen=True)
+class Leaderboard:
+    """Рейтинг по числовой колонке модели, связанной с игроком.
+
+    Attributes:
+        key: Имя рейтинга в URL и ключе кэша.
+        title: Заголовок страницы.
+        queryset: Строки рейтинга (по одной на игрока).
+        score_field: Колонка со счётом (по ней есть индекс).
+        user_field: Внешний ключ на игрока.
+    """
+    key: str
+    title: str
+    queryset: QuerySet
+    score_field: str
+    user_field: str = 'user'
+
+    @property
+    def cache_key(self) -> str:
+        return f'leaderboard:{self.key}'
+
+    def _top_rows(self, limit: int) -> QuerySet:
+        user_id = f'{self.user_field}_id'
+        return (self.queryset
+                .filter(**{f'{self.score_field}__gt': 0})
+                .order_by(f'-{self.score_field}', user_id)
+                .values_list(self.score_field, user_id,
+                             f'{self.user_field}__nickname')[:limit])
+
+    def query_top(self, limit: int) -> list[Entry]:
+        """Топ из БД: ORDER BY счёт DESC LIMIT по индексу."""
+        with read_from_replica():
+            return list(self._top_rows(limit))
+
+    async def aquery_top(self, limit: int) -> list[Entry]:
+        with read_from_replica():
+            return [row async for row in self._top_rows(limit)]
+
+    def rebuild(self) -> list[Entry]:
+        """Перестраивает топ в кэше запросом к БД."""
+        entries = self.query_top(get_leaderboard_size())
+        cache.set(self.cache_key, entries, get_leaderboard_timeout())
+        return entries
+
+    async def arebuild(self) -> list[Entry]:
+        entries = await self.aquery_top(get_leaderboard_size())
+        await cache.aset(self.cache_key, entries, get_leaderboard_timeout())
+        return entries
+
+    def top(self, limit: int | None = None) -> list[dict]:
+        """Первые limit строк рейтинга с местами."""
+        entries = cache.get(self.cache_key)
+        if entries is None:
+            entries = self.rebuild()
+        return with_ranks(entries[:limit])
+
+    async def atop(self, limit: int | None = None) -> list[dict]:
+        entries = await cache.aget(self.cache_key)
+        if entries is None:
+            entries = await self.arebuild()
+        return with_ranks(entries[:limit])
+
+    def record(self, user: CustomUser,
+               score: int | Callable[[], int | None]):
+        """Новый счёт игрока: обновляет топ в кэше, если он изменился.
+
+        Args:
+            user: Игрок.
+            score: Счёт или функция, читающая его из БД. Функция
+                   вызывается, только если топ есть в кэше.
+        """
+        entries = cache.get(self.cache_key)
+        if entries is None:
+            # Топ построится из БД при первом чтении
+            return
+        if callable(score):
+            score = score()
+            if score is None:
+                return
+        merged = _merge(entries, (score, user.pk, user.nickname),
+                        get_leaderboard_size())
+        if merged is None:
+            cache.delete(self.cache_key)
+        elif merged is not entries:
+            cache.set(self.cache_key, merged, get_leaderboard_timeout())
+
+    def rank(self, user: CustomUser,
+             top: list[dict] | None = None) -> dict | None:
+        """Место и счёт игрока (None, если он ещё не в рейтинге).
+
+        Для игрока из топа — по кэшу, иначе двумя запросами по индексу.
+
+        Args:
+            user: Игрок.
+            top: Уже прочитанный топ (self.top()), чтобы не читать кэш снова.
+        """
+        for row in self.top() if top is None else top:
+            if row['user_id'] == user.pk:
+                return row
+        rows = self.queryset.filter(**{self.user_field: user})
+        with read_from_replica():
+            score = rows.values_list(self.score_field, flat=True).first()
+            if not score:
+                return None
+            above = self.queryset.filter(
+                **{f'{self.score_field}__gt': score}).count()
+        return {'rank': above + 1, 'user_id': user.pk,
+                'nickname': user.nickname, 'score': score}
+
+
+def xp_board() -> Leaderboard:
+    return Leaderboard('xp', 'Опыт', PlayerState.objects.all(),
+                       'experience')
+
+
+def kills_board() -> Leaderboard:
+    return Leaderboard('kills', 'Убито монстров', PlayerState.objects.all(),
+                       'kills')
+
+
+def currency_board(code: str, name: str | None = None) -> Leaderboard:
+    return Leaderboard(f'currency-{code.lower()}', name or code,
+                       Wallet.objects.filter(currency__code=code), 'amount')
+
+
+def monster_board(monster: Monster) -> Leaderboard:
+    return Leaderboard(f'monster-{monster.slug}', monster.name,
+                       MonsterKill.objects.filter(monster_id=monster.pk),
+                       'count', 'player')
+
+
+def get_board(key: str) -> Leaderboard | None:
+    """Рейтинг по имени из URL: xp, kills, currency-<код>, monster-<slug>."""
+    if key == 'xp':
+        return xp_board()
+    if key == 'kills':
+        return kills_board()
+    kind, _, name = key.partition('-')
+    if kind == 'monster':
+        monster = world.get_world().monsters_by_slug.get(name)
+        return monster_board(monster) if monster is not None else None
+    if kind == 'currency':
+        currency = (Currency.objects.filter(code__iexact=name)
+                    .values_list('code', 'name').first())
+        return currency_board(*currency) if currency is not None else None
+    return None
+
+
+def all_boards() -> list[Leaderboard]:
+    """Все рейтинги: для полной перестройки."""
+    boards = [xp_board(), kills_board()]
+    boards += [currency_board(code, name) for code, name
+               in Currency.objects.values_list('code', 'name')]
+    boards += [monster_board(monster) for monster
+               in world.get_world().monsters_by_slug.values()]
+    return boards
+
+
+def _create_kill(user: CustomUser, monster: Monster, kills: QuerySet):
+    """Первая строка счётчика убийств монстра игроком.
+
+    INSERT идёт в точке сохранения: IntegrityError не должен прервать
+    транзакцию вызывающего (ATOMIC_REQUESTS, atomic() вокруг действия).
+    """
+    try:
+        with transaction.atomic():
+            MonsterKill.objects.create(player=user, monster=monster, count=1)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос
+        kills.update(count=F('count') + 1)
+
+
+def count_kill(user: CustomUser, monster: Monster) -> QuerySet:
+    """+1 к убийствам монстра игроком.
+
+    Returns:
+        QuerySet: Строка счётчика (для чтения нового значения).
+    """
+    kills = MonsterKill.objects.filter(player=user, monster=monster)
+    if not kills.update(count=F('count') + 1):
+        _create_kill(user, monster, kills)
+    return kills
+
+
+def record_fight(user: CustomUser, monster: Monster):
+    """Обновляет рейтинги после победы над монстром.
+
+    Опыт и общее число убийств игрок уже прибавил (users.volatile),
+    здесь считается только убийство этого монстра. Если топ опыта
+    перестроят из БД до отложенной записи, игрок попадёт в него со
+    старым счётом до своего следующего боя.
+    """
+    xp_board().record(user, user.experience)
+    kills_board().record(user, user.kills)
+    kills = count_kill(user, monster).values_list('count', flat=True)
+    monster_board(monster).record(user, kills.first)
+
+
+def _balance(user: CustomUser, currency_code: str) -> QuerySet:
+    return (Wallet.objects.filter(user=user, currency__code=currency_code)
+            .values_list('amount', flat=True))
+
+
+def record_balance(user: CustomUser, currency_code: str):
+    """Обновляет рейтинг валюты текущим балансом игрока.
+
+    Баланс читается из БД, только если топ валюты есть в кэше.
+    """
+    currency_board(currency_code).record(
+        user, _balance(user, currency_code).first)
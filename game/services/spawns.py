@@ -0,0 +1,243 @@
+"""Живые монстры в саблокациях.
+
+Монстр в саблокации — это spawn_count особей (слотов). Убитая особь —
+ключ spawn:<саблокация>:<монстр>:<слот> в общем кэше со значением
+«мертва до» и временем жизни respawn_seconds: пока ключ есть, особь
+мертва, истёк — возродилась. Заявка на бой — cache.add этого ключа,
+он атомарен в общем кэше: из двух игроков, напавших на одну особь,
+её получит только один. Поэтому кэш должен быть общим для всех
+процессов (corelight/caches.py, проверка game.E001): в LocMemCache
+у каждого воркера свои особи, а вытеснение записей по MAX_ENTRIES
+возрождает монстров раньше срока.
+
+Таймер возрождения — срок жизни ключа. Планировщику не нужно пакетно
+обходить особи: кэш сам снимает ключи с истёкшим сроком, а воркер
+узнаёт о возрождении, когда перечитывает пул. На респавн не тратится
+ни запись в БД, ни проход по всем особям.
+
+Каждый воркер держит свой шард — пулы (array('d') «мертва до» по
+слотам) тех саблокаций, где он обслуживал игроков. По пулу выбираются
+особи, которые вероятно живы, и считается число живых для страницы.
+Пул старше SPAWN_POOL_TTL секунд перечитывается из общего кэша одним
+get_many; если особь успел убить другой воркер, cache.add вернёт False
+и будет выбрана следующая.
+
+Состояние не пишется в БД на каждое убийство: команда run_spawner
+периодически сохраняет мёртвые особи в SpawnSnapshot и
+восстанавливает их в кэш, если он потерян (рестарт, вытеснение).
+"""
+import random
+import threading
+import time
+from array import array
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+
+from game.models import Monster, SpawnSnapshot
+
+from . import world
+
+# Пока ключа нет, кэш потерян и мёртвые особи ещё не восстановлены
+RESTORED_KEY = 'spawn:restored'
+
+
+def get_pool_ttl() -> float:
+    """Сколько секунд воркер доверяет своему пулу без общего кэша."""
+    return getattr(settings, 'SPAWN_POOL_TTL', 2)
+
+
+def _slot_key(sublocation_id: int, monster_id: int, slot: int) -> str:
+    return f'spawn:{sublocation_id}:{monster_id}:{slot}'
+
+
+def _slot_keys(sublocation_id: int, monster: Monster) -> list[str]:
+    return [_slot_key(sublocation_id, monster.pk, slot)
+            for slot in range(monster.spawn_count)]
+
+
+@dataclass
+class Pool:
+    """Особи монстра в саблокации глазами одного воркера.
+
+    Attributes:
+        dead_until: Время возрождения по слотам (0 — особь жива).
+        refreshed_at: Когда пул последний раз читался из общего кэша.
+    """
+    dead_until: array
+    refreshed_at: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock,
+                                 repr=False, compare=False)
+
+    def alive_slots(self, now: float) -> list[int]:
+        """Живые слоты, начиная со случайного: игроки разных воркеров
+        реже нападают на одну и ту же особь.
+        """
+        slots = [slot for slot, until in enumerate(self.dead_until)
+                 if until <= now]
+        if slots:
+            start = random.randrange(len(slots))
+            slots = slots[start:] + slots[:start]
+        return slots
+
+    def alive(self, now: float) -> int:
+        return sum(1 for until in self.dead_until if until <= now)
+
+    def is_stale(self, now: float) -> bool:
+        return now - self.refreshed_at > get_pool_ttl()
+
+    def update(self, values: list[float | None], now: float):
+        """Состояние слотов из общего кэша (None — ключа нет, особь жива)."""
+        with self.lock:
+            for slot, until in enumerate(values):
+                self.dead_until[slot] = until or 0.0
+            self.refreshed_at = now
+
+
+# Шард воркера: (саблокация, монстр) -> пул
+_pools: dict[tuple[int, int], Pool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(sublocation_id: int, monster: Monster) -> Pool:
+    """Пул воркера, пустой пул создаётся при первом обращении.
+
+    Если в админке поменяли spawn_count, пул создаётся заново.
+    """
+    key = (sublocation_id, monster.pk)
+    pool = _pools.get(key)
+    if pool is None or len(pool.dead_until) != monster.spawn_count:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None or len(pool.dead_until) != monster.spawn_count:
+                pool = Pool(array('d', [0.0]) * monster.spawn_count)
+                _pools[key] = pool
+    return pool
+
+
+def reset_pools():
+    """Забывает шард воркера (после очистки общего кэша)."""
+    with _pools_lock:
+        _pools.clear()
+
+
+def _stale_pools(sublocation_id: int, monsters, now: float) -> dict:
+    pools = {monster: get_pool(sublocation_id, monster)
+             for monster in monsters}
+    return {monster: pool for monster, pool in pools.items()
+            if pool.is_stale(now)}
+
+
+def _update_pools(sublocation_id: int, stale: dict, values: dict,
+                  now: float):
+    for monster, pool in stale.items():
+        pool.update([values.get(key)
+                     for key in _slot_keys(sublocation_id, monster)], now)
+
+
+def refresh(sublocation_id: int, monsters) -> None:
+    """Перечитывает устаревшие пулы саблокации одним get_many."""
+    now = time.time()
+    stale = _stale_pools(sublocation_id, monsters, now)
+    if stale:
+        keys = [key for monster in stale
+                for key in _slot_keys(sublocation_id, monster)]
+        _update_pools(sublocation_id, stale, cache.get_many(keys), now)
+
+
+def alive_counts(sublocation_id: int, monsters) -> dict[int, int]:
+    """Сколько особей каждого монстра саблокации живо.
+
+    Returns:
+        dict: id монстра -> число живых особей.
+    """
+    refresh(sublocation_id, monsters)
+    now = time.time()
+    return {monster.pk: get_pool(sublocation_id, monster).alive(now)
+            for monster in monsters}
+
+
+def _claimed(pool: Pool, slot: int, until: float):
+    with pool.lock:
+        pool.dead_until[slot] = until
+
+
+def claim(sublocation_id: int, monster: Monster) -> bool:
+    """Забирает живую особь монстра для боя.
+
+    Returns:
+        bool: True, если особь досталась этому игроку; False, если
+              все особи мертвы.
+    """
+    refresh(sublocation_id, (monster,))
+    pool = get_pool(sublocation_id, monster)
+    now = time.time()
+    until = now + monster.respawn_seconds
+    for slot in pool.alive_slots(now):
+        if cache.add(_slot_key(sublocation_id, monster.pk, slot), until,
+                     monster.respawn_seconds):
+            _claimed(pool, slot, until)
+            return True
+        # Особь убил другой воркер; точное время возрождения
+        # станет известно при следующем обновлении пула
+        _claimed(pool, slot, now + get_pool_ttl())
+    return False
+
+
+def save_snapshots() -> int:
+    """Сохраняет мёртвые особи всех саблокаций в SpawnSnapshot.
+
+    Одно чтение кэша и одна вставка с обновлением при конфликте.
+
+    Returns:
+        int: Сколько особей мертво.
+    """
+    snapshot = world.get_world()
+    keys = {}
+    for sublocation_id, monsters in snapshot.sublocation_monsters.items():
+        for monster in monsters:
+            for slot, key in enumerate(_slot_keys(sublocation_id, monster)):
+                keys[key] = (sublocation_id, monster.pk, slot)
+    values = cache.get_many(list(keys))
+
+    states = {sublocation_id: {} for sublocation_id
+              in snapshot.sublocation_monsters}
+    for key, until in values.items():
+        sublocation_id, monster_id, slot = keys[key]
+        states[sublocation_id].setdefault(str(monster_id), {})[
+            str(slot)] = until
+    SpawnSnapshot.objects.bulk_create(
+        [SpawnSnapshot(sublocation_id=sublocation_id, state=state)
+         for sublocation_id, state in states.items()],
+        update_conflicts=True,
+        unique_fields=['sublocation'],
+        update_fields=['state', 'saved_at'],
+    )
+    return len(values)
+
+
+def restore_snapshots(force: bool = False) -> int | None:
+    """Возвращает в кэш особи, мёртвые по последним снимкам.
+
+    Выполняется, только если кэш потерян (нет RESTORED_KEY): особь,
+    убитую после снимка, нельзя воскресить старым состоянием.
+
+    Args:
+        force: Восстановить, даже если кэш не терялся.
+
+    Returns:
+        int | None: Сколько особей восстановлено, None если кэш цел.
+    """
+    if not cache.add(RESTORED_KEY, time.time(), timeout=None) and not force:
+        return None
+    now = time.time()
+    restored = 0
+    for row in SpawnSnapshot.objects.all():
+        for monster_id, slots in row.state.items():
+            for slot, until in slots.items():
+                if until > now and cache.add(
+                        _slot_key(row.sublocation_id, monster_id, slot),
+                        until, until - now):
+                    restored += 1
+    return restored
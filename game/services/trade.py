@@ -0,0 +1,127 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+
+from game.exceptions import GameError
+from game.metrics import TRADE_GOLD
+from game.models import Currency, Item, ShopItem, Wallet
+from users.models import CustomUser
+
+from . import action_log, inventory, leaderboards
+
+QUANTITY_ERROR = 'Количество должно быть больше нуля'
+CURRENCY_ERROR = 'Валюта GOLD не настроена'
+
+# Магазин страницы торговца (game:trader_test)
+TRADER_SHOP = 'Походник'
+
+
+def _offer(shop_name: str, item_id: int) -> ShopItem | None:
+    """Предложение магазина для предмета (None, если не продаётся)."""
+    return (ShopItem.objects
+            .filter(shop__name=shop_name, item_id=item_id, is_active=True)
+            .select_related('item')
+            .first())
+
+
+def buy_item(user: CustomUser,
+             item_id: int,
+             delta: int,
+             world_id: str | None = None,
+             shop_name: str = TRADER_SHOP) -> tuple[bool, str | None]:
+    """Покупка предмета в магазине по цене магазина.
+
+    Цена берётся из ShopItem магазина, с которым торгует игрок
+    (стоимость предмета × коэффициент магазина), а не из запроса.
+    Списание золота и выдача предмета выполняются в одной транзакции.
+
+    Returns:
+        (True, None) при успехе, иначе (False, текст ошибки).
+    """
+    if delta < 1:
+        return False, QUANTITY_ERROR
+    offer = _offer(shop_name, item_id)
+    if offer is None:
+        return False, 'Предмет не продаётся'
+    item = offer.item
+
+    total_cost = offer.price * delta
+    wallets = Wallet.objects.filter(user=user, currency__code='GOLD')
+    try:
+        with transaction.atomic():
+            charged = wallets.filter(amount__gte=total_cost).update(
+                amount=F('amount') - total_cost)
+            if not charged:
+                if not wallets.exists():
+                    return False, "Кошелёк не найден"
+                return False, "Недостаточно золота"
+            inventory.change_item_quantity(user, item, delta, world_id)
+    except (GameError, ValidationError) as e:
+        return False, str(e)
+    TRADE_GOLD.inc(total_cost, direction='spent')
+    action_log.record(user.pk, 'buy', item=item.pk, quantity=delta,
+                      gold=total_cost, world_id=world_id)
+    leaderboards.record_balance(user, 'GOLD')
+    return True, None
+
+
+def sell_item(user: CustomUser,
+              item_id: int,
+              delta: int,
+              world_id: str | None = None) -> tuple[bool, str | None]:
+    """Продажа предмета в магазин по базовой стоимости.
+
+    Изъятие предмета и начисление золота выполняются в одной транзакции.
+
+    Returns:
+        (True, None) при успехе, иначе (False, текст ошибки).
+    """
+    if delta < 1:
+        return False, QUANTITY_ERROR
+    try:
+        item = Item.objects.get(id=item_id)
+    except Item.DoesNotExist:
+        return False, 'Предмет не существует'
+
+    gold = item.cost * delta
+    try:
+        with transaction.atomic():
+            inventory.change_item_quantity(user, item, -delta, world_id)
+            wallet, created = Wallet.objects.get_or_create(
+                user=user,
+                currency=Currency.objects.get(code='GOLD'),
+                defaults={'amount': 0}
+            )
+            Wallet.objects.filter(pk=wallet.pk).update(
+                amount=F('amount') + gold)
+    except (GameError, ValidationError) as e:
+        return False, str(e)
+    except Currency.DoesNotExist:
+        return False, CURRENCY_ERROR
+    TRADE_GOLD.inc(gold, direction='earned')
+    action_log.record(user.pk, 'sell', item=item.pk, quantity=delta,
+                      gold=gold, world_id=world_id)
+    leaderboards.record_balance(user, 'GOLD')
+    return True, None
+
+
+# ---- Асинхронные версии ----
+
+
+async def abuy_item(user: CustomUser,
+                    item_id: int,
+                    delta: int,
+                    world_id: str | None = None,
+                    shop_name: str = TRADER_SHOP) -> tuple[bool, str | None]:
+    """Асинхронная версия buy_item: сделка выполняется в потоке."""
+    return await sync_to_async(buy_item)(user, item_id, delta, world_id,
+                                         shop_name)
+
+
+async def asell_item(user: CustomUser,
+                     item_id: int,
+                     delta: int,
+                     world_id: str | None = None) -> tuple[bool, str | None]:
+    """Асинхронная версия sell_item: сделка выполняется в потоке."""
+    return await sync_to_async(sell_item)(user, item_id, delta, world_id)
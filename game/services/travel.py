@@ -2,16 +2,22 @@ from users.models import CustomUser
 from game.constants import SECONDS_PER_UNIT_DISTANCE
 from game.models import GlobalLocation, SubLocation
 
+from . import world
+
 
 def calculate_travel_time(user: CustomUser,
                           target_global_location: GlobalLocation,
                           target_sublocation: SubLocation) -> int:
-    if (user.current_global_location is None or
-            user.current_sublocation is None):
+    snapshot = world.get_world()
+    current_global_location = snapshot.global_locations.get(
+        user.current_global_location_id)
+    current_sublocation = snapshot.sublocations.get(
+        user.current_sublocation_id)
+    if current_global_location is None or current_sublocation is None:
         return 0
     else:
-        if user.current_global_location == target_global_location:
-            travel_time = abs(user.current_sublocation.distance_to_location_start - target_sublocation.distance_to_location_start)
+        if current_global_location.pk == target_global_location.pk:
+            travel_time = abs(current_sublocation.distance_to_location_start - target_sublocation.distance_to_location_start)
         else:
-            travel_time = user.current_sublocation.distance_to_location_start + abs(user.current_global_location.distance_to_the_city - target_global_location.distance_to_the_city) + target_sublocation.distance_to_location_start
+            travel_time = current_sublocation.distance_to_location_start + abs(current_global_location.distance_to_the_city - target_global_location.distance_to_the_city) + target_sublocation.distance_to_location_start
     return travel_time * SECONDS_PER_UNIT_DISTANCE
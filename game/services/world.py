@@ -0,0 +1,220 @@
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from corelight.routers import use_primary
+from game.models import ActivityLink, GlobalLocation, Monster, SubLocation
+
+# Ключ глобальной версии игрового контента (локации, монстры, активности).
+WORLD_VERSION_KEY = 'world:version'
+
+
+# Версия, прочитанная процессом из кэша: (момент устаревания, версия)
+_local_version: tuple[float, int] | None = None
+
+
+def get_world_version_ttl() -> float:
+    """Сколько секунд процесс доверяет прочитанной версии контента."""
+    return getattr(settings, 'WORLD_VERSION_TTL', 1)
+
+
+def get_world_version() -> int:
+    """Возвращает текущую версию игрового контента.
+
+    Версия хранится в общем кэше и меняется при любом изменении
+    контента через админку. Процесс перечитывает её из кэша не чаще
+    раза в WORLD_VERSION_TTL секунд: правка доходит до остальных
+    воркеров с этой задержкой. Если ключ пропал из кэша (вытеснение,
+    рестарт), создаётся новая версия — старые фрагменты не подхватятся.
+
+    Returns:
+        int: Версия контента.
+    """
+    global _local_version
+    now = time.monotonic()
+    local = _local_version
+    if local is not None and local[0] > now:
+        return local[1]
+    version = cache.get(WORLD_VERSION_KEY)
+    if version is None:
+        cache.add(WORLD_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(WORLD_VERSION_KEY)
+    _local_version = (now + get_world_version_ttl(), version)
+    return version
+
+
+def bump_world_version() -> int:
+    """Инвалидирует все кэши, завязанные на версию контента.
+
+    Returns:
+        int: Новая версия контента.
+    """
+    version = time.time_ns()
+    cache.set(WORLD_VERSION_KEY, version, timeout=None)
+    reset_world_version()
+    return version
+
+
+def reset_world_version():
+    """Забывает версию, прочитанную процессом (после очистки кэша)."""
+    global _local_version
+    _local_version = None
+
+
+def get_world_cache_timeout() -> int:
+    """Время жизни кэшированных фрагментов мира в секундах."""
+    return getattr(settings, 'WORLD_CACHE_TIMEOUT', 60 * 60)
+
+
+@dataclass(frozen=True)
+class WorldSnapshot:
+    """Неизменяемый снимок игрового мира.
+
+    Объекты моделей внутри снимка общие для всех запросов процесса,
+    их нельзя изменять и сохранять — только читать.
+    """
+    version: int
+    global_locations: Mapping[int, GlobalLocation]
+    global_locations_by_slug: Mapping[str, GlobalLocation]
+    global_locations_by_level: tuple[GlobalLocation, ...]
+    sublocations: Mapping[int, SubLocation]
+    sublocations_by_slug: Mapping[str, SubLocation]
+    # Саблокации по id глобальной локации: в порядке имени
+    # и в порядке минимального уровня
+    sublocations_by_global_location: Mapping[int, tuple[SubLocation, ...]]
+    sublocations_by_min_level: Mapping[int, tuple[SubLocation, ...]]
+    monsters: Mapping[int, Monster]
+    monsters_by_slug: Mapping[str, Monster]
+    sublocation_monsters: Mapping[int, tuple[Monster, ...]]
+    activity_links: Mapping[int, tuple[ActivityLink, ...]]
+    # Уровень игрока -> id глобальных локаций, подходящих по уровню
+    level_bands: Mapping[int, tuple[int, ...]]
+
+    def get_global_location(self, slug: str) -> GlobalLocation | None:
+        return self.global_locations_by_slug.get(slug)
+
+    def get_sublocation(self,
+                        slug: str,
+                        global_location: GlobalLocation | None = None
+                        ) -> SubLocation | None:
+        """Возвращает саблокацию по slug.
+
+        Если передана глобальная локация — саблокация должна
+        ей принадлежать, иначе вернётся None.
+        """
+        sublocation = self.sublocations_by_slug.get(slug)
+        if (sublocation is not None and global_location is not None
+                and sublocation.global_location_id != global_location.pk):
+            return None
+        return sublocation
+
+    def global_locations_for_level(self, level: int
+                                   ) -> tuple[GlobalLocation, ...]:
+        """Глобальные локации, подходящие игроку указанного уровня."""
+        return tuple(self.global_locations[pk]
+                     for pk in self.level_bands.get(level, ()))
+
+
+def build_world_snapshot(version: int) -> WorldSnapshot:
+    """Загружает мир из БД одним проходом (4 запроса)."""
+    global_locations = {
+        location.pk: location
+        for location in GlobalLocation.objects.order_by('min_level', 'pk')
+    }
+    sublocations = {}
+    for sublocation in SubLocation.objects.order_by('name', 'pk'):
+        # Кладём глобальную локацию в кэш FK, чтобы не ходить за ней в БД
+        sublocation.global_location = global_locations[
+            sublocation.global_location_id]
+        sublocations[sublocation.pk] = sublocation
+    monsters = {monster.pk: monster for monster in Monster.objects.all()}
+
+    sublocation_monsters: dict[int, list[Monster]] = {
+        pk: [] for pk in sublocations}
+    membership = SubLocation.monsters.through.objects.values_list(
+        'sublocation_id', 'monster_id').order_by('pk')
+    for sublocation_id, monster_id in membership:
+        sublocation_monsters[sublocation_id].append(monsters[monster_id])
+
+    activity_links: dict[int, list[ActivityLink]] = {
+        pk: [] for pk in sublocations}
+    for link in ActivityLink.objects.order_by('pk'):
+        activity_links[link.sublocation_id].append(link)
+
+    by_global: dict[int, list[SubLocation]] = {
+        pk: [] for pk in global_locations}
+    for sublocation in sublocations.values():
+        by_global[sublocation.global_location_id].append(sublocation)
+    by_min_level = {
+        pk: sorted(items, key=lambda s: s.min_level)
+        for pk, items in by_global.items()
+    }
+
+    level_bands: dict[int, list[int]] = {}
+    for location in global_locations.values():
+        for level in range(location.min_level, location.max_level + 1):
+            level_bands.setdefault(level, []).append(location.pk)
+
+    def freeze(mapping):
+        return MappingProxyType(
+            {key: tuple(value) for key, value in mapping.items()})
+
+    return WorldSnapshot(
+        version=version,
+        global_locations=MappingProxyType(global_locations),
+        global_locations_by_slug=MappingProxyType(
+            {location.slug: location
+             for location in global_locations.values()}),
+        global_locations_by_level=tuple(global_locations.values()),
+        sublocations=MappingProxyType(sublocations),
+        sublocations_by_slug=MappingProxyType(
+            {sublocation.slug: sublocation
+             for sublocation in sublocations.values()}),
+        sublocations_by_global_location=freeze(by_global),
+        sublocations_by_min_level=freeze(by_min_level),
+        monsters=MappingProxyType(monsters),
+        monsters_by_slug=MappingProxyType(
+            {monster.slug: monster for monster in monsters.values()}),
+        sublocation_monsters=freeze(sublocation_monsters),
+        activity_links=freeze(activity_links),
+        level_bands=freeze(level_bands),
+    )
+
+
+_snapshot: WorldSnapshot | None = None
+_snapshot_lock = threading.Lock()
+
+
+def get_world() -> WorldSnapshot:
+    """Возвращает снимок мира для текущей версии контента.
+
+    Снимок строится один раз на процесс и пересобирается целиком,
+    когда меняется версия контента. Подмена ссылки атомарна:
+    запрос, уже получивший старый снимок, дочитает его до конца.
+    Снимок читается из основной базы: реплика может ещё не получить
+    изменение, которое повысило версию.
+    """
+    global _snapshot
+    version = get_world_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.version != version:
+            with use_primary():
+                _snapshot = build_world_snapshot(version)
+        return _snapshot
+
+
+async def aget_world() -> WorldSnapshot:
+    """Асинхронная версия get_world.
+
+    Пересборка снимка ходит в БД, поэтому выполняется в потоке.
+    """
+    return await sync_to_async(get_world)()
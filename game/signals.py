@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from game.models import ActivityLink, GlobalLocation, Monster, SubLocation
+from game.services import activities, world
+
+# Модели игрового контента, изменение которых меняет версию мира
+WORLD_CONTENT_MODELS = (
+    GlobalLocation,
+    SubLocation,
+    Monster,
+    ActivityLink,
+    *activities.ACTIVITY_MODELS,
+)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def world_content_changed(sender, **kwargs):
+    """Повышает версию мира при изменении контента.
+
+    Версия меняется после коммита: иначе другой воркер успеет собрать
+    снимок мира без незакоммиченного изменения и сохранит его под новой
+    версией.
+    """
+    if sender in WORLD_CONTENT_MODELS:
+        transaction.on_commit(world.bump_world_version)
+
+
+@receiver(m2m_changed, sender=SubLocation.monsters.through)
+def sublocation_monsters_changed(sender, action, **kwargs):
+    """Повышает версию мира при изменении списка монстров саблокации."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(world.bump_world_version)
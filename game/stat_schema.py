@@ -0,0 +1,146 @@
+"""Схема характеристик: фиксированный порядок и компактные векторы.
+
+Девять характеристик из BASE_STATS повторяются колонками у игрока
+(player_stats), монстра, предмета и экземпляра предмета (с суффиксом
+_bonus). Здесь они собираются в array('h') в порядке STAT_NAMES:
+сложение бонусов, прирост за уровень и сравнения работают с
+векторами, а не со словарями и getattr по строкам.
+
+Индексы характеристик: STRENGTH, DEFENSE, ... — vector[STRENGTH].
+Если у модели нет колонки характеристики (у монстра нет удачи),
+в векторе на её месте 0.
+"""
+from array import array
+from collections.abc import Iterable
+
+from game.constants import BASE_STATS, STATS_PER_LEVEL
+
+TYPECODE = 'h'
+
+STAT_NAMES = tuple(BASE_STATS)
+STAT_INDEX = {name: index for index, name in enumerate(STAT_NAMES)}
+(STRENGTH, DEFENSE, DEXTERITY, STAMINA, INTELLIGENCE, SPIRIT, WILLPOWER,
+ ITEM_SLOTS, LUCK) = (STAT_INDEX[name] for name in (
+    'strength', 'defense', 'dexterity', 'stamina', 'intelligence',
+    'spirit', 'willpower', 'item_slots', 'luck'))
+
+# Колонки модели в порядке STAT_NAMES: (модель, суффикс) -> имена/None
+_columns: dict[tuple[type, str], tuple[str | None, ...]] = {}
+
+
+def zeros() -> array:
+    return array(TYPECODE, [0]) * len(STAT_NAMES)
+
+
+def from_list(values: Iterable[int] | None) -> array:
+    """Вектор из списка в порядке STAT_NAMES (например, из JSON).
+
+    Короткий или пустой список дополняется нулями: так читаются
+    значения, сохранённые до добавления новой характеристики.
+    """
+    vector = array(TYPECODE, values or ())
+    if len(vector) < len(STAT_NAMES):
+        vector.extend([0] * (len(STAT_NAMES) - len(vector)))
+    return vector
+
+
+def from_dict(values: dict[str, int]) -> array:
+    return array(TYPECODE, [values.get(name, 0) for name in STAT_NAMES])
+
+
+def to_dict(vector: array) -> dict[str, int]:
+    """Словарь {характеристика: значение} для JSON и шаблонов."""
+    return dict(zip(STAT_NAMES, vector))
+
+
+def columns(model: type, suffix: str = '') -> tuple[str | None, ...]:
+    """Имена колонок характеристик модели в порядке STAT_NAMES.
+
+    Args:
+        model: Класс модели.
+        suffix: Суффикс колонок ('_bonus' у ItemInstance).
+
+    Returns:
+        tuple: Имя колонки или None, если у модели её нет.
+    """
+    key = (model, suffix)
+    names = _columns.get(key)
+    if names is None:
+        existing = {field.attname for field in model._meta.concrete_fields}
+        names = tuple(name + suffix if name + suffix in existing else None
+                      for name in STAT_NAMES)
+        _columns[key] = names
+    return names
+
+
+def from_instance(obj, suffix: str = '') -> array:
+    """Вектор характеристик объекта модели."""
+    return array(TYPECODE, [
+        getattr(obj, name) if name else 0
+        for name in columns(type(obj), suffix)])
+
+
+def store(obj, vector: array, suffix: str = '') -> list[str]:
+    """Записывает вектор в колонки объекта.
+
+    Returns:
+        list[str]: Изменённые колонки (для save(update_fields=...)).
+    """
+    changed = []
+    for name, value in zip(columns(type(obj), suffix), vector):
+        if name and getattr(obj, name) != value:
+            setattr(obj, name, value)
+            changed.append(name)
+    return changed
+
+
+def from_queryset(queryset, suffix: str = '', key: str = 'pk') -> dict:
+    """Векторы характеристик одним запросом values_list.
+
+    Returns:
+        dict: Значение key -> вектор характеристик.
+    """
+    names = columns(queryset.model, suffix)
+    positions = [index for index, name in enumerate(names) if name]
+    vectors = {}
+    for row in queryset.values_list(key, *filter(None, names)):
+        vector = zeros()
+        for index, value in zip(positions, row[1:]):
+            vector[index] = value
+        vectors[row[0]] = vector
+    return vectors
+
+
+def add(a: array, b: array) -> array:
+    return array(TYPECODE, map(int.__add__, a, b))
+
+
+def sub(a: array, b: array) -> array:
+    return array(TYPECODE, map(int.__sub__, a, b))
+
+
+def scale(vector: array, factor: int) -> array:
+    return array(TYPECODE, [value * factor for value in vector])
+
+
+def compare(a: array, b: array) -> array:
+    """Поэлементное сравнение: 1 где a больше, -1 где меньше, 0 — равны."""
+    return array('b', [(x > y) - (x < y) for x, y in zip(a, b)])
+
+
+def covers(a: array, b: array) -> bool:
+    """Каждая характеристика a не меньше соответствующей в b."""
+    return all(map(int.__ge__, a, b))
+
+
+def item_vector(instance) -> array:
+    """Статы предмета: шаблон Item плюс бонусы экземпляра.
+
+    Принимает ItemInstance, ShopItem (бонусов нет) или сам Item.
+    """
+    item = getattr(instance, 'item', instance)
+    return add(from_instance(item), from_instance(instance, '_bonus'))
+
+
+BASE_VECTOR = from_dict(BASE_STATS)
+PER_LEVEL_VECTOR = from_dict(STATS_PER_LEVEL)
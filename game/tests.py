@@ -1,3 +1,976 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.cache.backends.db import DatabaseCache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, reverse
+from django.utils import timezone
+
+from corelight import settings as project_settings
+from corelight.caches import is_shared
+from corelight.pagination import EstimatedCountPaginator
+from corelight.queries import assert_query_budget, fingerprint, record_queries
+from game import checks, idempotency, stat_schema
+from game.admin import ActivityLinkForm
+from game.constants import SECONDS_PER_UNIT_DISTANCE
+from game.exceptions import EquipError, GameError, TradeError
+from game.models import (
+    ActionLog,
+    ActivityLink,
+    Currency,
+    Equipment,
+    GlobalLocation,
+    Item,
+    ItemInstance,
+    ItemStack,
+    Monster,
+    MonsterDrop,
+    MonsterKill,
+    Shop,
+    ShopItem,
+    SpawnSnapshot,
+    SubLocation,
+    Wallet,
+)
+from game.services import (
+    action_log,
+    actions,
+    equipment,
+    inventory,
+    leaderboards,
+    spawns,
+    trade,
+    travel,
+    world,
+)
+from users import volatile
+from users.backends import bump_user_version
+from users.models import CustomUser, PlayerTravel
+
+
+def _url_names(resolver=None, namespace=''):
+    """Все имена URL проекта вида 'namespace:name'."""
+    resolver = resolver or get_resolver()
+    names = set()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLPattern):
+            if pattern.name:
+                names.add(namespace + pattern.name)
+        else:
+            prefix = (namespace + pattern.namespace + ':'
+                      if pattern.namespace else namespace)
+            names |= _url_names(pattern, prefix)
+    return names
+
+
+class GameWorldTestCase(TestCase):
+    """Небольшой мир: город с рынком, лес с волком, игрок на поляне."""
+
+    @classmethod
+    def setUpTestData(cls):
+        gold = Currency.objects.create(code='GOLD', name='Золото')
+        cls.city = GlobalLocation.objects.create(
+            name='Город', slug='gorod', is_city=True)
+        cls.forest = GlobalLocation.objects.create(
+            name='Лес', slug='les', distance_to_the_city=3)
+        cls.square = SubLocation.objects.create(
+            name='Городская площадь', slug='gorodskaya-ploshad',
+            global_location=cls.city)
+        cls.market = SubLocation.objects.create(
+            name='Рынок', slug='rynok', global_location=cls.city)
+        cls.glade = SubLocation.objects.create(
+            name='Поляна', slug='polyana', global_location=cls.forest,
+            distance_to_location_start=2)
+        cls.bone = Item.objects.create(
+            name='Кость животного', code='kost', slug='kost', cost=3,
+            item_type='JUNK')
+        cls.scroll = Item.objects.create(
+            name='Свиток телепорта', code='svitok', slug='svitok-teleporta',
+            cost=10, item_type='CONSUMABLE')
+        cls.sword = Item.objects.create(
+            name='Меч новичка', code='mech', slug='mech', cost=50,
+            item_type='WEAPON', slot='MAIN_HAND', is_stacked=False)
+        cls.wolf = Monster.objects.create(name='Волк', slug='volk', stamina=3)
+        cls.glade.monsters.add(cls.wolf)
+        MonsterDrop.objects.create(
+            monster=cls.wolf, item_type='ITEM', item=cls.bone,
+            chance_percent=Decimal('100'), min_amount=1, max_amount=3)
+        MonsterDrop.objects.create(
+            monster=cls.wolf, item_type='ITEM', item=cls.sword,
+            chance_percent=Decimal('100'))
+        shop = Shop.objects.create(name='Походник')
+        ShopItem.objects.create(shop=shop, item=cls.scroll)
+        ShopItem.objects.create(shop=shop, item=cls.sword)
+        ActivityLink.objects.create(
+            sublocation=cls.market,
+            content_type=ContentType.objects.get_for_model(Shop),
+            object_id=shop.pk)
+
+        cls.user = CustomUser.objects.create_user(
+            'player', password='password', nickname='Hero')
+        cls.user.set_location(cls.glade)
+        Wallet.objects.create(user=cls.user, currency=gold, amount=1000)
+        ItemStack.objects.create(owner=cls.user, item=cls.bone, quantity=5)
+
+    def setUp(self):
+        # Версии игрока в кэше переживают откат транзакции теста
+        cache.clear()
+        world.reset_world_version()
+        spawns.reset_pools()
+        # Журнал и отложенное состояние пишутся в транзакции теста
+        # и откатываются с ней
+        self.addCleanup(action_log.flush)
+        self.addCleanup(volatile.flush)
+        self.client.force_login(self.user)
+        # Снимок мира строится один раз на процесс, в бюджет не входит
+        world.get_world()
+
+
+class WorldTests(GameWorldTestCase):
+    """Снимок мира и версия контента."""
+
+    def test_default_cache_is_shared(self):
+        with override_settings(CACHES=project_settings.CACHES):
+            self.assertTrue(is_shared())
+        self.assertFalse(is_shared())
+
+    def test_world_version_shared_between_workers(self):
+        call_command('createcachetable', 'django_cache', verbosity=0)
+        db_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }}
+        with override_settings(CACHES=db_cache):
+            version = world.bump_world_version()
+            # Кэш другого воркера: отдельный экземпляр бэкенда
+            other = DatabaseCache('django_cache', {})
+            self.assertEqual(other.get(world.WORLD_VERSION_KEY), version)
+
+    def test_snapshot_rebuilt_after_version_bump(self):
+        snapshot = world.get_world()
+        with self.assertNumQueries(0):
+            self.assertIs(world.get_world(), snapshot)
+
+        # Сохранение контента повышает версию после коммита (game.signals)
+        with self.captureOnCommitCallbacks(execute=True):
+            clearing = SubLocation.objects.create(
+                name='Опушка', slug='opushka', global_location=self.forest,
+                distance_to_location_start=5)
+        rebuilt = world.get_world()
+        self.assertIsNot(rebuilt, snapshot)
+        self.assertEqual(rebuilt.version, world.get_world_version())
+        self.assertEqual(rebuilt.sublocations_by_slug['opushka'].pk,
+                         clearing.pk)
+        # Старый снимок не меняется
+        self.assertNotIn('opushka', snapshot.sublocations_by_slug)
+
+        version = world.bump_world_version()
+        self.assertEqual(world.get_world().version, version)
+        self.assertIsNot(world.get_world(), rebuilt)
+
+    @override_settings(WORLD_VERSION_TTL=0.05)
+    def test_version_read_from_cache_once_per_ttl(self):
+        world.reset_world_version()
+        version = world.get_world_version()
+        # Версию повысил другой воркер
+        cache.set(world.WORLD_VERSION_KEY, version + 1, timeout=None)
+        self.assertEqual(world.get_world_version(), version)
+        time.sleep(0.05)
+        self.assertEqual(world.get_world_version(), version + 1)
+        # Свой бамп виден сразу
+        version = world.bump_world_version()
+        self.assertEqual(world.get_world_version(), version)
+
+    def test_version_bumped_after_commit(self):
+        version = world.get_world_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.glade.monsters.remove(self.wolf)
+            Monster.objects.create(name='Лис', slug='lis')
+            # До коммита другие воркеры видят прежнюю версию
+            self.assertEqual(world.get_world_version(), version)
+        self.assertEqual(len(callbacks), 2)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(world.get_world_version(), version)
+        self.assertNotIn(self.wolf, world.get_world().sublocation_monsters[
+            self.glade.pk])
+
+    def test_travel_time_matches_orm(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            SubLocation.objects.create(
+                name='Опушка', slug='opushka', global_location=self.forest,
+                distance_to_location_start=5)
+
+        def expected(user, target_global, target):
+            # Прежний расчёт по связанным объектам игрока
+            current_global = user.current_global_location
+            current = user.current_sublocation
+            if current_global is None or current is None:
+                return 0
+            if current_global == target_global:
+                distance = abs(current.distance_to_location_start
+                               - target.distance_to_location_start)
+            else:
+                distance = (current.distance_to_location_start
+                            + abs(current_global.distance_to_the_city
+                                  - target_global.distance_to_the_city)
+                            + target.distance_to_location_start)
+            return distance * SECONDS_PER_UNIT_DISTANCE
+
+        traveller = CustomUser.objects.create_user(
+            'traveller', password='password', nickname='Traveller')
+        targets = SubLocation.objects.select_related('global_location')
+        for start in (None, *targets):
+            if start is not None:
+                traveller.set_location(start)
+            user = CustomUser.objects.get(pk=traveller.pk)
+            for target in targets:
+                with self.subTest(start=start, target=target.slug):
+                    self.assertEqual(
+                        travel.calculate_travel_time(
+                            user, target.global_location, target),
+                        expected(user, target.global_location, target))
+
+
+class QueryBudgetTests(GameWorldTestCase):
+    """Количество запросов на ключевых страницах не растёт незаметно."""
+
+    def assertWithinBudget(self, url_name, url, method='get', data=None):
+        with assert_query_budget(url_name):
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400)
+        return response
+
+    def test_budgets_reference_existing_urls(self):
+        unknown = set(settings.QUERY_BUDGETS) - _url_names()
+        self.assertFalse(unknown, f'Неизвестные имена URL: {unknown}')
+
+    def test_pages(self):
+        pages = [
+            ('index', reverse('index')),
+            ('player_character', reverse('player_character')),
+            ('game:city', reverse('game:city')),
+            ('game:hunting_zones', reverse('game:hunting_zones')),
+            ('game:sublocations_list',
+             reverse('game:sublocations_list', args=['les'])),
+            ('game:sublocation',
+             reverse('game:sublocation', args=['les', 'polyana'])),
+            ('game:travel_status', reverse('game:travel_status')),
+            ('game:trader_test', reverse('game:trader_test')),
+            ('game:leaderboard', reverse('game:leaderboard')),
+        ]
+        for url_name, url in pages:
+            with self.subTest(url_name):
+                self.assertWithinBudget(url_name, url)
+
+    def test_city_sublocation(self):
+        self.user.set_location(self.market)
+        self.assertWithinBudget(
+            'game:city_sublocation',
+            reverse('game:city_sublocation', args=['rynok']))
+
+    def test_attack_monster(self):
+        self.assertWithinBudget(
+            'game:attack_monster',
+            reverse('game:attack_monster', args=['les', 'polyana', 'volk']))
+
+    def test_api_attack_monster(self):
+        self.assertWithinBudget(
+            'game:api_v1:attack_monster',
+            reverse('game:api_v1:attack_monster', args=['volk']), 'post')
+
+    def test_travel(self):
+        self.assertWithinBudget(
+            'game:start_travel',
+            reverse('game:start_travel', args=['gorod', 'rynok']))
+        self.assertWithinBudget(
+            'game:api_v1:start_travel',
+            reverse('game:api_v1:start_travel', args=['les', 'polyana']),
+            'post')
+
+    def test_teleport(self):
+        ItemStack.objects.create(owner=self.user, item=self.scroll,
+                                 quantity=2)
+        self.assertWithinBudget(
+            'game:teleport', reverse('game:teleport', args=['gorod', 'rynok']))
+        self.assertWithinBudget(
+            'game:api_v1:teleport',
+            reverse('game:api_v1:teleport', args=['les', 'polyana']), 'post')
+
+    def test_trade(self):
+        buy = {'source': 'shop', 'item_id': self.scroll.pk, 'quantity': 2}
+        sell = {'source': 'player', 'item_id': self.bone.pk, 'quantity': 2}
+        self.assertWithinBudget('game:trade', reverse('game:trade'),
+                                'post', buy)
+        self.assertWithinBudget('game:api_v1:trade',
+                                reverse('game:api_v1:trade'), 'post', sell)
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'corelight.metrics.InstrumentedCache',
+    'LOCATION': 'django_cache',
+    'OPTIONS': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache'},
+}})
+class DatabaseCacheBudgetTests(QueryBudgetTests):
+    """Те же страницы с общим кэшем в таблице БД.
+
+    Каждое обращение к кэшу здесь — SQL-запрос: они сверяются
+    с CACHE_BUDGETS, остальные запросы — с QUERY_BUDGETS.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('createcachetable', 'django_cache', verbosity=0)
+        super().setUpTestData()
+
+    def test_budgets_reference_existing_urls(self):
+        super().test_budgets_reference_existing_urls()
+        self.assertEqual(set(settings.CACHE_BUDGETS),
+                         set(settings.QUERY_BUDGETS))
+
+
+class QueryRecorderTests(GameWorldTestCase):
+
+    def test_fingerprint_ignores_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s) AND a = 'x'"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s) AND a = 'y'"),
+        )
+
+    def test_duplicates_reported(self):
+        with record_queries() as stats:
+            for item in Item.objects.all():
+                ItemStack.objects.filter(item=item).exists()
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(list(stats.duplicates.values()), [3])
+
+    def test_budget_exceeded(self):
+        with self.assertRaises(AssertionError):
+            with assert_query_budget('index', budget=1):
+                list(Item.objects.all())
+                list(Monster.objects.all())
+
+
+class EquipmentTests(GameWorldTestCase):
+    """Итоговые характеристики меняются вместе с экипировкой."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = CustomUser.objects.get(pk=self.user.pk)
+        self.sword = ItemInstance.objects.create(
+            item=self.sword, owner=self.user, strength_bonus=3)
+        self.other_sword = ItemInstance.objects.create(
+            item=self.sword.item, owner=self.user, luck_bonus=2)
+
+    def test_equip_swap_and_unequip(self):
+        base = self.user.effective_stats
+        self.assertIsNone(equipment.equip(self.user, self.sword.world_id))
+        self.assertEqual(self.user.effective_stats[stat_schema.STRENGTH],
+                         base[stat_schema.STRENGTH] + 3)
+
+        removed = equipment.equip(self.user, self.other_sword.world_id)
+        self.assertEqual(removed, self.sword)
+        stats = CustomUser.objects.get(pk=self.user.pk).effective_stats
+        self.assertEqual(stats[stat_schema.STRENGTH],
+                         base[stat_schema.STRENGTH])
+        self.assertEqual(stats[stat_schema.LUCK], base[stat_schema.LUCK] + 2)
+
+        self.assertEqual(equipment.unequip(self.user, 'MAIN_HAND'),
+                         self.other_sword)
+        self.assertEqual(self.user.effective_stats, base)
+        self.assertEqual(equipment.rebuild_equipment_bonus(self.user), base)
+
+    def test_equipped_item_leaves_inventory(self):
+        equipment.equip(self.user, self.sword.world_id)
+        world_ids = {row.get('world_id')
+                     for row in inventory.get_user_inventory_data(self.user)}
+        self.assertNotIn(self.sword.world_id, world_ids)
+        self.assertIn(self.other_sword.world_id, world_ids)
+
+    def test_unknown_item(self):
+        with self.assertRaises(EquipError):
+            equipment.equip(self.user, 'not-a-uuid')
+
+    def test_equipped_item_keeps_owner(self):
+        equipment.equip(self.user, self.sword.world_id)
+        other = CustomUser.objects.create_user(
+            'thief', password='password', nickname='Thief')
+        item = self.sword.item
+        with self.assertRaises(GameError):
+            inventory.add_or_remove_unique_item(
+                other, item, 1, self.sword.world_id)
+        with self.assertRaises(GameError):
+            inventory.add_or_remove_unique_item(
+                self.user, item, -1, self.sword.world_id)
+        equip = Equipment.objects.select_related('instance').get(
+            instance=self.sword)
+        self.assertEqual(equip.owner_id, equip.instance.owner_id)
+        equip.clean()
+        equip.owner = other
+        with self.assertRaises(ValidationError):
+            equip.clean()
+
+    def test_api_equip(self):
+        response = self.client.post(
+            reverse('game:api_v1:equip', args=[self.sword.world_id]))
+        delta = response.json()['delta']
+        self.assertEqual(delta['equipped'], str(self.sword.world_id))
+        self.assertEqual(delta['stats']['strength'],
+                         self.user.strength + 3)
+
+
+class StatSchemaTests(GameWorldTestCase):
+    """Векторы характеристик читаются и пишутся в колонки моделей."""
+
+    def test_item_vector_and_queryset(self):
+        instance = ItemInstance.objects.create(
+            item=self.sword, owner=self.user, defense_bonus=2)
+        self.assertEqual(stat_schema.item_vector(instance)[stat_schema.DEFENSE],
+                         2)
+        vectors = stat_schema.from_queryset(
+            ItemInstance.objects.all(), '_bonus')
+        self.assertEqual(vectors[instance.pk],
+                         stat_schema.item_vector(instance))
+        # У монстра нет колонки удачи: в векторе на её месте 0
+        monster = stat_schema.from_queryset(Monster.objects.all())
+        self.assertEqual(monster[self.wolf.pk][stat_schema.STAMINA], 3)
+        self.assertEqual(monster[self.wolf.pk][stat_schema.LUCK], 0)
+
+    def test_compare_and_covers(self):
+        a = stat_schema.from_dict({'strength': 3, 'luck': 1})
+        b = stat_schema.from_dict({'strength': 1, 'luck': 2})
+        self.assertEqual(stat_schema.compare(a, b)[stat_schema.STRENGTH], 1)
+        self.assertEqual(stat_schema.compare(a, b)[stat_schema.LUCK], -1)
+        self.assertFalse(stat_schema.covers(a, b))
+        self.assertTrue(stat_schema.covers(stat_schema.add(a, b), b))
+
+    def test_level_up_adds_stats_per_level(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        before = user.effective_stats
+        user.add_experience(user.xp_required_for_level(3))
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual(user.level, 3)
+        self.assertEqual(
+            user.effective_stats,
+            stat_schema.add(before,
+                            stat_schema.scale(stat_schema.PER_LEVEL_VECTOR, 2)))
+
+
+class LeaderboardTests(GameWorldTestCase):
+    """Топ в кэше обновляется событиями и совпадает с запросом к БД."""
+
+    def setUp(self):
+        super().setUp()
+        self.rival = CustomUser.objects.create_user(
+            'rival', password='password', nickname='Rival')
+        self.rival.add_experience(500)
+        self.board = leaderboards.xp_board()
+
+    def test_merge(self):
+        entries = [(30, 1, 'a'), (20, 2, 'b'), (10, 3, 'c')]
+        self.assertEqual(leaderboards._merge(entries, (25, 3, 'c'), 3),
+                         [(30, 1, 'a'), (25, 3, 'c'), (20, 2, 'b')])
+        # Не попал в полный топ — список тот же
+        self.assertIs(leaderboards._merge(entries, (5, 4, 'd'), 3), entries)
+        # Выбыл из полного топа — нужен запрос к БД
+        self.assertIsNone(leaderboards._merge(entries, (1, 1, 'a'), 3))
+        self.assertEqual(leaderboards._merge(entries, (0, 2, 'b'), 4),
+                         [(30, 1, 'a'), (10, 3, 'c')])
+
+    def test_fight_updates_cached_top(self):
+        self.assertEqual([row['nickname'] for row in self.board.top()],
+                         ['Rival'])
+        monster_board = leaderboards.monster_board(self.wolf)
+        kills_board = leaderboards.kills_board()
+        self.assertEqual(monster_board.top(), [])
+        self.assertEqual(kills_board.top(), [])
+
+        self.client.get(
+            reverse('game:attack_monster', args=['les', 'polyana', 'volk']))
+        volatile.flush()
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual(user.kills, 1)
+        self.assertEqual(
+            [(row['nickname'], row['score']) for row in monster_board.top()],
+            [('Hero', 1)])
+        # Кэш обновлён событием и совпадает с полной перестройкой
+        for board in (self.board, kills_board, monster_board):
+            self.assertEqual(cache.get(board.cache_key), board.query_top(100))
+
+    def test_rank_outside_top(self):
+        self.user.add_experience(100)
+        with self.settings(LEADERBOARD_SIZE=1):
+            self.board.rebuild()
+            self.assertEqual(self.board.rank(self.user)['rank'], 2)
+        self.assertEqual(self.board.rank(self.rival)['rank'], 1)
+
+    def test_balance(self):
+        board = leaderboards.get_board('currency-gold')
+        self.assertEqual(board.top()[0]['score'], 1000)
+        Wallet.objects.filter(user=self.user).update(amount=10)
+        leaderboards.record_balance(self.user, 'GOLD')
+        self.assertEqual(board.top()[0]['score'], 10)
+        self.assertIsNone(leaderboards.get_board('currency-nope'))
+
+
+    def test_kill_counter_conflict_keeps_transaction(self):
+        leaderboards.count_kill(self.user, self.wolf)
+        kills = MonsterKill.objects.filter(player=self.user, monster=self.wolf)
+        # Параллельный запрос уже создал строку: INSERT падает
+        # в точке сохранения, транзакция теста продолжает работать
+        leaderboards._create_kill(self.user, self.wolf, kills)
+        self.assertEqual(kills.get().count, 2)
+
+
+class TeleportTests(GameWorldTestCase):
+    """Свиток телепорта тратится ровно один раз."""
+
+    def test_last_scroll_used_once(self):
+        stack = ItemStack.objects.create(owner=self.user, item=self.scroll,
+                                         quantity=2)
+        self.assertTrue(actions._use_scroll(stack.pk))
+        self.assertTrue(actions._use_scroll(stack.pk))
+        # Второй запрос прочитал стак раньше, но свитка уже нет
+        self.assertFalse(actions._use_scroll(stack.pk))
+        self.assertFalse(ItemStack.objects.filter(pk=stack.pk).exists())
+
+    def test_teleport_without_scroll_walks(self):
+        ItemStack.objects.create(owner=self.user, item=self.scroll,
+                                 quantity=1)
+        delta = actions.teleport(self.user, self.city, self.market)
+        self.assertEqual(delta['inventory'][0]['quantity'], -1)
+        delta = actions.teleport(self.user, self.city, self.market)
+        self.assertEqual(delta['inventory'], [])
+        self.assertGreater(self.user.travel_time, 0)
+
+
+class SpawnTests(GameWorldTestCase):
+    """Особи монстров заканчиваются, возрождаются и переживают потерю кэша."""
+
+    def setUp(self):
+        super().setUp()
+        self.wolf = world.get_world().monsters_by_slug['volk']
+        self.url = reverse('game:api_v1:attack_monster', args=['volk'])
+
+    def test_claim_until_pool_is_empty(self):
+        for _ in range(self.wolf.spawn_count):
+            self.assertEqual(self.client.post(self.url).status_code, 200)
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['error'], 'not_spawned')
+        self.assertEqual(
+            spawns.alive_counts(self.glade.pk, [self.wolf]), {self.wolf.pk: 0})
+
+    def test_respawn_when_key_expires(self):
+        for _ in range(self.wolf.spawn_count):
+            self.assertTrue(spawns.claim(self.glade.pk, self.wolf))
+        self.assertFalse(spawns.claim(self.glade.pk, self.wolf))
+        # Истечение ключа — то же, что его удаление
+        cache.delete(spawns._slot_key(self.glade.pk, self.wolf.pk, 1))
+        with self.settings(SPAWN_POOL_TTL=0):
+            self.assertTrue(spawns.claim(self.glade.pk, self.wolf))
+
+    def test_respawn_after_respawn_seconds(self):
+        wolf = Monster.objects.get(pk=self.wolf.pk)
+        # Доли секунды, чтобы тест не ждал настоящий таймер
+        wolf.respawn_seconds = 0.05
+        for _ in range(wolf.spawn_count):
+            self.assertTrue(spawns.claim(self.glade.pk, wolf))
+        self.assertEqual(spawns.alive_counts(self.glade.pk, [wolf]),
+                         {wolf.pk: 0})
+        time.sleep(0.06)
+        with self.settings(SPAWN_POOL_TTL=0):
+            self.assertEqual(spawns.alive_counts(self.glade.pk, [wolf]),
+                             {wolf.pk: wolf.spawn_count})
+        self.assertTrue(spawns.claim(self.glade.pk, wolf))
+
+    def test_monster_from_other_sublocation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Monster.objects.create(name='Медведь', slug='medved')
+        response = self.client.post(
+            reverse('game:api_v1:attack_monster', args=['medved']))
+        self.assertEqual(response.status_code, 409)
+
+    def test_snapshot_restores_dead_after_cache_loss(self):
+        spawns.claim(self.glade.pk, self.wolf)
+        spawns.claim(self.glade.pk, self.wolf)
+        self.assertEqual(spawns.save_snapshots(), 2)
+        self.assertEqual(
+            len(SpawnSnapshot.objects.get(sublocation=self.glade)
+                .state[str(self.wolf.pk)]), 2)
+
+        cache.clear()
+        spawns.reset_pools()
+        self.assertEqual(spawns.restore_snapshots(), 2)
+        self.assertIsNone(spawns.restore_snapshots())
+        self.assertEqual(spawns.alive_counts(self.glade.pk, [self.wolf]),
+                         {self.wolf.pk: self.wolf.spawn_count - 2})
+
+
+    def test_shared_cache_required(self):
+        with self.settings(DEBUG=False):
+            self.assertEqual([e.id for e in checks.check_shared_cache(None)],
+                             ['game.E001'])
+        with self.assertRaises(CommandError):
+            call_command('run_spawner', '--once')
+        with override_settings(CACHES=project_settings.CACHES):
+            self.assertEqual(checks.check_shared_cache(None), [])
+        db_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }}
+        with override_settings(CACHES=db_cache):
+            with self.settings(DEBUG=False):
+                self.assertEqual(
+                    [e.id for e in checks.check_shared_cache(None)],
+                    ['game.E001'])
+            with self.settings(DEBUG=True):
+                self.assertEqual(
+                    [e.id for e in checks.check_shared_cache(None)],
+                    ['game.W001'])
+
+
+class ActionLogTests(GameWorldTestCase):
+    """Действия копятся в буфере и пишутся в журнал пачкой."""
+
+    def test_fight_is_logged_on_flush(self):
+        self.client.post(
+            reverse('game:api_v1:attack_monster', args=['volk']))
+        self.assertFalse(ActionLog.objects.exists())
+        self.assertEqual(action_log.flush(), 2)
+
+        history = action_log.player_history(self.user.pk)
+        self.assertEqual({row.action for row in history}, {'fight', 'loot'})
+        fight = action_log.player_history(self.user.pk, actions=['fight'])[0]
+        self.assertEqual(fight.payload['monster'], self.wolf.pk)
+        self.assertEqual(
+            action_log.action_counts(fight.created_at), {'fight': 1, 'loot': 1})
+
+    def test_full_buffer_is_flushed_by_request(self):
+        with self.settings(ACTION_LOG_MAX_BUFFER=2):
+            action_log.record(self.user.pk, 'arrive', sublocation=1)
+            self.assertFalse(ActionLog.objects.exists())
+            action_log.record(self.user.pk, 'arrive', sublocation=2)
+            self.assertEqual(ActionLog.objects.count(), 2)
+        self.assertEqual(action_log.flush(), 0)
+
+
+class IdempotencyTests(GameWorldTestCase):
+    """Повтор действия с тем же ключом отдаёт первый ответ."""
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('game:api_v1:trade')
+        self.buy = {'source': 'shop', 'item_id': self.scroll.pk,
+                    'quantity': 1}
+
+    def _scrolls(self):
+        return ItemStack.objects.filter(
+            owner=self.user, item=self.scroll).values_list(
+                'quantity', flat=True).first()
+
+    def test_repeat_returns_stored_response(self):
+        first = self.client.post(self.url, self.buy,
+                                 headers={'Idempotency-Key': 'buy-1'})
+        with self.assertNumQueries(1):
+            # Остаётся только чтение сессии
+            repeat = self.client.post(self.url, self.buy,
+                                      headers={'Idempotency-Key': 'buy-1'})
+        self.assertEqual(repeat.content, first.content)
+        self.assertEqual(repeat[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(self._scrolls(), 1)
+
+        self.client.post(self.url, self.buy,
+                         headers={'Idempotency-Key': 'buy-2'})
+        self.assertEqual(self._scrolls(), 2)
+
+    def test_form_field_and_redirect(self):
+        data = {**self.buy, 'idempotency_key': 'form-1'}
+        first = self.client.post(reverse('game:trade'), data)
+        repeat = self.client.post(reverse('game:trade'), data)
+        self.assertEqual(repeat.status_code, 302)
+        self.assertEqual(repeat['Location'], first['Location'])
+        self.assertEqual(self._scrolls(), 1)
+
+    def test_key_reused_for_other_request(self):
+        self.client.post(self.url, self.buy,
+                         headers={'Idempotency-Key': 'buy-1'})
+        response = self.client.post(self.url, {**self.buy, 'quantity': 2},
+                                    headers={'Idempotency-Key': 'buy-1'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self._scrolls(), 1)
+
+    def test_request_in_progress(self):
+        cache.set(idempotency._cache_key(self.user.pk, 'buy-1'),
+                  idempotency.PENDING)
+        with self.settings(IDEMPOTENCY_WAIT_SECONDS=0):
+            response = self.client.post(
+                self.url, self.buy, headers={'Idempotency-Key': 'buy-1'})
+        self.assertEqual(response.json()['error'], 'in_progress')
+        self.assertIsNone(self._scrolls())
+
+
+class ActivityAdminTests(GameWorldTestCase):
+    """Выбор активности в админке саблокации."""
+
+    def setUp(self):
+        super().setUp()
+        Shop.objects.bulk_create(
+            [Shop(name=f'Лавка {n:02}') for n in range(25)])
+        admin_user = CustomUser.objects.create_superuser(
+            'admin', password='password', nickname='Admin')
+        self.client.force_login(admin_user)
+
+    def test_autocomplete_pages(self):
+        url = reverse('admin:game_sublocation_activity_autocomplete')
+        first = self.client.get(url, {'term': 'лавка'}).json()
+        self.assertEqual(len(first['results']), 20)
+        self.assertTrue(first['pagination']['more'])
+        second = self.client.get(url, {'term': 'лавка', 'page': 2}).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertFalse(second['pagination']['more'])
+        self.assertEqual(first['results'][0]['text'], 'Магазин: Лавка 00')
+
+    def test_change_page_renders_only_selected_activity(self):
+        url = reverse('admin:game_sublocation_change', args=[self.market.pk])
+        response = self.client.get(url)
+        self.assertContains(response, 'Магазин: Походник')
+        self.assertNotContains(response, 'Лавка')
+
+    def test_unknown_activity_rejected(self):
+        form = ActivityLinkForm(data={'activity_obj': '999:1'})
+        self.assertIn('activity_obj', form.errors)
+
+
+class AdminChangelistTests(GameWorldTestCase):
+    """Списки админки: число запросов не зависит от числа строк."""
+
+    URLS = ('admin:game_itemstack_changelist',
+            'admin:game_iteminstance_changelist',
+            'admin:game_wallet_changelist',
+            'admin:game_monsterdrop_changelist')
+
+    def setUp(self):
+        super().setUp()
+        admin_user = CustomUser.objects.create_superuser(
+            'admin', password='password', nickname='Admin')
+        self.client.force_login(admin_user)
+        # Первый запрос загружает администратора в кэш игроков
+        self.client.get(reverse('admin:index'))
+
+    def _query_counts(self):
+        counts = {}
+        for url_name in self.URLS:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(url_name), {'q': 'e'})
+            self.assertEqual(response.status_code, 200)
+            counts[url_name] = len(queries)
+        return counts
+
+    def test_queries_do_not_grow_with_rows(self):
+        before = self._query_counts()
+        for n in range(5):
+            player = CustomUser.objects.create_user(
+                f'player{n}', password='password', nickname=f'Hero{n}')
+            ItemStack.objects.create(owner=player, item=self.bone,
+                                     quantity=1)
+            ItemInstance.objects.create(owner=player, item=self.sword)
+            Wallet.objects.create(user=player, currency=Currency.objects
+                                  .get(code='GOLD'), amount=n)
+        self.assertEqual(self._query_counts(), before)
+
+    def test_paginator_counts_exactly_below_threshold(self):
+        paginator = EstimatedCountPaginator(
+            ItemStack.objects.order_by('pk'), 10)
+        self.assertEqual(paginator.count, ItemStack.objects.count())
+
+
+class TradeValidationTests(GameWorldTestCase):
+    """Цену и знак количества определяет сервер, а не запрос."""
+
+    def _gold(self, user=None):
+        return Wallet.objects.get(user=user or self.user,
+                                  currency__code='GOLD').amount
+
+    def test_quantity_must_be_positive(self):
+        for quantity in (0, -5):
+            for source in ('shop', 'player'):
+                with self.assertRaises(TradeError):
+                    actions.trade_item(self.user, source, self.bone.pk,
+                                       quantity)
+        self.assertEqual(self._gold(), 1000)
+        self.assertEqual(ItemStack.objects.get(
+            owner=self.user, item=self.bone).quantity, 5)
+
+    def test_purchase_priced_by_shop(self):
+        ShopItem.objects.filter(item=self.scroll).update(price_coef=3)
+        response = self.client.post(reverse('game:api_v1:trade'), {
+            'source': 'shop', 'item_id': self.scroll.pk, 'quantity': 2,
+            'price_per_unit': 0})
+        self.assertEqual(response.json()['delta']['gold'], 1000 - 60)
+
+    def test_item_not_in_shop(self):
+        with self.assertRaisesMessage(TradeError, 'не продаётся'):
+            actions.trade_item(self.user, 'shop', self.bone.pk, 1)
+
+    def test_purchase_from_trader_shop_only(self):
+        # В другом магазине свиток дешевле, но игрок торгует не с ним
+        ShopItem.objects.filter(item=self.scroll).update(price_coef=3)
+        other = Shop.objects.create(name='Лавка')
+        ShopItem.objects.create(shop=other, item=self.scroll)
+        ShopItem.objects.create(shop=other, item=self.bone)
+        actions.trade_item(self.user, 'shop', self.scroll.pk, 1)
+        self.assertEqual(self._gold(), 1000 - 30)
+        with self.assertRaisesMessage(TradeError, 'не продаётся'):
+            actions.trade_item(self.user, 'shop', self.bone.pk, 1)
+
+    def test_sale_without_currency_keeps_item(self):
+        Currency.objects.filter(code='GOLD').delete()
+        self.assertEqual(trade.sell_item(self.user, self.bone.pk, 2),
+                         (False, trade.CURRENCY_ERROR))
+        self.assertEqual(ItemStack.objects.get(
+            owner=self.user, item=self.bone).quantity, 5)
+
+    def test_foreign_instance_cannot_be_taken(self):
+        victim = CustomUser.objects.create_user(
+            'victim', password='password', nickname='Victim')
+        sword = ItemInstance.objects.create(item=self.sword, owner=victim)
+        for source, quantity in (('player', -1), ('shop', 1)):
+            with self.assertRaises(TradeError):
+                actions.trade_item(self.user, source, self.sword.pk,
+                                   quantity, str(sword.world_id))
+        sword.refresh_from_db()
+        self.assertEqual(sword.owner, victim)
+        self.assertEqual(self._gold(), 1000)
+
+    async def test_async_trade_validated(self):
+        victim = await CustomUser.objects.acreate_user(
+            'victim', password='password', nickname='Victim')
+        sword = await ItemInstance.objects.acreate(item=self.sword,
+                                                   owner=victim)
+        self.assertEqual(
+            await trade.asell_item(self.user, self.bone.pk, -5),
+            (False, trade.QUANTITY_ERROR))
+        success, _ = await trade.abuy_item(self.user, self.sword.pk, 1,
+                                           str(sword.world_id))
+        self.assertFalse(success)
+        self.assertEqual(await trade.abuy_item(self.user, self.scroll.pk, 2),
+                         (True, None))
+        await sword.arefresh_from_db()
+        self.assertEqual(sword.owner_id, victim.pk)
+        self.assertEqual(await Wallet.objects.filter(
+            user=self.user).values_list('amount', flat=True).aget(), 980)
+
+    def test_malformed_item_id(self):
+        data = {'source': 'shop', 'item_id': 'abc', 'quantity': 1}
+        response = self.client.post(reverse('game:api_v1:trade'), data)
+        self.assertEqual(response.status_code, 400)
+        for url_name in ('game:trade', 'game:async_trade'):
+            response = self.client.post(reverse(url_name), data)
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(self._gold(), 1000)
+
+
+class AsyncViewTests(GameWorldTestCase):
+    """Асинхронные представления меняют состояние так же, как синхронные."""
+
+    def _player(self):
+        volatile.flush()
+        action_log.flush()
+        return CustomUser.objects.select_related(
+            'player_state', 'player_travel').get(pk=self.user.pk)
+
+    def _assert_fought(self, response):
+        self.assertRedirects(
+            response, reverse('game:sublocation', args=['les', 'polyana']),
+            fetch_redirect_response=False)
+        player = self._player()
+        self.assertEqual((player.experience, player.kills),
+                         (self.wolf.xp_reward, 1))
+        self.assertIsNotNone(player.last_fight_at)
+        self.assertEqual(spawns.alive_counts(self.glade.pk, [self.wolf]),
+                         {self.wolf.pk: self.wolf.spawn_count - 1})
+        self.assertEqual(ItemInstance.objects.filter(
+            owner=self.user, item=self.sword).count(), 1)
+        self.assertIn(ItemStack.objects.get(
+            owner=self.user, item=self.bone).quantity, (6, 7, 8))
+        self.assertEqual(ActionLog.objects.filter(
+            user_id=self.user.pk, action='fight').count(), 1)
+
+    def _start_travel(self):
+        PlayerTravel.objects.filter(user=self.user).update(
+            travel_destination=self.market, travel_time=1,
+            travel_started_at=timezone.now() - timedelta(seconds=5))
+        bump_user_version(self.user.pk)
+
+    def _assert_arrived(self, response):
+        self.assertRedirects(
+            response, reverse('game:sublocation', args=['gorod', 'rynok']),
+            fetch_redirect_response=False)
+        travel = self._player().player_travel
+        self.assertEqual(
+            (travel.current_sublocation_id, travel.current_global_location_id,
+             travel.travel_destination_id, travel.travel_started_at),
+            (self.market.pk, self.city.pk, None, None))
+        self.assertEqual(ActionLog.objects.filter(
+            user_id=self.user.pk, action='arrive').count(), 1)
+
+    def _assert_traded(self, responses, trader_url_name):
+        for response in responses:
+            self.assertRedirects(response, reverse(trader_url_name),
+                                 fetch_redirect_response=False)
+        # Куплено 2 свитка по 10, продано 2 кости по 3
+        self.assertEqual(Wallet.objects.get(user=self.user).amount, 986)
+        self.assertEqual(ItemStack.objects.get(
+            owner=self.user, item=self.scroll).quantity, 2)
+        self.assertEqual(ItemStack.objects.get(
+            owner=self.user, item=self.bone).quantity, 3)
+
+    def _trade_requests(self, url_name):
+        url = reverse(url_name)
+        return [(url, {'source': 'shop', 'item_id': self.scroll.pk,
+                       'quantity': 2}),
+                (url, {'source': 'player', 'item_id': self.bone.pk,
+                       'quantity': 2})]
+
+    def test_attack_monster(self):
+        self._assert_fought(self.client.get(
+            reverse('game:attack_monster', args=['les', 'polyana', 'volk'])))
+
+    async def test_async_attack_monster(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse(
+            'game:async_attack_monster', args=['les', 'polyana', 'volk']))
+        await sync_to_async(self._assert_fought)(response)
+
+    def test_travel_status(self):
+        self._start_travel()
+        self._assert_arrived(self.client.get(reverse('game:travel_status')))
+
+    async def test_async_travel_status(self):
+        await sync_to_async(self._start_travel)()
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse('game:async_travel_status'))
+        await sync_to_async(self._assert_arrived)(response)
+
+    def test_trade(self):
+        responses = [self.client.post(url, data)
+                     for url, data in self._trade_requests('game:trade')]
+        self._assert_traded(responses, 'game:trader_test')
+
+    async def test_async_trade(self):
+        await self.async_client.aforce_login(self.user)
+        responses = [await self.async_client.post(url, data)
+                     for url, data in self._trade_requests('game:async_trade')]
+        await sync_to_async(self._assert_traded)(
+            responses, 'game:async_trader_test')
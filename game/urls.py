@@ -1,25 +1,49 @@
-from django.urls import path
+from django.urls import include, path
 
-from . import views
+from . import async_views, views
 
 app_name = 'game'
 urlpatterns = [
-    path('travel/start/<slug:global_location_slug>/<slug:sublocation_slug>/', views.start_travel, name='start_travel'),
+    path('travel/start/<slug:global_location_slug>/<slug:sublocation_slug>/',
+         views.start_travel, name='start_travel'),
 
     path('travel_status/', views.travel_status, name='travel_status'),
 
 
-    path('teleport/<slug:global_location_slug>/<slug:sublocation_slug>/', views.teleport, name='teleport'),
+    path('teleport/<slug:global_location_slug>/<slug:sublocation_slug>/',
+         views.teleport, name='teleport'),
 
-    path('hunting-zones/<slug:global_location_slug>/<slug:sublocation_slug>', views.sublocation, name='sublocation'),
-    
+    path('hunting-zones/<slug:global_location_slug>/<slug:sublocation_slug>',
+         views.sublocation, name='sublocation'),
 
-    path('hunting-zones/<slug:global_location_slug>/<slug:sublocation_slug>/<slug:monster_slug>/', views.attack_monster, name='attack_monster'),
+    path('hunting-zones/<slug:global_location_slug>/<slug:sublocation_slug>/'
+         '<slug:monster_slug>/',
+         views.attack_monster, name='attack_monster'),
 
-    path('hunting-zones/<slug:global_location_slug>/', views.sublocations_list, name='sublocations_list'),
+    path('hunting-zones/<slug:global_location_slug>/',
+         views.sublocations_list, name='sublocations_list'),
     path('hunting-zones/', views.hunting_zones, name='hunting_zones'),
     path('city/', views.city, name='city'),
-    path('city/<slug:sublocation_slug>/', views.city_sublocation, name='city_sublocation'),
-    path('trader/test/', views.trader_test, name='trader_test'), # Тестовая страница торговца
+    path('city/<slug:sublocation_slug>/', views.city_sublocation,
+         name='city_sublocation'),
+    # Тестовая страница торговца
+    path('trader/test/', views.trader_test, name='trader_test'),
     path('trade/', views.trade_view, name='trade'),
-]
\ No newline at end of file
+    path('leaderboards/', views.leaderboard, name='leaderboard'),
+    path('leaderboards/<slug:board>/', views.leaderboard, name='leaderboard'),
+
+    # ---- JSON API игровых действий ----
+    path('api/v1/', include('game.api.v1')),
+
+    # ---- Асинхронные версии для ASGI ----
+    path('async/hunting-zones/<slug:global_location_slug>/'
+         '<slug:sublocation_slug>/<slug:monster_slug>/',
+         async_views.attack_monster, name='async_attack_monster'),
+    path('async/travel_status/', async_views.travel_status,
+         name='async_travel_status'),
+    path('async/trader/test/', async_views.trader_test,
+         name='async_trader_test'),
+    path('async/trade/', async_views.trade_view, name='async_trade'),
+    path('async/player/', async_views.player_character,
+         name='async_player_character'),
+]
@@ -1,5 +1,6 @@
 # Старый файл с вспомогательными функциями.
 # Неиспользуемые функции отмечены префиксом old_
+import logging
 from decimal import Decimal
 from random import randint
 from typing import cast
@@ -7,8 +8,8 @@ from typing import cast
 from game.models.shops import ShopItem
 from users.models import CustomUser
 
-from . import exceptions
-from .constants import BASE_STATS, SECONDS_PER_UNIT_DISTANCE
+from . import exceptions, stat_schema
+from .constants import SECONDS_PER_UNIT_DISTANCE
 from .models import (
     Currency,
     GlobalLocation,
@@ -21,6 +22,8 @@ from .models import (
     Wallet,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def old_change_item_quantity(user: CustomUser, item: Item, delta: int, world_id: str | None = None) -> bool:
     """Функция для изменения кол-ва предметов в инвентаре"""    
@@ -82,7 +85,7 @@ def old_change_multiple_items_quantity(user: CustomUser, item_list: list) -> boo
     return True
 
 
-def calculate_travel_time(user: CustomUser, target_global_location: GlobalLocation, target_sublocation: SubLocation) -> int:
+def old_calculate_travel_time(user: CustomUser, target_global_location: GlobalLocation, target_sublocation: SubLocation) -> int:
     if user.current_global_location == target_global_location:
         travel_time = abs(user.current_sublocation.distance_to_location_start - target_sublocation.distance_to_location_start)
     else:
@@ -91,23 +94,26 @@ def calculate_travel_time(user: CustomUser, target_global_location: GlobalLocati
 
 def perform_attack(user: CustomUser, monster:Monster) -> bool:
         # ---- Пока так для теста ----
-        print(f'{user.nickname} напал на {monster}')
+        # Исход боя от характеристик не зависит; когда появится расчёт
+        # урона, он возьмёт user.effective_stats (с экипировкой)
+        logger.debug('%s напал на %s', user.nickname, monster)
         winner = user
         if winner == user:
-            print(f'В бою победил {winner}')
+            logger.debug('В бою победил %s', winner)
         return True
 
 def get_item_stats_fot_tooltip(instance: ItemInstance | Item | ShopItem):
     """Готовит словарь со статами предмета для отображения в тултипе"""
-    stats = {}
-    for stat_name, value in BASE_STATS.items():
-        stats[stat_name] = {
-            'base': getattr(instance.item, stat_name, 0),
-            'bonus': getattr(instance, f'{stat_name}_bonus', 0)
-        }
-    return stats
-
-def sell_item(user: CustomUser, item_id: int, delta: int, price_per_unit: int, world_id: str | None = None):
+    item = getattr(instance, 'item', instance)
+    base = stat_schema.from_instance(item)
+    bonus = stat_schema.from_instance(instance, '_bonus')
+    return {
+        stat_name: {'base': base[index], 'bonus': bonus[index]}
+        for index, stat_name in enumerate(stat_schema.STAT_NAMES)
+        if base[index] or bonus[index]
+    }
+
+def old_sell_item(user: CustomUser, item_id: int, delta: int, price_per_unit: int, world_id: str | None = None):
     delta = delta * -1
     try:
         item = Item.objects.get(id=item_id)
@@ -139,7 +145,7 @@ def sell_item(user: CustomUser, item_id: int, delta: int, price_per_unit: int, w
     wallet.save(update_fields=['amount',])
     return True, None
 
-def buy_item(user: CustomUser, item_id: int, delta: int, price_per_unit: int, world_id: str | None = None):
+def old_buy_item(user: CustomUser, item_id: int, delta: int, price_per_unit: int, world_id: str | None = None):
     try:
         item = Item.objects.get(id=item_id)
     except Item.DoesNotExist:
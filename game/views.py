@@ -1,48 +1,96 @@
+import logging
 from typing import cast
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db.models import Sum
-from django.shortcuts import get_object_or_404, redirect, render
+from django.http import Http404
+from django.shortcuts import redirect, render
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 
+from game.exceptions import FightCooldown, GameError, MonsterNotSpawned
+from game.idempotency import idempotent
+from game.metrics import TRAVEL_COMPLETED
 from game.models import (
     ActivityLink,
-    GlobalLocation,
     Item,
     ItemInstance,
-    ItemStack,
-    Monster,
     Shop,
     ShopItem,
-    SubLocation,
 )
-from game.services import inventory, monsters
+from game.services import (
+    action_log,
+    actions,
+    activities,
+    inventory,
+    leaderboards,
+    spawns,
+    trade,
+    world,
+)
 from users.models import CustomUser
 
-from . import utils
-from .constants import FIGHT_COOLDOWN_SECONDS
+logger = logging.getLogger(__name__)
+
+# Подписи сообщений для сделок: источник -> (успех, ошибка)
+TRADE_LABELS = {
+    'shop': ('Куплено', 'Ошибка покупки'),
+    'player': ('Продано', 'Ошибка продажи'),
+}
+
+
+def _or_404(obj):
+    """Возвращает объект из снимка мира или 404, если его нет"""
+    if obj is None:
+        raise Http404('Объект не найден')
+    return obj
+
+
+def _redirect_to_current_sublocation(user: CustomUser):
+    """Редирект на страницу текущей саблокации игрока"""
+    snapshot = world.get_world()
+    sublocation = snapshot.sublocations[user.current_sublocation_id]
+    return redirect(
+        'game:sublocation',
+        global_location_slug=sublocation.global_location.slug,
+        sublocation_slug=sublocation.slug
+    )
 
 
 @login_required
 def hunting_zones(request):
     """Список глобальных локаций"""
-    global_locations = GlobalLocation.objects.all().order_by('min_level')
+    global_locations = world.get_world().global_locations_by_level
     context = {
         'global_locations': global_locations,
     }
     return render(request, 'game/hunting_zones.html', context)
 
 
+@login_required
+def leaderboard(request, board='xp'):
+    """Рейтинг игроков: топ из кэша и место текущего игрока"""
+    leaderboard = _or_404(leaderboards.get_board(board))
+    user = cast(CustomUser, request.user)
+    top = leaderboard.top()
+    context = {
+        'leaderboard': leaderboard,
+        'rows': top,
+        'my_rank': leaderboard.rank(user, top),
+        'monsters': world.get_world().monsters_by_slug.values(),
+    }
+    return render(request, 'game/leaderboard.html', context)
+
+
 @login_required
 def city(request, global_location_slug='gorod'):
     """Обзор городских локаций"""
-    global_location = get_object_or_404(
-        GlobalLocation,
-        slug=global_location_slug
-    )
-    sublocation_list = SubLocation.objects.filter(global_location=global_location).order_by('name')
+    snapshot = world.get_world()
+    global_location = _or_404(
+        snapshot.get_global_location(global_location_slug))
+    sublocation_list = snapshot.sublocations_by_global_location[
+        global_location.pk]
     context = {
         'global_location': global_location,
         'sublocations': sublocation_list
@@ -54,23 +102,17 @@ def city(request, global_location_slug='gorod'):
 def city_sublocation(request, sublocation_slug):
     user = cast(CustomUser, request.user)
 
-    sublocation = get_object_or_404(
-        SubLocation,
-        slug=sublocation_slug
-    )
+    snapshot = world.get_world()
+    sublocation = _or_404(snapshot.get_sublocation(sublocation_slug))
 
     global_location = sublocation.global_location
-    # ---- Запрашиваем ссылки на активности и получаем их список ----
-    activity_links = sublocation.activity_links.all()
-    activities = [link.activity for link in activity_links if link.activity]
-    # ---------------------------------------------------------------
-    if user.current_sublocation != sublocation:
+    if user.current_sublocation_id != sublocation.pk:
         return redirect('game:travel_status')
 
     context = {
         'global_location': global_location,
         'sublocation': sublocation,
-        'activities': activities,
+        'activities': activities.get_sublocation_activities(sublocation.pk),
     }
     return render(request, 'game/city_sublocation.html', context)
 
@@ -78,11 +120,10 @@ def city_sublocation(request, sublocation_slug):
 @login_required
 def sublocations_list(request, global_location_slug):
     """Список саблокаций"""
-    global_location = get_object_or_404(
-        GlobalLocation,
-        slug=global_location_slug
-    )
-    sublocation_list = SubLocation.objects.filter(global_location=global_location).order_by('min_level')
+    snapshot = world.get_world()
+    global_location = _or_404(
+        snapshot.get_global_location(global_location_slug))
+    sublocation_list = snapshot.sublocations_by_min_level[global_location.pk]
     context = {
         'global_location': global_location,
         'sublocations': sublocation_list
@@ -94,24 +135,23 @@ def sublocations_list(request, global_location_slug):
 def sublocation(request, global_location_slug, sublocation_slug):
     """Страница локации"""
     user = cast(CustomUser, request.user)
-    global_location = get_object_or_404(
-        GlobalLocation,
-        slug=global_location_slug
-    )
-    sublocation = get_object_or_404(
-        SubLocation,
-        slug=sublocation_slug,
-        global_location=global_location
-    )
-    monsters = sublocation.monsters.all()
-
-    if user.current_sublocation != sublocation:
+    snapshot = world.get_world()
+    global_location = _or_404(
+        snapshot.get_global_location(global_location_slug))
+    sublocation = _or_404(
+        snapshot.get_sublocation(sublocation_slug, global_location))
+    monsters = snapshot.sublocation_monsters[sublocation.pk]
+
+    if user.current_sublocation_id != sublocation.pk:
         return redirect('game:travel_status')
 
+    alive = spawns.alive_counts(sublocation.pk, monsters)
     context = {
         'global_location': global_location,
         'sublocation': sublocation,
-        'monsters': monsters,
+        'monsters': [(monster, alive[monster.pk]) for monster in monsters],
+        # Часть ключа кэша фрагмента: меняется вместе с числом живых
+        'alive_key': '-'.join(map(str, alive.values())),
     }
     return render(request, 'game/sublocation.html', context)
 
@@ -119,23 +159,13 @@ def sublocation(request, global_location_slug, sublocation_slug):
 @login_required
 def start_travel(request, global_location_slug, sublocation_slug):
     """Старт пешего перемещения между локациями"""
-    target_global_location = get_object_or_404(
-        GlobalLocation,
-        slug=global_location_slug
-    )
-    target_sublocation = get_object_or_404(
-        SubLocation,
-        slug=sublocation_slug,
-        global_location=target_global_location
-    )
+    snapshot = world.get_world()
+    target_global_location = _or_404(
+        snapshot.get_global_location(global_location_slug))
+    target_sublocation = _or_404(
+        snapshot.get_sublocation(sublocation_slug, target_global_location))
     user = cast(CustomUser, request.user)
-    travel_time = utils.calculate_travel_time(request.user, target_global_location,   target_sublocation)
-
-    user.travel_destination = target_sublocation
-    user.travel_started_at = timezone.now()
-    user.travel_time = travel_time
-    user.save()
-
+    actions.start_travel(user, target_global_location, target_sublocation)
     return redirect('game:travel_status')
 
 
@@ -143,109 +173,65 @@ def start_travel(request, global_location_slug, sublocation_slug):
 def travel_status(request):
     """Статус ожидания перемещения"""
     user = cast(CustomUser, request.user)
-    if not user.travel_destination or not user.travel_started_at:
+    if not user.travel_destination_id or not user.travel_started_at:
         return redirect('game:hunting_zones')
+    destination = world.get_world().sublocations[user.travel_destination_id]
     time_from_start = timezone.now() - user.travel_started_at
     time_remained = user.travel_time - time_from_start.total_seconds()
 
     if time_remained <= 0:
-        user.set_location(sublocation=user.travel_destination)
+        user.current_sublocation = destination
+        user.current_global_location = destination.global_location
         user.travel_destination = None
         user.travel_time = 0
         user.travel_started_at = None
-        user.save()
-        if user.current_sublocation.slug != 'gorodskaya-ploshad':
-            return redirect(
-                'game:sublocation',
-                global_location_slug=user.current_sublocation.global_location.slug,
-                sublocation_slug=user.current_sublocation.slug
-            )
+        # Одно обновление узкой строки player_travel
+        user.save(update_fields=[
+            'current_sublocation', 'current_global_location',
+            'travel_destination', 'travel_time', 'travel_started_at'])
+        TRAVEL_COMPLETED.inc()
+        action_log.record(user.pk, 'arrive', sublocation=destination.pk)
+        if destination.slug != 'gorodskaya-ploshad':
+            return _redirect_to_current_sublocation(user)
         else:
             return redirect(
                 'game:city'
             )
 
     context = {
-        'destination': user.travel_destination,
+        'destination': destination,
         'time_remained': int(time_remained)
     }
     return render(request, 'game/travel_status.html', context)
 
 
 @login_required
+@idempotent
 def teleport(request, global_location_slug, sublocation_slug):
-    print('TELEPORT')
     """Телепорт в другую локацию"""
-    target_global_location = get_object_or_404(
-        GlobalLocation,
-        slug=global_location_slug
-    )
-    target_sublocation = get_object_or_404(
-        SubLocation,
-        slug=sublocation_slug,
-        global_location=target_global_location
-    )
+    snapshot = world.get_world()
+    target_global_location = _or_404(
+        snapshot.get_global_location(global_location_slug))
+    target_sublocation = _or_404(
+        snapshot.get_sublocation(sublocation_slug, target_global_location))
     user = cast(CustomUser, request.user)
-
-    travel_time = utils.calculate_travel_time(user, target_global_location, target_sublocation)
-
-    teleports_stack = ItemStack.objects.filter(
-        owner=user,
-        item__slug='svitok-teleporta'
-    ).first()
-
-    if teleports_stack and teleports_stack.quantity >= 1:
-        travel_time = 0
-        if teleports_stack.quantity == 1:
-            teleports_stack.delete()
-        else:
-            teleports_stack.quantity -= 1
-            teleports_stack.save(update_fields=['quantity'])
-
-    else:
-        travel_time *= 3
-
-    user.travel_destination = target_sublocation
-    user.travel_started_at = timezone.now()
-    user.travel_time = travel_time
-    user.save(update_fields=['travel_destination', 'travel_started_at', 'travel_time'])
-
+    logger.debug('Телепорт %s в %s', user.pk, target_sublocation.slug)
+    actions.teleport(user, target_global_location, target_sublocation)
     return redirect('game:travel_status')
 
 
 @login_required
+@idempotent
 def attack_monster(request,  global_location_slug, sublocation_slug, monster_slug):
-    monster = get_object_or_404(
-        Monster,
-        slug=monster_slug
-    )
+    monster = _or_404(world.get_world().monsters_by_slug.get(monster_slug))
     user = cast(CustomUser, request.user)
-    # ---- Проверка, вышло ли время до следующего боя ----
-    if user.last_fight_at:
-        elapsed = (timezone.now() - user.last_fight_at).total_seconds()
-        if elapsed < FIGHT_COOLDOWN_SECONDS:
-            return redirect(
-                'game:sublocation',
-                global_location_slug=user.current_sublocation.global_location.slug,
-                sublocation_slug=user.current_sublocation.slug
-            )
-    # ----------------------------------------------------
-
-    if not utils.perform_attack(user, monster):
-        print('Что-то пошло не так')
-    drop_list = monsters.get_amount_of_loot(monster)
-    if not drop_list:
-        print('Вам ничего не выпало')
-    else:
-        inventory.add_drop_list_in_inventory(user, drop_list)
-    user.add_experience(monster.xp_reward)
-    user.last_fight_at = timezone.now()
-    user.save(update_fields=['last_fight_at'])
-    return redirect(
-            'game:sublocation',
-            global_location_slug=user.current_sublocation.global_location.slug,
-            sublocation_slug=user.current_sublocation.slug
-        )
+    try:
+        actions.attack_monster(user, monster)
+    except FightCooldown:
+        pass
+    except MonsterNotSpawned as e:
+        messages.error(request, str(e))
+    return _redirect_to_current_sublocation(user)
 
 
 @login_required
@@ -254,7 +240,8 @@ def trader_test(request):
     Страница торговца.
     """
     player_inventory = inventory.get_user_inventory_data(request.user)
-    trader_inventory = inventory.get_shop_inventory_data('Походник')
+    trader_inventory = inventory.get_shop_inventory_data(
+        trade.TRADER_SHOP)
 
     context = {
         'player_inventory': player_inventory,
@@ -264,30 +251,27 @@ def trader_test(request):
 
 
 @login_required
+@idempotent
 def trade_view(request):
     if request.method == 'POST':
-        item_id = request.POST.get('item_id')
+        try:
+            item_id = int(request.POST.get('item_id', ''))
+            quantity = int(request.POST.get('quantity', 1))
+        except ValueError:
+            messages.error(request, "Некорректный предмет или количество")
+            return redirect('game:trader_test')
         source = request.POST.get('source')
-        quantity = int(request.POST.get('quantity', 1))
-        price_per_unit = int(request.POST.get('price_per_unit', 0))
         world_id = request.POST.get('world_id') or None
-        print(world_id)
+        logger.debug('Сделка %s: item=%s quantity=%s world_id=%s',
+                     source, item_id, quantity, world_id)
 
+        if source not in TRADE_LABELS:
+            messages.error(request, "Неверный источник сделки")
+            return redirect('game:trader_test')
+        done, failed = TRADE_LABELS[source]
         try:
-            if source == 'shop':
-                success, error = utils.buy_item(request.user, item_id, quantity, price_per_unit, world_id)
-                if success:
-                    messages.success(request, f"Куплено: {quantity} шт.")
-                else:
-                    messages.error(request, f"Ошибка покупки: {error}")
-            elif source == 'player':
-                success, error = utils.sell_item(request.user, item_id, quantity, price_per_unit, world_id)
-                if success:
-                    messages.success(request, f"Продано: {quantity} шт.")
-                else:
-                    messages.error(request, f"Ошибка продажи: {error}")
-            else:
-                messages.error(request, "Неверный источник сделки")
-        except Exception as e:
-            messages.error(request, f"Ошибка: {str(e)}")
+            actions.trade_item(request.user, source, item_id, quantity, world_id)
+            messages.success(request, f"{done}: {quantity} шт.")
+        except GameError as e:
+            messages.error(request, f"{failed}: {e}")
     return redirect('game:trader_test')
\ No newline at end of file
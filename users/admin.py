@@ -2,7 +2,11 @@ from django.contrib import admin
 from django.db import models
 from django.utils import timezone
 
-from .models import CustomUser
+from corelight.pagination import EstimatedCountPaginator
+
+from . import volatile
+from .backends import bump_user_version
+from .models import CustomUser, PlayerState, PlayerStats, PlayerTravel
 
 
 # -- Я не понимаю, как работают фильтры, нужно разобраться --
@@ -51,23 +55,64 @@ class PremiumStatusFilter(admin.SimpleListFilter):
         return queryset
 
 
+class PlayerStateInline(admin.StackedInline):
+    model = PlayerState
+    can_delete = False
+    # base_stamina копируется из player_stats, level и max_hp считает БД
+    readonly_fields = ('base_stamina', 'level', 'max_hp')
+
+
+class PlayerTravelInline(admin.StackedInline):
+    model = PlayerTravel
+    can_delete = False
+    raw_id_fields = ('current_sublocation', 'travel_destination')
+
+
+class PlayerStatsInline(admin.StackedInline):
+    model = PlayerStats
+    can_delete = False
+    # Бонусы меняет только game.services.equipment
+    readonly_fields = ('equipment_bonus', 'effective_stats')
+
+
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
     list_display = (
         'nickname',
-        'experience',
-        'level',
+        'player_state__experience',
+        'player_state__level',
         'is_banned',
         'is_premium',
         'banned_until',
         'premium_until',
     )
     list_editable = (
-        'experience',
         'banned_until',
         'premium_until'
     )
+    list_select_related = ('player_state',)
+    # Поиск по подстроке использует триграммные индексы (PostgreSQL)
     search_fields = ('nickname', 'username', 'email')
-    list_filter = (BannedStatusFilter, PremiumStatusFilter, 'current_sublocation')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_filter = (BannedStatusFilter, PremiumStatusFilter,
+                   'player_travel__current_sublocation')
+    inlines = (PlayerStateInline, PlayerTravelInline, PlayerStatsInline)
 
+    def get_object(self, request, object_id, from_field=None):
+        # Форма должна показать опыт и здоровье из кэша, а не
+        # значения последнего отложенного сброса
+        if object_id and object_id.isdigit():
+            volatile.flush([int(object_id)])
+        return super().get_object(request, object_id, from_field)
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Выносливость могли поменять в PlayerStatsInline
+        user_id = form.instance.pk
+        PlayerState.objects.filter(user_id=user_id).update(
+            base_stamina=PlayerStats.objects.filter(
+                user_id=user_id).values('stamina')[:1])
+        # Значения из формы главнее отложенных в кэше
+        volatile.forget(user_id)
+        bump_user_version(user_id)
@@ -0,0 +1,156 @@
+"""Загрузка игрока для AuthenticationMiddleware.
+
+Стандартный ModelBackend на каждом запросе читает всю строку
+пользователя, а локации потом догружаются отдельными запросами.
+PlayerBackend берёт игрока из кэша, а при промахе загружает его
+одним запросом вместе с локациями и без редко нужных полей.
+
+Кэш привязан к версии игрока и версии мира: любое сохранение
+пользователя (сигнал post_save) и любой queryset.update() по
+пользователям должны вызывать bump_user_version. Изменчивые поля
+(users.volatile) версию не меняют: их значения читаются тем же
+get_many и накладываются на игрока.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from game.services.world import WORLD_VERSION_KEY, get_world_version
+
+from . import volatile
+from .models import CustomUser
+
+# Строки игрока и локации, которые нужны почти каждой игровой странице
+SELECT_RELATED = (
+    'player_state',
+    'player_stats',
+    'player_travel__current_global_location',
+    'player_travel__current_sublocation__global_location',
+    'player_travel__travel_destination',
+)
+# Поля, которые на игровых страницах не читаются
+DEFERRED_FIELDS = ('email', 'first_name', 'last_name', 'date_joined',
+                   'last_login')
+
+
+def _version_key(user_id) -> str:
+    return f'user:{user_id}:version'
+
+
+def _state_key(user_id) -> str:
+    return f'user:{user_id}:state'
+
+
+def get_user_cache_timeout() -> int:
+    """Время жизни закэшированного игрока в секундах."""
+    return getattr(settings, 'USER_CACHE_TIMEOUT', 5 * 60)
+
+
+def bump_user_version(user_id) -> int:
+    """Инвалидирует закэшированного игрока.
+
+    Returns:
+        int: Новая версия игрока.
+    """
+    version = time.time_ns()
+    cache.set(_version_key(user_id), version, timeout=None)
+    return version
+
+
+async def abump_user_version(user_id) -> int:
+    """Асинхронная версия bump_user_version."""
+    version = time.time_ns()
+    await cache.aset(_version_key(user_id), version, timeout=None)
+    return version
+
+
+def _player_queryset():
+    return (CustomUser._default_manager
+            .select_related(*SELECT_RELATED)
+            .defer(*DEFERRED_FIELDS))
+
+
+def _cached(user_id, values: dict) -> CustomUser | None:
+    """Игрок из кэша, если его версии совпадают с текущими."""
+    state = values.get(_state_key(user_id))
+    if state is None:
+        return None
+    version, world_version, user = state
+    if (version != values.get(_version_key(user_id))
+            or world_version != values.get(WORLD_VERSION_KEY)):
+        return None
+    return user
+
+
+def load_user(user_id) -> CustomUser | None:
+    """Игрок с локациями: из кэша или одним запросом к БД.
+
+    Версии читаются до запроса к БД: если игрока изменят, пока
+    он загружается, в кэш попадёт уже устаревшая версия и
+    следующий запрос загрузит его заново.
+    """
+    version_key = _version_key(user_id)
+    values = cache.get_many([version_key, WORLD_VERSION_KEY,
+                             _state_key(user_id), *volatile.keys(user_id)])
+    user = _cached(user_id, values)
+    if user is not None:
+        volatile.apply(user, values)
+        return user
+
+    version = values.get(version_key)
+    if version is None:
+        cache.add(version_key, time.time_ns(), timeout=None)
+        version = cache.get(version_key)
+    world_version = values.get(WORLD_VERSION_KEY) or get_world_version()
+    user = _player_queryset().filter(pk=user_id).first()
+    if user is not None:
+        cache.set(_state_key(user_id), (version, world_version, user),
+                  get_user_cache_timeout())
+        volatile.apply(user, values)
+    return user
+
+
+async def aload_user(user_id) -> CustomUser | None:
+    """Асинхронная версия load_user."""
+    version_key = _version_key(user_id)
+    values = await cache.aget_many([version_key, WORLD_VERSION_KEY,
+                                    _state_key(user_id),
+                                    *volatile.keys(user_id)])
+    user = _cached(user_id, values)
+    if user is not None:
+        volatile.apply(user, values)
+        return user
+
+    version = values.get(version_key)
+    if version is None:
+        await cache.aadd(version_key, time.time_ns(), timeout=None)
+        version = await cache.aget(version_key)
+    world_version = values.get(WORLD_VERSION_KEY)
+    if world_version is None:
+        world_version = await cache.aget(WORLD_VERSION_KEY)
+    user = await _player_queryset().filter(pk=user_id).afirst()
+    if user is not None and world_version is not None:
+        await cache.aset(_state_key(user_id),
+                         (version, world_version, user),
+                         get_user_cache_timeout())
+    if user is not None:
+        volatile.apply(user, values)
+    return user
+
+
+class PlayerBackend(ModelBackend):
+    """ModelBackend, загружающий игрока через load_user."""
+
+    def get_user(self, user_id):
+        user = load_user(user_id)
+        if user is None or not self.user_can_authenticate(user):
+            return None
+        return user
+
+    async def aget_user(self, user_id):
+        user = await aload_user(user_id)
+        if user is None or not self.user_can_authenticate(user):
+            return None
+        return user
@@ -0,0 +1,191 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Поля, переезжающие из user в узкие таблицы: модель -> поля (attname)
+MOVED_FIELDS = {
+    'PlayerState': ('current_hp', 'experience', 'level', 'last_fight_at'),
+    'PlayerTravel': ('current_global_location_id', 'current_sublocation_id',
+                     'travel_destination_id', 'travel_started_at',
+                     'travel_time'),
+    'PlayerStats': ('strength', 'defense', 'dexterity', 'stamina',
+                    'intelligence', 'spirit', 'willpower', 'luck',
+                    'item_slots'),
+}
+BATCH_SIZE = 2000
+
+
+def copy_to_player_tables(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    db = schema_editor.connection.alias
+    fields = [name for names in MOVED_FIELDS.values() for name in names]
+    users = (CustomUser.objects.using(db).order_by('pk')
+             .values_list('pk', *fields))
+    batch = []
+    for row in users.iterator(chunk_size=BATCH_SIZE):
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            _create_rows(apps, db, batch)
+            batch = []
+    if batch:
+        _create_rows(apps, db, batch)
+
+
+def _create_rows(apps, db, batch):
+    offset = 1
+    for model_name, names in MOVED_FIELDS.items():
+        model = apps.get_model('users', model_name)
+        model.objects.using(db).bulk_create(
+            model(user_id=row[0],
+                  **dict(zip(names, row[offset:offset + len(names)])))
+            for row in batch)
+        offset += len(names)
+
+
+def copy_to_user_table(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    db = schema_editor.connection.alias
+    for model_name, names in MOVED_FIELDS.items():
+        model = apps.get_model('users', model_name)
+        rows = model.objects.using(db).values_list('user_id', *names)
+        for row in rows.iterator(chunk_size=BATCH_SIZE):
+            CustomUser.objects.using(db).filter(pk=row[0]).update(
+                **dict(zip(names, row[1:])))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0031_alter_monsterdrop_item'),
+        ('users', '0019_customuser_last_fight_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='player_state', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Игрок')),
+                ('current_hp', models.PositiveIntegerField(default=0, verbose_name='Текущее здоровье')),
+                ('experience', models.PositiveBigIntegerField(default=0, verbose_name='Опыт')),
+                ('level', models.PositiveIntegerField(default=1, verbose_name='Уровень')),
+                ('last_fight_at', models.DateTimeField(blank=True, null=True, verbose_name='Время последнего нападения')),
+            ],
+            options={
+                'verbose_name': 'Состояние игрока',
+                'verbose_name_plural': 'Состояния игроков',
+                'db_table': 'player_state',
+            },
+        ),
+        migrations.CreateModel(
+            name='PlayerTravel',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='player_travel', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Игрок')),
+                ('travel_started_at', models.DateTimeField(blank=True, null=True)),
+                ('travel_time', models.PositiveIntegerField(default=0)),
+                ('current_global_location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='players', to='game.globallocation', verbose_name='Текущая глобальная локация')),
+                ('current_sublocation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='players', to='game.sublocation', verbose_name='Текущая саблокация')),
+                ('travel_destination', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='travelling_players', to='game.sublocation', verbose_name='Перемещение в')),
+            ],
+            options={
+                'verbose_name': 'Перемещение игрока',
+                'verbose_name_plural': 'Перемещения игроков',
+                'db_table': 'player_travel',
+            },
+        ),
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='player_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Игрок')),
+                ('strength', models.PositiveSmallIntegerField(default=5, verbose_name='Сила')),
+                ('defense', models.PositiveSmallIntegerField(default=5, verbose_name='Защита')),
+                ('dexterity', models.PositiveSmallIntegerField(default=5, verbose_name='Ловкость')),
+                ('stamina', models.PositiveSmallIntegerField(default=5, verbose_name='Выносливость')),
+                ('intelligence', models.PositiveSmallIntegerField(default=5, verbose_name='Интеллект')),
+                ('spirit', models.PositiveSmallIntegerField(default=5, verbose_name='Дух')),
+                ('willpower', models.PositiveSmallIntegerField(default=5, verbose_name='Воля')),
+                ('luck', models.PositiveSmallIntegerField(default=5, verbose_name='Удача')),
+                ('item_slots', models.PositiveSmallIntegerField(default=24, verbose_name='Слоты инвентаря')),
+            ],
+            options={
+                'verbose_name': 'Характеристики игрока',
+                'verbose_name_plural': 'Характеристики игроков',
+                'db_table': 'player_stats',
+            },
+        ),
+        # Данные копируются до удаления колонок из user
+        migrations.RunPython(copy_to_player_tables, copy_to_user_table),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='current_global_location',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='current_hp',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='current_sublocation',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='defense',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='dexterity',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='experience',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='intelligence',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='item_slots',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='last_fight_at',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='level',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='luck',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='spirit',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='stamina',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='strength',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='travel_destination',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='travel_started_at',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='travel_time',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='willpower',
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:06
+
+from django.db import migrations, models
+
+# Статы в порядке game.constants.BASE_STATS
+STATS = ('strength', 'defense', 'dexterity', 'stamina', 'intelligence',
+         'spirit', 'willpower', 'item_slots', 'luck')
+BATCH_SIZE = 2000
+
+
+def fill_effective_stats(apps, schema_editor):
+    # Экипировки ещё нет: итоговые характеристики равны базовым
+    PlayerStats = apps.get_model('users', 'PlayerStats')
+    db = schema_editor.connection.alias
+    batch = []
+    for stats in PlayerStats.objects.using(db).iterator(chunk_size=BATCH_SIZE):
+        stats.effective_stats = {stat: getattr(stats, stat) for stat in STATS}
+        batch.append(stats)
+        if len(batch) == BATCH_SIZE:
+            PlayerStats.objects.using(db).bulk_update(batch, ['effective_stats'])
+            batch = []
+    if batch:
+        PlayerStats.objects.using(db).bulk_update(batch, ['effective_stats'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_player_state_travel_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerstats',
+            name='effective_stats',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Итоговые характеристики'),
+        ),
+        migrations.AddField(
+            model_name='playerstats',
+            name='equipment_bonus',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Бонусы экипировки'),
+        ),
+        migrations.RunPython(fill_effective_stats, migrations.RunPython.noop),
+    ]
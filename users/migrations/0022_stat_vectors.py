@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:10
+
+from django.db import migrations, models
+
+# Порядок game.stat_schema.STAT_NAMES на момент миграции
+STATS = ('strength', 'defense', 'dexterity', 'stamina', 'intelligence',
+         'spirit', 'willpower', 'item_slots', 'luck')
+BATCH_SIZE = 2000
+
+
+def _convert(apps, schema_editor, convert):
+    PlayerStats = apps.get_model('users', 'PlayerStats')
+    db = schema_editor.connection.alias
+    fields = ['equipment_bonus', 'effective_stats']
+    batch = []
+    for stats in PlayerStats.objects.using(db).iterator(chunk_size=BATCH_SIZE):
+        for field in fields:
+            setattr(stats, field, convert(getattr(stats, field)))
+        batch.append(stats)
+        if len(batch) == BATCH_SIZE:
+            PlayerStats.objects.using(db).bulk_update(batch, fields)
+            batch = []
+    if batch:
+        PlayerStats.objects.using(db).bulk_update(batch, fields)
+
+
+def dicts_to_vectors(apps, schema_editor):
+    def convert(value):
+        if isinstance(value, dict):
+            return [value.get(stat, 0) for stat in STATS]
+        return value
+    _convert(apps, schema_editor, convert)
+
+
+def vectors_to_dicts(apps, schema_editor):
+    def convert(value):
+        if isinstance(value, list):
+            return {stat: v for stat, v in zip(STATS, value) if v}
+        return value
+    _convert(apps, schema_editor, convert)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0021_playerstats_effective_stats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='playerstats',
+            name='effective_stats',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Итоговые характеристики'),
+        ),
+        migrations.AlterField(
+            model_name='playerstats',
+            name='equipment_bonus',
+            field=models.JSONField(blank=True, default=list, verbose_name='Бонусы экипировки'),
+        ),
+        migrations.RunPython(dicts_to_vectors, vectors_to_dicts),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:11
+
+import math
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_stamina(apps, schema_editor):
+    PlayerState = apps.get_model('users', 'PlayerState')
+    PlayerStats = apps.get_model('users', 'PlayerStats')
+    db = schema_editor.connection.alias
+    PlayerState.objects.using(db).update(base_stamina=Subquery(
+        PlayerStats.objects.using(db).filter(
+            user_id=OuterRef('user_id')).values('stamina')[:1]))
+
+
+def restore_level(apps, schema_editor):
+    # Обратная миграция: уровень снова обычная колонка
+    PlayerState = apps.get_model('users', 'PlayerState')
+    db = schema_editor.connection.alias
+    batch = []
+    for state in PlayerState.objects.using(db).iterator(chunk_size=2000):
+        state.level = math.floor(math.sqrt(state.experience / 100)) + 1
+        batch.append(state)
+        if len(batch) == 2000:
+            PlayerState.objects.using(db).bulk_update(batch, ['level'])
+            batch = []
+    if batch:
+        PlayerState.objects.using(db).bulk_update(batch, ['level'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0022_stat_vectors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerstate',
+            name='base_stamina',
+            field=models.PositiveSmallIntegerField(default=5, verbose_name='Выносливость (для max_hp)'),
+        ),
+        migrations.RunPython(copy_stamina, migrations.RunPython.noop),
+        migrations.RunPython(migrations.RunPython.noop, restore_level),
+        # Обычную колонку нельзя превратить в генерируемую
+        migrations.RemoveField(
+            model_name='playerstate',
+            name='level',
+        ),
+        migrations.AddField(
+            model_name='playerstate',
+            name='level',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast(django.db.models.functions.math.Floor(django.db.models.functions.math.Sqrt(django.db.models.expressions.CombinedExpression(models.F('experience'), '/', models.Value(100.0)))), models.IntegerField()), '+', models.Value(1)), output_field=models.PositiveIntegerField(), verbose_name='Уровень'),
+        ),
+        migrations.AddField(
+            model_name='playerstate',
+            name='max_hp',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('base_stamina'), '+', django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast(django.db.models.functions.math.Floor(django.db.models.functions.math.Sqrt(django.db.models.expressions.CombinedExpression(models.F('experience'), '/', models.Value(100.0)))), models.IntegerField()), '+', models.Value(1))), '*', models.Value(10)), output_field=models.PositiveIntegerField(), verbose_name='Максимум здоровья'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0023_player_state_generated_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerstate',
+            name='kills',
+            field=models.PositiveIntegerField(db_index=True, default=0, verbose_name='Убито монстров'),
+        ),
+        migrations.AlterField(
+            model_name='playerstate',
+            name='experience',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, verbose_name='Опыт'),
+        ),
+    ]
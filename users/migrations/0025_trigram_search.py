@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:05
+
+from django.db import migrations
+
+# Поиск админки (icontains) PostgreSQL выполняет как
+# UPPER(поле::text) LIKE UPPER('%...%'): индекс строится по тому же
+# выражению. В остальных базах индексы не нужны и не создаются.
+INDEXES = {
+    'user_nickname_trgm': 'nickname',
+    'user_username_trgm': 'username',
+    'user_email_trgm': 'email',
+}
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON "user" '
+            f'USING gin ((UPPER({column}::text)) gin_trgm_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0024_playerstate_kills'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -1,11 +1,16 @@
 import math
 import os
+from array import array
 
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Cast, Floor, Sqrt
 from django.utils import timezone
 
+from game import stat_schema
 from game.constants import BASE_STATS, STATS_PER_LEVEL
 
 
@@ -23,6 +28,50 @@ def get_all_avatar_choices():
     return choices
 
 
+# Поля игрока, вынесенные из таблицы user: обратная связь -> поля.
+# Частые изменения (бой, перемещение) переписывают только узкие строки,
+# а широкая строка user, которую читает авторизация, не трогается.
+# Уровень и максимум здоровья считает БД (PlayerState, GeneratedField).
+PLAYER_ROWS = {
+    'player_state': ('current_hp', 'experience', 'kills', 'base_stamina',
+                     'last_fight_at'),
+    'player_travel': ('current_global_location', 'current_sublocation',
+                      'travel_destination', 'travel_started_at',
+                      'travel_time'),
+    'player_stats': ('strength', 'defense', 'dexterity', 'stamina',
+                     'intelligence', 'spirit', 'willpower', 'luck',
+                     'item_slots'),
+}
+
+
+def level_for_experience(experience: int) -> int:
+    """Уровень по опыту. Та же формула — в PlayerState.LEVEL_EXPRESSION.
+
+    Совпадение с БД проверяет users.tests.GeneratedFieldsTests.
+    """
+    return math.floor(math.sqrt(experience / 100)) + 1
+
+
+def max_hp_for(stamina: int, level: int) -> int:
+    """Максимум здоровья. Та же формула — в PlayerState.max_hp."""
+    return (stamina + level) * 10
+
+
+def player_field(row: str, name: str) -> property:
+    """Свойство CustomUser, читающее и пишущее поле строки игрока.
+
+    Это property, поэтому его можно передавать в конструктор:
+    CustomUser(nickname=..., current_hp=10).
+    """
+    def fget(user):
+        return getattr(user.get_player_row(row), name)
+
+    def fset(user, value):
+        setattr(user.get_player_row(row), name, value)
+
+    return property(fget, fset, doc=f'{row}.{name}')
+
+
 class CustomUser(AbstractUser):
     """
     Кастомная модель пользователя.
@@ -41,92 +90,38 @@ class CustomUser(AbstractUser):
         default='male/elf_1.svg',
         verbose_name='Аватар'
     )
-    experience = models.PositiveBigIntegerField(
-        default=0,
-        verbose_name='Опыт'
-    )
-    level = models.PositiveIntegerField(
-        default=1,
-        verbose_name='Уровень'
-    )
-    current_global_location = models.ForeignKey(
-        'game.GlobalLocation',
-        blank=True,
-        null=True,
-        on_delete=models.SET_NULL,
-        verbose_name='Текущая глобальная локация'
-    )
-    current_sublocation = models.ForeignKey(
-        'game.SubLocation',
-        blank=True,
-        null=True,
-        on_delete=models.SET_NULL,
-        verbose_name='Текущая саблокация'
-    )
-    last_fight_at = models.DateTimeField(
-        null=True,
-        blank=True,
-        verbose_name='Время последнего нападения',
-        
-    )
+    # ---- Поля игрока из player_state/player_travel/player_stats ----
+    # Хранятся в узких таблицах (см. PLAYER_ROWS), здесь — для совместимости
+    current_hp = player_field('player_state', 'current_hp')
+    experience = player_field('player_state', 'experience')
+    kills = player_field('player_state', 'kills')
+    level = player_field('player_state', 'level')
+    last_fight_at = player_field('player_state', 'last_fight_at')
 
+    current_global_location = player_field(
+        'player_travel', 'current_global_location')
+    current_global_location_id = player_field(
+        'player_travel', 'current_global_location_id')
+    current_sublocation = player_field('player_travel', 'current_sublocation')
+    current_sublocation_id = player_field(
+        'player_travel', 'current_sublocation_id')
+    travel_destination = player_field('player_travel', 'travel_destination')
+    travel_destination_id = player_field(
+        'player_travel', 'travel_destination_id')
+    travel_started_at = player_field('player_travel', 'travel_started_at')
+    travel_time = player_field('player_travel', 'travel_time')
 
-    # Базовые характеристики
-    strength = models.PositiveSmallIntegerField(
-    default=BASE_STATS['strength'],
-    verbose_name="Сила"
-    )
-    defense = models.PositiveSmallIntegerField(
-        default=BASE_STATS['defense'],
-        verbose_name="Защита"
-    )
-    dexterity = models.PositiveSmallIntegerField(
-        default=BASE_STATS['dexterity'],
-        verbose_name="Ловкость"
-    )
-    stamina = models.PositiveSmallIntegerField(
-        default=BASE_STATS['stamina'],
-        verbose_name="Выносливость"
-    )
-    intelligence = models.PositiveSmallIntegerField(
-        default=BASE_STATS['intelligence'],
-        verbose_name="Интеллект"
-    )
-    spirit = models.PositiveSmallIntegerField(
-        default=BASE_STATS['spirit'],
-        verbose_name="Дух"
-    )
-    willpower = models.PositiveSmallIntegerField(
-        default=BASE_STATS['willpower'],
-        verbose_name="Воля"
-    )
-    luck = models.PositiveSmallIntegerField(
-        default=BASE_STATS['luck'],
-        verbose_name="Удача"
-    )
-    item_slots = models.PositiveSmallIntegerField(
-        default=BASE_STATS['item_slots'],
-        verbose_name="Слоты инвентаря"
-    )
-    current_hp = models.PositiveIntegerField(
-        default=0,
-        verbose_name="Текущее здоровье"
-    )
-    # ---- Для перемещения пешком ----
-
-    travel_destination = models.ForeignKey(
-        'game.SubLocation',
-        on_delete=models.SET_NULL,
-        null=True,
-        blank=True,
-        related_name='travel_destination',
-        verbose_name='Перемещение в'
-    )
-    travel_started_at = models.DateTimeField(null=True, blank=True)
-    travel_time = models.PositiveIntegerField(default=0)
+    strength = player_field('player_stats', 'strength')
+    defense = player_field('player_stats', 'defense')
+    dexterity = player_field('player_stats', 'dexterity')
+    stamina = player_field('player_stats', 'stamina')
+    intelligence = player_field('player_stats', 'intelligence')
+    spirit = player_field('player_stats', 'spirit')
+    willpower = player_field('player_stats', 'willpower')
+    luck = player_field('player_stats', 'luck')
+    item_slots = player_field('player_stats', 'item_slots')
+    # -----------------------------------------------------------------
 
-    # ---------------------------------
-    
     banned_until = models.DateTimeField(
         blank=True,
         null=True,
@@ -160,20 +155,76 @@ class CustomUser(AbstractUser):
         """Вычисляет текущий уровень на основе опыта."""
         # Зависит от формулы вычисления уровня от опыта
         # def xp_required_for_level()
-        current_level = math.floor(math.sqrt(self.experience / 100)) + 1
-        return current_level
+        return level_for_experience(self.experience)
     
     def save(self, *args, **kwargs):
-        # Обновляем уровень
-        self.level = self.calculate_current_level()
-        # Если current_hp не задан — устанавливаем в максимум
-        if self.current_hp == 0:
-            self.current_hp = self.max_hp
-        
-        # Если текущее HP превышает максимум — обрезаем
-        if self.current_hp > self.max_hp:
-            self.current_hp = self.max_hp
-        super().save(*args, **kwargs)
+        """Сохраняет пользователя и его строки игрока.
+
+        update_fields раскладываются по таблицам: save(update_fields=
+        ['last_fight_at']) обновит только player_state. Без update_fields
+        сохраняются загруженные строки игрока (у нового — все).
+        """
+        update_fields = kwargs.pop('update_fields', None)
+        # Копия выносливости для max_hp в player_state
+        if update_fields is None:
+            stats = self._meta.get_field('player_stats').get_cached_value(
+                self, None)
+            if stats is not None:
+                self.get_player_row('player_state').base_stamina = (
+                    stats.stamina)
+        elif 'stamina' in update_fields:
+            self.get_player_row('player_state').base_stamina = self.stamina
+            update_fields = [*update_fields, 'base_stamina']
+
+        if update_fields is None or 'current_hp' in update_fields:
+            self.get_player_row('player_state').refresh_derived()
+            # Если current_hp не задан — устанавливаем в максимум
+            if self.current_hp == 0:
+                self.current_hp = self.max_hp
+
+            # Если текущее HP превышает максимум — обрезаем
+            if self.current_hp > self.max_hp:
+                self.current_hp = self.max_hp
+
+        if update_fields is None:
+            adding = self._state.adding
+            super().save(*args, **kwargs)
+            for row in PLAYER_ROWS:
+                field = self._meta.get_field(row)
+                if adding or field.get_cached_value(self, None) is not None:
+                    self._save_player_row(row)
+            return
+
+        update_fields = set(update_fields)
+        for row, fields in PLAYER_ROWS.items():
+            row_fields = {name for name in update_fields
+                          if name.removesuffix('_id') in fields}
+            if row_fields:
+                self._save_player_row(
+                    row, {name.removesuffix('_id') for name in row_fields})
+                update_fields -= row_fields
+        if update_fields:
+            super().save(*args, update_fields=update_fields, **kwargs)
+
+    def get_player_row(self, row: str):
+        """Строка игрока: player_state, player_travel или player_stats.
+
+        Если строки ещё нет (новый пользователь), создаётся
+        несохранённая — она запишется при сохранении пользователя.
+        """
+        try:
+            return getattr(self, row)
+        except ObjectDoesNotExist:
+            return self._meta.get_field(row).related_model(user=self)
+
+    def _save_player_row(self, row: str, fields: set[str] | None = None):
+        instance = self.get_player_row(row)
+        # У нового пользователя первичный ключ появился только что
+        instance.user = self
+        if fields is None or instance._state.adding:
+            instance.save(using=self._state.db)
+        else:
+            instance.save(using=self._state.db, update_fields=fields)
 
     def set_location(self, sublocation):
         """
@@ -192,7 +243,15 @@ class CustomUser(AbstractUser):
     @property
     def max_hp(self):
         """Максимальное здоровье зависит от выносливости и уровня."""
-        return self.stamina * 10 + self.level * 10
+        return self.get_player_row('player_state').max_hp
+
+    @property
+    def effective_stats(self) -> array:
+        """Вектор характеристик с учётом экипировки (game.stat_schema)."""
+        stats = self.get_player_row('player_stats')
+        if not stats.effective_stats:
+            return stats.calculate_effective_stats()
+        return stat_schema.from_list(stats.effective_stats)
 
     @property
     def xp_to_next_level(self):
@@ -207,10 +266,33 @@ class CustomUser(AbstractUser):
         return exp
     
     def add_experience(self, amount):
-        """Начислить опыт."""
+        """Начислить опыт.
+
+        За каждый новый уровень базовые характеристики растут
+        на STATS_PER_LEVEL.
+        """
+        level_before = self.level
         self.experience += amount
-        self.level = self.calculate_current_level()
-        self.save(update_fields=['experience', 'level'])
+        self.get_player_row('player_state').refresh_derived()
+        update_fields = ['experience']
+        if self.level > level_before:
+            self._grow_stats(self.level - level_before)
+            update_fields += stat_schema.STAT_NAMES
+        self.save(update_fields=update_fields)
+
+    def _grow_stats(self, levels: int):
+        """Прирост базовых характеристик за новые уровни (STATS_PER_LEVEL).
+
+        Меняет только объекты в памяти, сохраняет вызывающий.
+        """
+        stats = self.get_player_row('player_stats')
+        stats.base_vector = stat_schema.add(
+            stats.base_vector,
+            stat_schema.scale(stat_schema.PER_LEVEL_VECTOR, levels))
+        state = self.get_player_row('player_state')
+        state.base_stamina = stats.stamina
+        state.refresh_derived()
+        return stats
 
     @property
     def is_banned(self):
@@ -231,4 +313,223 @@ class CustomUser(AbstractUser):
                 wallet = self.wallets.get(currency__code=currency_code)
                 return wallet.amount
             except Exception:
-                return 0
\ No newline at end of file
+                return 0
+
+
+class PlayerState(models.Model):
+    """Боевое состояние игрока: меняется почти на каждом действии."""
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='player_state',
+        verbose_name='Игрок'
+    )
+    current_hp = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Текущее здоровье"
+    )
+    experience = models.PositiveBigIntegerField(
+        default=0,
+        db_index=True,
+        verbose_name='Опыт'
+    )
+    kills = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        verbose_name='Убито монстров'
+    )
+    # Копия player_stats.stamina (базовая, без экипировки): генерируемая
+    # колонка может ссылаться только на колонки своей таблицы.
+    # Источник — player_stats.stamina; копию обновляют CustomUser.save()
+    # (update_fields с 'stamina'), _grow_stats() и админка игрока
+    base_stamina = models.PositiveSmallIntegerField(
+        default=BASE_STATS['stamina'],
+        verbose_name='Выносливость (для max_hp)'
+    )
+    last_fight_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Время последнего нападения',
+    )
+
+    # ---- Считает БД: по ним можно сортировать и фильтровать в SQL ----
+    # floor(sqrt(experience / 100)) + 1, как level_for_experience()
+    LEVEL_EXPRESSION = Cast(
+        Floor(Sqrt(F('experience') / 100.0)), models.IntegerField()) + 1
+    level = models.GeneratedField(
+        expression=LEVEL_EXPRESSION,
+        output_field=models.PositiveIntegerField(),
+        db_persist=True,
+        db_index=True,
+        verbose_name='Уровень'
+    )
+    # Генерируемая колонка не может ссылаться на другую генерируемую,
+    # поэтому уровень в выражении повторяется
+    max_hp = models.GeneratedField(
+        expression=(F('base_stamina') + LEVEL_EXPRESSION) * 10,
+        output_field=models.PositiveIntegerField(),
+        db_persist=True,
+        db_index=True,
+        verbose_name='Максимум здоровья'
+    )
+
+    class Meta:
+        db_table = 'player_state'
+        verbose_name = 'Состояние игрока'
+        verbose_name_plural = 'Состояния игроков'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.level} ур.'
+
+    def refresh_derived(self):
+        """Пересчитывает level и max_hp объекта в памяти.
+
+        В БД их считает сама БД, но после save() Django не
+        перечитывает генерируемые колонки: без пересчёта объект
+        показывал бы уровень до боя.
+        """
+        self.level = level_for_experience(self.experience)
+        self.max_hp = max_hp_for(self.base_stamina, self.level)
+
+    def save(self, *args, **kwargs):
+        self.refresh_derived()
+        super().save(*args, **kwargs)
+
+
+class PlayerTravel(models.Model):
+    """Местоположение игрока и текущее перемещение."""
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='player_travel',
+        verbose_name='Игрок'
+    )
+    current_global_location = models.ForeignKey(
+        'game.GlobalLocation',
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='players',
+        verbose_name='Текущая глобальная локация'
+    )
+    current_sublocation = models.ForeignKey(
+        'game.SubLocation',
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='players',
+        verbose_name='Текущая саблокация'
+    )
+    # ---- Для перемещения пешком ----
+    travel_destination = models.ForeignKey(
+        'game.SubLocation',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='travelling_players',
+        verbose_name='Перемещение в'
+    )
+    travel_started_at = models.DateTimeField(null=True, blank=True)
+    travel_time = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'player_travel'
+        verbose_name = 'Перемещение игрока'
+        verbose_name_plural = 'Перемещения игроков'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.current_sublocation_id}'
+
+
+class PlayerStats(models.Model):
+    """Базовые характеристики игрока: меняются редко."""
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='player_stats',
+        verbose_name='Игрок'
+    )
+    strength = models.PositiveSmallIntegerField(
+        default=BASE_STATS['strength'],
+        verbose_name="Сила"
+    )
+    defense = models.PositiveSmallIntegerField(
+        default=BASE_STATS['defense'],
+        verbose_name="Защита"
+    )
+    dexterity = models.PositiveSmallIntegerField(
+        default=BASE_STATS['dexterity'],
+        verbose_name="Ловкость"
+    )
+    stamina = models.PositiveSmallIntegerField(
+        default=BASE_STATS['stamina'],
+        verbose_name="Выносливость"
+    )
+    intelligence = models.PositiveSmallIntegerField(
+        default=BASE_STATS['intelligence'],
+        verbose_name="Интеллект"
+    )
+    spirit = models.PositiveSmallIntegerField(
+        default=BASE_STATS['spirit'],
+        verbose_name="Дух"
+    )
+    willpower = models.PositiveSmallIntegerField(
+        default=BASE_STATS['willpower'],
+        verbose_name="Воля"
+    )
+    luck = models.PositiveSmallIntegerField(
+        default=BASE_STATS['luck'],
+        verbose_name="Удача"
+    )
+    item_slots = models.PositiveSmallIntegerField(
+        default=BASE_STATS['item_slots'],
+        verbose_name="Слоты инвентаря"
+    )
+    # Векторы в порядке game.stat_schema.STAT_NAMES (JSON-списки).
+    # Сумма статов надетых предметов: меняется на дельту предмета
+    # при надевании/снятии (game.services.equipment)
+    equipment_bonus = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='Бонусы экипировки'
+    )
+    # База + экипировка, пересчитывается в save(): бой и интерфейс
+    # читают готовые значения и не собирают их по предметам
+    effective_stats = models.JSONField(
+        default=list,
+        blank=True,
+        editable=False,
+        verbose_name='Итоговые характеристики'
+    )
+
+    class Meta:
+        db_table = 'player_stats'
+        verbose_name = 'Характеристики игрока'
+        verbose_name_plural = 'Характеристики игроков'
+
+    def __str__(self):
+        return f'{self.user_id}'
+
+    @property
+    def base_vector(self) -> array:
+        """Базовые характеристики вектором."""
+        return stat_schema.from_instance(self)
+
+    @base_vector.setter
+    def base_vector(self, vector: array):
+        stat_schema.store(self, vector)
+
+    def calculate_effective_stats(self) -> array:
+        """Характеристики игрока с учётом бонусов экипировки."""
+        return stat_schema.add(self.base_vector,
+                               stat_schema.from_list(self.equipment_bonus))
+
+    def save(self, *args, **kwargs):
+        self.effective_stats = self.calculate_effective_stats().tolist()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'effective_stats'}
+        super().save(*args, **kwargs)
@@ -0,0 +1,29 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import volatile
+from .backends import bump_user_version
+from .models import CustomUser, PlayerState, PlayerStats, PlayerTravel
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    """Сбрасывает закэшированного игрока при сохранении и удалении."""
+    bump_user_version(instance.pk)
+
+
+@receiver(post_save, sender=PlayerState)
+@receiver(post_save, sender=PlayerTravel)
+@receiver(post_save, sender=PlayerStats)
+def player_row_changed(sender, instance, **kwargs):
+    """Строки игрока сохраняются без пользователя — сбрасываем и их."""
+    bump_user_version(instance.user_id)
+
+
+@receiver(user_logged_out)
+def player_logged_out(sender, request, user, **kwargs):
+    """Игрок вышел: его отложенное состояние пишется в БД сразу."""
+    if user is not None:
+        volatile.flush([user.pk])
@@ -1,3 +1,246 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from game.models import GlobalLocation, SubLocation
+from game.services import world
+from users import volatile
+from users.backends import bump_user_version, load_user
+from users.models import CustomUser, PlayerState, PlayerStats, PlayerTravel
+
+
+class PlayerBackendTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        forest = GlobalLocation.objects.create(
+            name='Лес', slug='les', distance_to_the_city=3)
+        cls.glade = SubLocation.objects.create(
+            name='Поляна', slug='polyana', global_location=forest)
+        cls.user = CustomUser.objects.create_user(
+            'player', password='password', nickname='Hero')
+        cls.user.set_location(cls.glade)
+
+    def setUp(self):
+        cache.clear()
+        world.reset_world_version()
+
+    def test_user_loaded_with_locations_in_one_query(self):
+        with self.assertNumQueries(1):
+            user = load_user(self.user.pk)
+            self.assertEqual(user.current_sublocation.global_location.slug,
+                             'les')
+            self.assertEqual(user.current_global_location.slug, 'les')
+            self.assertIsNone(user.travel_destination)
+
+    def test_cached_user_needs_no_queries(self):
+        load_user(self.user.pk)
+        with self.assertNumQueries(0):
+            user = load_user(self.user.pk)
+        self.assertEqual(user.current_sublocation, self.glade)
+
+    def test_save_invalidates_cached_user(self):
+        load_user(self.user.pk)
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.experience = 500
+        user.save()
+        self.assertEqual(load_user(self.user.pk).experience, 500)
+
+    def test_update_requires_bump(self):
+        load_user(self.user.pk)
+        PlayerTravel.objects.filter(user_id=self.user.pk).update(
+            travel_time=7)
+        self.assertEqual(load_user(self.user.pk).travel_time, 0)
+        bump_user_version(self.user.pk)
+        self.assertEqual(load_user(self.user.pk).travel_time, 7)
+
+    def test_request_loads_user_from_cache(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('index'))
+        # Остаётся только чтение сессии
+        with self.assertNumQueries(1):
+            self.client.get(reverse('index'))
+
+
+class PlayerRowsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            'player', password='password', nickname='Hero')
+
+    def test_new_user_gets_player_rows(self):
+        self.assertTrue(PlayerState.objects.filter(user=self.user).exists())
+        self.assertTrue(PlayerTravel.objects.filter(user=self.user).exists())
+        self.assertTrue(PlayerStats.objects.filter(user=self.user).exists())
+        self.assertEqual(self.user.current_hp, self.user.max_hp)
+
+    def test_constructor_accepts_player_fields(self):
+        user = CustomUser(username='other', nickname='Other', experience=500)
+        user.save()
+        state = PlayerState.objects.get(user=user)
+        self.assertEqual((state.experience, state.level), (500, 3))
+
+    def test_update_fields_touch_only_player_row(self):
+        user = CustomUser.objects.select_related('player_state').get(
+            pk=self.user.pk)
+        user.last_fight_at = timezone.now()
+        with CaptureQueriesContext(connection) as queries:
+            user.save(update_fields=['last_fight_at'])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('player_state', queries[0]['sql'])
+        self.assertNotIn('"user"', queries[0]['sql'])
+
+
+class GeneratedFieldsTests(TestCase):
+    """Уровень и максимум здоровья считает БД."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            'player', password='password', nickname='Hero')
+
+    def test_level_follows_experience_in_sql(self):
+        for experience, level in ((99, 1), (100, 2), (399, 2), (400, 3)):
+            PlayerState.objects.filter(user=self.user).update(
+                experience=experience)
+            self.assertEqual(
+                PlayerState.objects.get(user=self.user).level, level)
+        self.assertTrue(
+            PlayerState.objects.filter(user=self.user, level__gte=3).exists())
+
+    def test_level_up_updates_max_hp(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        stamina = user.stamina
+        user.add_experience(100)
+        # Объект в памяти совпадает с тем, что посчитала БД
+        state = PlayerState.objects.get(user=self.user)
+        self.assertEqual((user.level, user.max_hp),
+                         (state.level, state.max_hp))
+        self.assertEqual(state.base_stamina, stamina + 1)
+        self.assertEqual(state.max_hp, (stamina + 1 + 2) * 10)
+
+    def test_python_formula_matches_sql(self):
+        rows = PlayerState.objects.filter(user=self.user)
+        for experience in (0, 1, 99, 100, 101, 399, 400, 899, 900, 2499,
+                           2500, 9999, 10_000, 123_456, 10**9, 10**12):
+            for stamina in (0, 5, 100):
+                with self.subTest(experience=experience, stamina=stamina):
+                    rows.update(experience=experience, base_stamina=stamina)
+                    state = rows.get()
+                    in_sql = (state.level, state.max_hp)
+                    state.refresh_derived()
+                    self.assertEqual((state.level, state.max_hp), in_sql)
+
+    def test_base_stamina_follows_stats(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.stamina = 7
+        user.save(update_fields=['stamina'])
+        state = PlayerState.objects.get(user=self.user)
+        self.assertEqual(state.base_stamina,
+                         PlayerStats.objects.get(user=self.user).stamina)
+        self.assertEqual(state.max_hp, (7 + state.level) * 10)
+
+
+# Кэш тестов (LocMemCache) объявлен надёжным: write-behind включается
+LOCMEM = 'django.core.cache.backends.locmem.LocMemCache'
+DURABLE_LOCMEM = override_settings(SHARED_CACHE_BACKENDS=[LOCMEM],
+                                   DURABLE_CACHE_BACKENDS=[LOCMEM])
+
+
+@DURABLE_LOCMEM
+class VolatileStateTests(TestCase):
+    """Опыт и убийства копятся в кэше и пишутся в БД пачкой."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            'player', password='password', nickname='Hero')
+
+    def setUp(self):
+        cache.clear()
+        world.reset_world_version()
+        self.addCleanup(volatile.flush)
+
+    def test_updates_are_visible_before_flush(self):
+        user = load_user(self.user.pk)
+        with self.assertNumQueries(1):
+            # Первое изменение читает значения из БД, дальше — только кэш
+            volatile.update(user, {'experience': 10, 'kills': 1})
+        with self.assertNumQueries(0):
+            volatile.update(user, {'experience': 10, 'kills': 1},
+                            last_fight_at=timezone.now())
+        self.assertEqual(
+            PlayerState.objects.get(user=self.user).experience, 0)
+
+        user = load_user(self.user.pk)
+        self.assertEqual((user.experience, user.kills), (20, 2))
+        self.assertIsNotNone(user.last_fight_at)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(volatile.flush(), 1)
+        state = PlayerState.objects.get(user=self.user)
+        self.assertEqual((state.experience, state.kills), (20, 2))
+        self.assertEqual(volatile.flush(), 0)
+
+    def test_level_up_is_written_through(self):
+        user = load_user(self.user.pk)
+        stamina = user.stamina
+        volatile.update(user, {'experience': 100})
+        state = PlayerState.objects.get(user=self.user)
+        self.assertEqual((state.experience, state.level), (100, 2))
+        self.assertEqual(state.base_stamina, stamina + 1)
+
+    def test_logout_flushes(self):
+        self.client.force_login(self.user)
+        volatile.update(load_user(self.user.pk), {'kills': 3})
+        self.client.post(reverse('logout'))
+        self.assertEqual(PlayerState.objects.get(user=self.user).kills, 3)
+
+
+class VolatileWriteThroughTests(TestCase):
+    """Без надёжного общего кэша изменения пишутся в БД сразу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            'player', password='password', nickname='Hero')
+
+    def setUp(self):
+        cache.clear()
+        world.reset_world_version()
+        self.addCleanup(volatile.flush)
+
+    def test_written_immediately(self):
+        self.assertFalse(volatile.is_enabled())
+        user = load_user(self.user.pk)
+        volatile.update(user, {'experience': 10, 'kills': 1},
+                        last_fight_at=timezone.now())
+        state = PlayerState.objects.get(user=self.user)
+        self.assertEqual((state.experience, state.kills), (10, 1))
+        # Закэшированный игрок инвалидирован
+        user = load_user(self.user.pk)
+        self.assertEqual((user.experience, user.kills), (10, 1))
+        volatile.update(user, {'experience': 100})
+        state = PlayerState.objects.get(user=self.user)
+        self.assertEqual((state.experience, state.level), (110, 2))
+
+    def test_no_loss_on_eviction(self):
+        # LocMemCache вытесняет записи сверх MAX_ENTRIES: write-behind
+        # потерял бы опыт части игроков до сброса
+        users = [CustomUser.objects.create_user(
+            f'player{i}', nickname=f'Hero{i}') for i in range(120)]
+        small = {'default': {
+            'BACKEND': LOCMEM,
+            'LOCATION': 'volatile-eviction',
+            'OPTIONS': {'MAX_ENTRIES': 50},
+        }}
+        with override_settings(CACHES=small):
+            for user in users:
+                volatile.update(load_user(user.pk), {'experience': 10})
+            volatile.flush()
+        self.assertEqual(PlayerState.objects.filter(
+            user__in=users, experience=10).count(), 120)
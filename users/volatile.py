@@ -0,0 +1,280 @@
+"""Отложенная запись изменчивого состояния игрока (write-behind).
+
+Опыт, число убийств, здоровье и время последнего боя меняются почти
+на каждом запросе активного игрока. Вместо UPDATE player_state на
+каждое изменение их текущие значения живут в общем кэше (ключ на
+поле), а воркер помечает игрока изменённым. Фоновый поток раз в
+VOLATILE_FLUSH_SECONDS записывает всех изменённых игроков пачкой
+bulk_update: сколько бы боёв игрок ни провёл за интервал, в БД уйдёт
+одно обновление его строки.
+
+Пока значения есть в кэше, они главнее БД: load_user накладывает их
+на игрока тем же get_many, которым читает версию игрока. Опыт и
+убийства прибавляются cache.incr, поэтому параллельные бои на разных
+воркерах не теряют друг друга. Новый уровень меняет характеристики,
+поэтому он записывается в БД сразу.
+
+Буфер сбрасывается фоновым потоком, при выходе игрока из игры и при
+остановке процесса. Если воркер упал, значения остаются в кэше
+и запишутся при следующем действии игрока на любом воркере: теряется
+только то, что кэш вытеснил раньше (VOLATILE_TIMEOUT).
+
+Поэтому write-behind включается только с общим кэшем, который не
+вытесняет записи (corelight.caches.is_durable(): Redis с
+maxmemory-policy noeviction). В кэше процесса (LocMemCache) каждый
+воркер видел бы свои значения и затирал при сбросе чужие, а записи
+сверх MAX_ENTRIES пропадали бы до сброса. С другим кэшем или с
+VOLATILE_WRITE_BEHIND = False изменения пишутся сразу одним UPDATE.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.db.models import F
+
+from corelight.caches import is_durable
+from game import stat_schema
+
+from .models import CustomUser, PlayerState, level_for_experience
+
+logger = logging.getLogger(__name__)
+
+# Поля player_state, которые пишутся отложенно
+FIELDS = ('current_hp', 'experience', 'kills', 'last_fight_at')
+
+_dirty: set[int] = set()
+_dirty_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_thread: threading.Thread | None = None
+
+
+def get_volatile_timeout() -> int:
+    """Время жизни значений в кэше в секундах."""
+    return getattr(settings, 'VOLATILE_TIMEOUT', 24 * 60 * 60)
+
+
+def get_flush_interval() -> float:
+    """Интервал фонового сброса в секундах."""
+    return getattr(settings, 'VOLATILE_FLUSH_SECONDS', 5)
+
+
+def is_enabled() -> bool:
+    """Значения копятся в кэше (иначе пишутся в БД сразу)."""
+    return getattr(settings, 'VOLATILE_WRITE_BEHIND', True) and is_durable()
+
+
+def _key(user_id, name: str) -> str:
+    return f'user:{user_id}:volatile:{name}'
+
+
+def keys(user_id) -> list[str]:
+    """Ключи кэша изменчивых полей игрока (для get_many в load_user)."""
+    return [_key(user_id, name) for name in FIELDS]
+
+
+def apply(user: CustomUser, values: dict):
+    """Накладывает значения из кэша на строку player_state игрока.
+
+    Args:
+        user: Игрок.
+        values: Результат cache.get_many(), в нём могут быть и другие ключи.
+    """
+    state = user.get_player_row('player_state')
+    changed = False
+    for name in FIELDS:
+        key = _key(user.pk, name)
+        if key in values:
+            setattr(state, name, values[key])
+            changed = True
+    if changed:
+        state.refresh_derived()
+
+
+def _mark_dirty(user_id: int):
+    with _dirty_lock:
+        _dirty.add(user_id)
+    _ensure_thread()
+
+
+def _seed(user_id: int):
+    """Кладёт в кэш значения из БД (если их там ещё нет)."""
+    row = (PlayerState.objects.filter(pk=user_id)
+           .values_list(*FIELDS).first())
+    if row is None:
+        return
+    for name, value in zip(FIELDS, row):
+        cache.add(_key(user_id, name), value, get_volatile_timeout())
+
+
+def _incr(user_id: int, name: str, delta: int) -> int:
+    try:
+        return cache.incr(_key(user_id, name), delta)
+    except ValueError:
+        # Ключа нет: первое изменение после сброса или вытеснения
+        _seed(user_id)
+        return cache.incr(_key(user_id, name), delta)
+
+
+def _level_up(user: CustomUser, experience: int, gained: int):
+    """Новый уровень: характеристики и состояние пишутся сразу.
+
+    Уровни до и после считаются по значению счётчика, поэтому
+    переход через уровень видит ровно один из параллельных боёв.
+    """
+    levels = (level_for_experience(experience)
+              - level_for_experience(experience - gained))
+    if levels > 0:
+        user._grow_stats(levels)
+        user.save(update_fields=[*FIELDS, *stat_schema.STAT_NAMES])
+
+
+def _write_through(user: CustomUser, increments: dict, values: dict):
+    """Пишет изменения в БД сразу (write-behind выключен).
+
+    Счётчики прибавляются в UPDATE (F-выражения), поэтому параллельные
+    бои не теряют друг друга; итоговые значения перечитываются.
+    """
+    # backends импортирует этот модуль
+    from .backends import bump_user_version
+
+    state = user.get_player_row('player_state')
+    rows = PlayerState.objects.filter(pk=user.pk)
+    rows.update(**{name: F(name) + delta
+                   for name, delta in increments.items()}, **values)
+    if increments:
+        current = rows.values(*increments).first() or {}
+        for name, value in current.items():
+            setattr(state, name, value)
+    for name, value in values.items():
+        setattr(state, name, value)
+    # queryset.update() не вызывает post_save
+    bump_user_version(user.pk)
+
+
+def update(user: CustomUser, increments: dict | None = None, **values):
+    """Меняет изменчивые поля игрока без записи в БД.
+
+    Без надёжного общего кэша (is_enabled()) изменения пишутся в БД
+    сразу.
+
+    Args:
+        user: Игрок (его строка player_state обновляется в памяти).
+        increments: Прибавки к счётчикам: {'experience': 20, 'kills': 1}.
+        **values: Новые значения остальных полей (current_hp, last_fight_at).
+    """
+    if not is_enabled():
+        _write_through(user, increments or {}, values)
+        _finish(user, increments)
+        return
+    state = user.get_player_row('player_state')
+    for name, delta in (increments or {}).items():
+        setattr(state, name, _incr(user.pk, name, delta))
+    if values:
+        cache.set_many({_key(user.pk, name): value
+                        for name, value in values.items()},
+                       get_volatile_timeout())
+        for name, value in values.items():
+            setattr(state, name, value)
+    _finish(user, increments)
+    _mark_dirty(user.pk)
+
+
+def _finish(user: CustomUser, increments: dict | None):
+    user.get_player_row('player_state').refresh_derived()
+    if increments and 'experience' in increments:
+        _level_up(user, user.experience, increments['experience'])
+
+
+def forget(user_id: int):
+    """Удаляет значения игрока из кэша: следующее чтение возьмёт БД.
+
+    Нужно, когда состояние меняют в БД напрямую (админка).
+    """
+    with _dirty_lock:
+        _dirty.discard(user_id)
+    cache.delete_many(keys(user_id))
+
+
+def flush(user_ids=None) -> int:
+    """Записывает значения изменённых игроков из кэша в БД.
+
+    Args:
+        user_ids: Только эти игроки (по умолчанию — все изменённые).
+
+    Returns:
+        int: Сколько строк player_state обновлено.
+    """
+    with _flush_lock:
+        with _dirty_lock:
+            ids = _dirty.copy() if user_ids is None else set(user_ids)
+            _dirty.difference_update(ids)
+        if not ids:
+            return 0
+        values = cache.get_many([key for user_id in ids
+                                 for key in keys(user_id)])
+        # bulk_update пишет одинаковый набор полей: группируем по нему
+        groups: dict[tuple[str, ...], list[PlayerState]] = {}
+        for user_id in ids:
+            fields = {name: values[_key(user_id, name)] for name in FIELDS
+                      if _key(user_id, name) in values}
+            if fields:
+                groups.setdefault(tuple(fields), []).append(
+                    PlayerState(pk=user_id, **fields))
+        try:
+            for fields, rows in groups.items():
+                PlayerState.objects.bulk_update(rows, fields, batch_size=500)
+        except DatabaseError:
+            with _dirty_lock:
+                _dirty.update(ids)
+            logger.exception('Состояние игроков: не записано %d строк',
+                             len(ids))
+            return 0
+    return sum(len(rows) for rows in groups.values())
+
+
+def _run():
+    while True:
+        time.sleep(get_flush_interval())
+        try:
+            flush()
+        except Exception:
+            logger.exception('Состояние игроков: ошибка фонового сброса')
+        finally:
+            connections.close_all()
+
+
+def _ensure_thread():
+    global _thread
+    if not getattr(settings, 'VOLATILE_BACKGROUND', True):
+        return
+    if _thread is None or not _thread.is_alive():
+        with _dirty_lock:
+            if _thread is None or not _thread.is_alive():
+                _thread = threading.Thread(
+                    target=_run, name='volatile-flusher', daemon=True)
+                _thread.start()
+
+
+def _after_fork_in_child():
+    # Изменённых игроков родителя запишет родитель
+    global _thread, _dirty_lock, _flush_lock
+    _dirty.clear()
+    _dirty_lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _thread = None
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Состояние игроков: ошибка сброса при остановке')
+
+
+atexit.register(_flush_at_exit)
+os.register_at_fork(after_in_child=_after_fork_in_child)